@@ -0,0 +1,441 @@
+"""
+Benchmark de los pipelines de generación (sin servidor)
+
+Mide tiempo de pared (mínimo de varias repeticiones: el menos afectado
+por ruido del sistema), pico de memoria
+(tracemalloc, en una corrida aparte) y cantidad de triángulos sobre
+imágenes sintéticas con contorno rojo, en varias resoluciones y
+porcentajes de relleno de la máscara. Las mallas de salida se validan
+(validacion.py): una malla inválida cuenta como regresión.
+
+Uso:
+    python benchmark.py                  # compara contra la línea base
+    python benchmark.py --guardar        # (re)escribe la línea base
+    python benchmark.py --rapido         # solo la resolución más baja
+    python benchmark.py --filtro texto   # solo casos cuyo nombre contenga "texto"
+
+Sale con código 1 si algún caso empeora más allá de la tolerancia,
+supera la cota de memoria por megapíxel (MB_POR_MPX) o produce una
+malla inválida (salvo que la línea base ya la registre como inválida).
+
+La línea base versionada (benchmark_base.json) solo guarda lo que no
+depende de la máquina: triángulos, validez y pico de memoria. Los tiempos
+son propios de cada equipo y van a benchmark_tiempos.json (local, fuera
+del repositorio), que --guardar escribe junto con la línea base; sin ese
+archivo no se comparan tiempos.
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import struct
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+import letras
+import litofania
+from core import mesh_to_stl_bytes
+from ensamblaje import Ensamblaje, Pieza
+from letras import generar_base_texto_stl, generar_malla_base_texto, generar_stl_manifold_x, rotar_faces
+from litofania import escribir_stl_por_bandas, generar_modelo_3d, generar_stl_manifold
+from malla import Malla
+from validacion import validar_malla
+
+
+RUTA_BASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_base.json")
+RUTA_TIEMPOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_tiempos.json")
+
+RESOLUCIONES = (150, 300, 600)
+RELLENOS = (0.2, 0.5, 0.75)        # fracción del área cubierta por el interior
+TEXTOS = ("A", "Hola", "Valentina 12")
+
+# Tolerancias por defecto
+TOLERANCIA_TIEMPO = 0.30           # +30 %
+TOLERANCIA_MEMORIA = 0.15          # +15 %
+MARGEN_TIEMPO_S = 0.005            # ruido absoluto admitido en casos muy cortos
+
+# Cota absoluta de pico de memoria por megapíxel de la grilla de trabajo
+# (independiente de la línea base). Cubre los buffers de salida (la malla
+# indexada y/o el STL) más los temporales del pipeline.
+MB_POR_MPX = {
+    "generar_modelo_3d": 260.0,
+    "generar_stl_manifold": 200.0,
+    "generar_stl_manifold_contorno": 200.0,
+    "mesh_to_stl_bytes": 170.0,
+    "escribir_stl_por_bandas": 60.0,    # solo el mapa de alturas crece con la grilla
+    "ensamblar": 100.0,                 # la malla de salida (con normales)
+}
+MARGEN_MEMORIA_MB = 3.0            # intérprete, imagen de entrada, cachés
+
+VALIDA = {True: "sí", False: "NO", None: "-"}
+
+
+# ============================================================
+# ENTRADAS SINTÉTICAS
+# ============================================================
+
+def radio_para_relleno(px: int, relleno: float) -> float:
+    """
+    Radio del círculo cuya área es `relleno` del lienzo (máx. π/4).
+    """
+    return min(np.sqrt(relleno * px * px / np.pi), px / 2 - 2)
+
+
+def imagen_con_contorno(px: int, relleno: float, semilla: int = 0) -> bytes:
+    """
+    PNG con un anillo rojo y un interior con degradé y ruido (el ruido
+    evita que la fusión coplanar haga el caso artificialmente fácil).
+    """
+    rng = np.random.default_rng(semilla)
+    yy, xx = np.mgrid[0:px, 0:px]
+    gris = (xx + yy) * (200.0 / (2 * px)) + rng.normal(0, 12, (px, px))
+    gris = np.clip(gris + 28, 0, 255).astype(np.uint8)
+
+    img = Image.fromarray(np.stack([gris] * 3, axis=-1), "RGB")
+    r = radio_para_relleno(px, relleno)
+    c = px / 2
+    ImageDraw.Draw(img).ellipse(
+        [c - r, c - r, c + r, c + r], outline=(255, 0, 0), width=max(2, px // 60)
+    )
+
+    buffer = io.BytesIO()
+    img.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def heightmap_con_mascara(px: int, relleno: float, semilla: int = 0):
+    """
+    Grilla de alturas tipo litofanía y máscara circular.
+    """
+    rng = np.random.default_rng(semilla)
+    yy, xx = np.mgrid[0:px, 0:px]
+    c = px / 2
+    mask = (xx - c) ** 2 + (yy - c) ** 2 <= radio_para_relleno(px, relleno) ** 2
+
+    z = np.zeros((px, px))
+    z[mask] = litofania.BASE_Z + rng.uniform(litofania.LITHO_MIN_Z, litofania.LITHO_MAX_Z, mask.sum())
+    return z, mask
+
+
+# ============================================================
+# CASOS
+# ============================================================
+
+@dataclass
+class Caso:
+    nombre: str
+    parametros: dict
+    preparar: Callable[[], Callable[[], object]]   # → función a medir
+    triangulos: Callable[[object], int]
+
+    @property
+    def clave(self) -> str:
+        return self.nombre + "".join(f" {k}={v}" for k, v in self.parametros.items())
+
+    @property
+    def limite_memoria_mb(self) -> Optional[float]:
+        mb_por_mpx = MB_POR_MPX.get(self.nombre)
+        if mb_por_mpx is None:
+            return None
+        return mb_por_mpx * self.parametros["px"] ** 2 / 1e6 + MARGEN_MEMORIA_MB
+
+
+def _tri_stl(datos: bytes) -> int:
+    return struct.unpack_from("<I", datos, 80)[0]
+
+
+def _tri_malla(malla) -> int:
+    return malla.num_caras
+
+
+def _tri_faces(faces) -> int:
+    return len(faces)
+
+
+def construir_casos(resoluciones, rellenos, textos) -> "list[Caso]":
+    casos = []
+
+    for px in resoluciones:
+        for relleno in rellenos:
+            p = {"px": px, "relleno": relleno}
+
+            def modelo(px=px, relleno=relleno):
+                imagen = imagen_con_contorno(px * 2, relleno)
+                return lambda: generar_modelo_3d(imagen, pixels=px)
+
+            def manifold(px=px, relleno=relleno):
+                z, mask = heightmap_con_mascara(px, relleno)
+                return lambda: generar_stl_manifold(z, mask)
+
+            def manifold_contorno(px=px, relleno=relleno):
+                z, mask = heightmap_con_mascara(px, relleno)
+                return lambda: generar_stl_manifold(z, mask, paredes="contorno")
+
+            def serializar(px=px, relleno=relleno):
+                z, mask = heightmap_con_mascara(px, relleno)
+                malla = generar_stl_manifold(z, mask)
+                return lambda: mesh_to_stl_bytes(malla)
+
+            def bandas(px=px, relleno=relleno):
+                imagen = imagen_con_contorno(px * 2, relleno)
+                return lambda: escribir_stl_por_bandas(imagen, os.devnull, pixels=px)
+
+            def validar(px=px, relleno=relleno):
+                z, mask = heightmap_con_mascara(px, relleno)
+                malla = generar_stl_manifold(z, mask)
+                return lambda: validar_malla(malla)
+
+            def ensamblar(px=px, relleno=relleno):
+                # Litofanía de pie sobre el bloque base: rotación + traslación fusionadas
+                z, mask = heightmap_con_mascara(px, relleno)
+                malla = generar_stl_manifold(z, mask)
+                malla.normales_caras()
+                base = letras.malla_bloque_base()
+                return lambda: Ensamblaje([
+                    base, Pieza(malla).rotar("x", 90).trasladar(dy=letras.BASE_ALTO_MM),
+                ]).construir()
+
+            def rotar(px=px, relleno=relleno):
+                z, mask = heightmap_con_mascara(px, relleno)
+                faces = generar_stl_manifold(z, mask).triangulos()
+                return lambda: rotar_faces(faces, "y", 180)
+
+            casos += [
+                Caso("generar_modelo_3d", p, modelo, _tri_stl),
+                Caso("generar_stl_manifold", p, manifold, _tri_malla),
+                Caso("generar_stl_manifold_contorno", p, manifold_contorno, _tri_malla),
+                Caso("mesh_to_stl_bytes", p, serializar, _tri_stl),
+                Caso("escribir_stl_por_bandas", p, bandas, int),
+                Caso("validar_malla", p, validar, lambda reporte: reporte.caras),
+                Caso("ensamblar", p, ensamblar, _tri_malla),
+                Caso("rotar_faces", p, rotar, _tri_faces),
+            ]
+
+    # Texto: la resolución en px/mm escala igual que la litofanía
+    for px in resoluciones:
+        res_px_mm = letras.RES_PX_MM * px / litofania.PIXELS
+
+        for texto in textos:
+            p = {"px": px, "texto": texto}
+
+            def base_texto(texto=texto, res_px_mm=res_px_mm):
+                def medir():
+                    # Sin la memoización por texto (los glifos sí quedan cacheados)
+                    generar_malla_base_texto.cache_clear()
+                    return generar_base_texto_stl(texto, res_px_mm)
+                return medir
+
+            def manifold_x(texto=texto, res_px_mm=res_px_mm):
+                z, mask = letras.generar_texto_heightmap(texto, res_px_mm=res_px_mm)
+                return lambda: generar_stl_manifold_x(z, mask, letras.TEXTO_Z_MM, res_px_mm)
+
+            casos += [
+                Caso("generar_base_texto_stl", p, base_texto, _tri_stl),
+                Caso("generar_stl_manifold_x", p, manifold_x, _tri_malla),
+            ]
+
+    return casos
+
+
+# ============================================================
+# MEDICIÓN
+# ============================================================
+
+@dataclass
+class Resultado:
+    tiempo_s: float
+    pico_mb: float
+    triangulos: int
+    valida: Optional[bool] = None    # solo si el caso devuelve una Malla
+
+
+def medir(caso: Caso, repeticiones: int) -> Resultado:
+    fn = caso.preparar()
+
+    # Calentamiento (cachés de fuentes, glifos, imports perezosos)
+    salida = fn()
+    triangulos = caso.triangulos(salida)
+    valida = validar_malla(salida).valida if isinstance(salida, Malla) else None
+    del salida
+
+    tiempos = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        fn()
+        tiempos.append(time.perf_counter() - t0)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return Resultado(
+        tiempo_s=min(tiempos),
+        pico_mb=pico / (1024 * 1024),
+        triangulos=triangulos,
+        valida=valida,
+    )
+
+
+def comparar(
+    clave: str,
+    actual: Resultado,
+    base: dict,
+    tiempo_base: Optional[float],
+    tol_t: float,
+    tol_m: float,
+) -> "list[str]":
+    """
+    Devuelve la lista de regresiones del caso (vacía si está dentro de tolerancia).
+    El tiempo solo se compara si hay una medición local (tiempo_base).
+    """
+    problemas = []
+
+    if tiempo_base is not None and actual.tiempo_s > tiempo_base * (1 + tol_t) + MARGEN_TIEMPO_S:
+        problemas.append(
+            f"{clave}: tiempo {actual.tiempo_s * 1000:.1f} ms > {tiempo_base * 1000:.1f} ms (+{tol_t:.0%})"
+        )
+
+    limite_m = base["pico_mb"] * (1 + tol_m) + 0.5
+    if actual.pico_mb > limite_m:
+        problemas.append(
+            f"{clave}: memoria {actual.pico_mb:.1f} MB > {base['pico_mb']:.1f} MB (+{tol_m:.0%})"
+        )
+
+    if actual.triangulos > base["triangulos"]:
+        problemas.append(
+            f"{clave}: triángulos {actual.triangulos} > {base['triangulos']}"
+        )
+
+    if actual.valida is False and base.get("valida") is not False:
+        problemas.append(f"{clave}: malla inválida")
+
+    return problemas
+
+
+# ============================================================
+# CLI
+# ============================================================
+
+def _leer_casos(ruta: str) -> dict:
+    if not os.path.exists(ruta):
+        return {}
+    with open(ruta, encoding="utf-8") as f:
+        return json.load(f).get("casos", {})
+
+
+def _guardar_casos(ruta: str, casos: dict):
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "maquina": {
+                    "python": platform.python_version(),
+                    "numpy": np.__version__,
+                    "procesador": platform.processor() or platform.machine(),
+                },
+                "casos": dict(sorted(casos.items())),
+            },
+            f, indent=2, ensure_ascii=False,
+        )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark de generación de mallas")
+    parser.add_argument("--guardar", action="store_true", help="escribe la línea base con los resultados")
+    parser.add_argument("--base", default=RUTA_BASE, help="archivo JSON de línea base")
+    parser.add_argument("--tiempos", default=RUTA_TIEMPOS, help="archivo JSON de tiempos locales")
+    parser.add_argument("--rapido", action="store_true", help="solo la resolución más baja")
+    parser.add_argument("--filtro", default="", help="solo casos cuyo nombre contenga este texto")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--tolerancia-tiempo", type=float, default=TOLERANCIA_TIEMPO)
+    parser.add_argument("--tolerancia-memoria", type=float, default=TOLERANCIA_MEMORIA)
+    args = parser.parse_args(argv)
+
+    resoluciones = RESOLUCIONES[:1] if args.rapido else RESOLUCIONES
+    casos = [c for c in construir_casos(resoluciones, RELLENOS, TEXTOS) if args.filtro in c.clave]
+
+    base = _leer_casos(args.base)
+    tiempos_base = _leer_casos(args.tiempos)
+
+    print(f"🔧 {len(casos)} casos, {args.repeticiones} repeticiones\n")
+    print(f"{'caso':<58} {'tiempo':>10} {'pico':>10} {'triángulos':>11} {'válida':>7} {'vs base':>9}")
+
+    resultados = {}
+    tiempos = {}
+    regresiones = []
+
+    for caso in casos:
+        r = medir(caso, args.repeticiones)
+        tiempos[caso.clave] = round(r.tiempo_s, 6)
+        resultados[caso.clave] = {
+            "pico_mb": round(r.pico_mb, 3),
+            "triangulos": r.triangulos,
+        }
+        if r.valida is not None:
+            resultados[caso.clave]["valida"] = r.valida
+
+        limite = caso.limite_memoria_mb
+        if limite is not None and r.pico_mb > limite:
+            regresiones.append(
+                f"{caso.clave}: memoria {r.pico_mb:.1f} MB > cota {limite:.1f} MB "
+                f"({MB_POR_MPX[caso.nombre]:.0f} MB/Mpx)"
+            )
+
+        referencia = base.get(caso.clave)
+        if r.valida is False and (args.guardar or not referencia):
+            regresiones.append(f"{caso.clave}: malla inválida")
+
+        tiempo_base = tiempos_base.get(caso.clave)
+        delta = f"{(r.tiempo_s / tiempo_base - 1) * 100:+.0f}%" if tiempo_base else "-"
+
+        if referencia:
+            if not args.guardar:
+                regresiones += comparar(
+                    caso.clave, r, referencia, tiempo_base,
+                    args.tolerancia_tiempo, args.tolerancia_memoria,
+                )
+        else:
+            delta = "nuevo"
+
+        print(
+            f"{caso.clave:<58} {r.tiempo_s * 1000:>8.1f}ms {r.pico_mb:>8.1f}MB "
+            f"{r.triangulos:>11} {VALIDA[r.valida]:>7} {delta:>9}"
+        )
+
+    if args.guardar:
+        for problema in regresiones:
+            print(f"⚠️  {problema}")
+        base.update(resultados)
+        tiempos_base.update(tiempos)
+        _guardar_casos(args.base, base)
+        _guardar_casos(args.tiempos, tiempos_base)
+        print(f"\n✅ Línea base guardada en {args.base} (tiempos locales en {args.tiempos})")
+        return 0
+
+    if regresiones:
+        print("\n❌ Regresiones:")
+        for problema in regresiones:
+            print(f"  - {problema}")
+        return 1
+
+    if not base:
+        print("\n⚠️  Sin línea base: ejecutar con --guardar")
+    elif not tiempos_base:
+        print("\n✅ Sin regresiones (tiempos sin comparar: generar los locales con --guardar)")
+    else:
+        print("\n✅ Sin regresiones")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
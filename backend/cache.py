@@ -0,0 +1,269 @@
+"""
+Caché de mallas direccionada por contenido
+
+La clave es un hash SHA-256 de los bytes de la imagen más los parámetros
+de generación y la versión del pipeline (hash de los módulos que producen
+la geometría). Dos niveles:
+- Memoria : LRU con presupuesto en bytes (por proceso)
+- Disco   : opcional, sobrevive reinicios y se comparte entre workers
+            de uvicorn que apunten al mismo directorio
+
+Peticiones idénticas concurrentes se coalescen: solo una calcula y el
+resto espera el mismo resultado.
+
+Configuración por variables de entorno:
+- LITHO_CACHE_MB       → presupuesto en memoria (0 desactiva)
+- LITHO_CACHE_DIR      → directorio del nivel en disco (vacío desactiva)
+- LITHO_CACHE_DISCO_MB → presupuesto del nivel en disco
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from collections import OrderedDict
+from functools import partial
+
+import numpy as np
+
+from malla import Malla
+
+
+logger = logging.getLogger("lithomaker")
+
+CACHE_MB = float(os.getenv("LITHO_CACHE_MB", 256))
+CACHE_DIR = os.getenv("LITHO_CACHE_DIR", "")
+CACHE_DISCO_MB = float(os.getenv("LITHO_CACHE_DISCO_MB", 2048))
+
+# Cambiar al modificar el formato de las mallas guardadas
+VERSION_CACHE = 2
+
+# Archivos de los que depende la geometría: su hash entra en la clave,
+# así cualquier cambio del pipeline invalida lo cacheado (también en disco)
+ARCHIVOS_PIPELINE = (
+    "malla.py", "contorno.py", "formas.py", "ingesta.py", "tonos.py",
+    "litofania.py", "ensamblaje.py", "letras.py", "Montserrat-ExtraBold.ttf",
+)
+
+
+def hash_pipeline() -> str:
+    h = hashlib.sha256()
+    base = os.path.dirname(os.path.abspath(__file__))
+    for nombre in ARCHIVOS_PIPELINE:
+        with open(os.path.join(base, nombre), "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()[:16]
+
+
+VERSION_PIPELINE = hash_pipeline()
+
+
+class CacheMallas:
+
+    def __init__(self, max_bytes: int, directorio: str = "", max_bytes_disco: int = 0):
+        self.max_bytes = max_bytes
+        self.directorio = directorio
+        self.max_bytes_disco = max_bytes_disco
+
+        self._lru: "OrderedDict[str, Malla]" = OrderedDict()
+        self._bytes = 0
+        self._en_curso: dict = {}
+
+        self.aciertos_memoria = 0
+        self.aciertos_disco = 0
+        self.coalescidos = 0
+        self.fallos = 0
+
+        if self.directorio:
+            os.makedirs(self.directorio, exist_ok=True)
+
+    # ------------------------------------------------------------
+    # Clave
+    # ------------------------------------------------------------
+
+    @staticmethod
+    def clave(datos: bytes, **parametros) -> str:
+        h = hashlib.sha256()
+        h.update(datos)
+        h.update(json.dumps(
+            {"v": VERSION_CACHE, "pipeline": VERSION_PIPELINE, **parametros}, sort_keys=True, default=str
+        ).encode())
+        return h.hexdigest()
+
+    # ------------------------------------------------------------
+    # Nivel en memoria
+    # ------------------------------------------------------------
+
+    def _leer_memoria(self, clave: str):
+        malla = self._lru.get(clave)
+        if malla is not None:
+            self._lru.move_to_end(clave)
+        return malla
+
+    def _guardar_memoria(self, clave: str, malla: Malla):
+        tamano = malla.nbytes
+        if tamano > self.max_bytes or clave in self._lru:
+            return
+
+        self._lru[clave] = malla
+        self._bytes += tamano
+
+        while self._bytes > self.max_bytes:
+            _, vieja = self._lru.popitem(last=False)
+            self._bytes -= vieja.nbytes
+
+    # ------------------------------------------------------------
+    # Nivel en disco
+    # ------------------------------------------------------------
+
+    def _ruta(self, clave: str) -> str:
+        return os.path.join(self.directorio, clave[:2], f"{clave}.npz")
+
+    def _leer_disco(self, clave: str):
+        ruta = self._ruta(clave)
+        try:
+            with np.load(ruta, allow_pickle=False) as datos:
+                malla = Malla(
+                    datos["vertices"],
+                    datos["caras"],
+                    datos["normales"] if "normales" in datos else None,
+                )
+            os.utime(ruta)
+            return malla
+        except FileNotFoundError:
+            return None
+        except Exception:
+            logger.warning(f"Entrada de caché corrupta, se descarta: {ruta}")
+            self._borrar(ruta)
+            return None
+
+    def _guardar_disco(self, clave: str, malla: Malla):
+        ruta = self._ruta(clave)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+
+        arrays = {"vertices": malla.vertices, "caras": malla.caras}
+        if malla.normales is not None:
+            arrays["normales"] = malla.normales
+
+        # Escritura atómica: otros workers nunca ven un archivo a medias
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(ruta), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(tmp, ruta)
+        except Exception:
+            self._borrar(tmp)
+            raise
+
+        self._podar_disco()
+
+    def _podar_disco(self):
+        """
+        Elimina las entradas menos usadas hasta respetar el presupuesto.
+        """
+        entradas = []
+        for raiz, _, archivos in os.walk(self.directorio):
+            for nombre in archivos:
+                if nombre.endswith(".npz"):
+                    ruta = os.path.join(raiz, nombre)
+                    try:
+                        st = os.stat(ruta)
+                    except FileNotFoundError:
+                        continue
+                    entradas.append((st.st_mtime, st.st_size, ruta))
+
+        total = sum(tamano for _, tamano, _ in entradas)
+        for _, tamano, ruta in sorted(entradas):
+            if total <= self.max_bytes_disco:
+                break
+            self._borrar(ruta)
+            total -= tamano
+
+    @staticmethod
+    def _borrar(ruta: str):
+        try:
+            os.remove(ruta)
+        except FileNotFoundError:
+            pass
+
+    # ------------------------------------------------------------
+    # API
+    # ------------------------------------------------------------
+
+    async def obtener_o_calcular(self, clave: str, calcular):
+        """
+        Devuelve (malla, origen) con origen en
+        "memoria" | "disco" | "coalescido" | "calculado".
+
+        calcular: corrutina sin argumentos que genera la malla.
+        Los errores no se guardan y se propagan a todos los que esperan.
+
+        El cálculo corre en una tarea propia: si quien lo inició se cancela
+        (p. ej. su cliente se desconecta), los demás siguen esperándolo y
+        el resultado igual queda en la caché.
+        """
+        malla = self._leer_memoria(clave)
+        if malla is not None:
+            self.aciertos_memoria += 1
+            return malla, "memoria"
+
+        pendiente = self._en_curso.get(clave)
+        if pendiente is not None:
+            self.coalescidos += 1
+            malla, _ = await asyncio.shield(pendiente)
+            return malla, "coalescido"
+
+        tarea = asyncio.ensure_future(self._resolver(clave, calcular))
+        self._en_curso[clave] = tarea
+        tarea.add_done_callback(partial(self._terminar, clave))
+
+        return await asyncio.shield(tarea)
+
+    def _terminar(self, clave: str, tarea: asyncio.Future):
+        if self._en_curso.get(clave) is tarea:
+            del self._en_curso[clave]
+        # Evita el aviso de "exception was never retrieved" si nadie esperaba
+        if not tarea.cancelled():
+            tarea.exception()
+
+    async def _resolver(self, clave: str, calcular):
+        if self.directorio:
+            malla = await asyncio.to_thread(self._leer_disco, clave)
+            if malla is not None:
+                self.aciertos_disco += 1
+                self._guardar_memoria(clave, malla)
+                return malla, "disco"
+
+        self.fallos += 1
+        malla = await calcular()
+
+        self._guardar_memoria(clave, malla)
+
+        if self.directorio:
+            try:
+                await asyncio.to_thread(self._guardar_disco, clave, malla)
+            except Exception:
+                logger.exception("No se pudo guardar la malla en la caché de disco")
+
+        return malla, "calculado"
+
+    def estado(self) -> dict:
+        return {
+            "aciertos_memoria": self.aciertos_memoria,
+            "aciertos_disco": self.aciertos_disco,
+            "coalescidos": self.coalescidos,
+            "fallos": self.fallos,
+            "entradas": len(self._lru),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "disco": bool(self.directorio),
+        }
+
+
+cache_mallas = CacheMallas(
+    max_bytes=int(CACHE_MB * 1024 * 1024),
+    directorio=CACHE_DIR,
+    max_bytes_disco=int(CACHE_DISCO_MB * 1024 * 1024),
+)
@@ -0,0 +1,61 @@
+"""
+Calentamiento de procesos
+
+Importa los módulos pesados, carga la fuente y ejecuta una generación
+sintética por ambos pipelines (litofanía y base con texto), para que la
+primera petición real no pague los costos de importación ni de primera
+llamada.
+
+Se ejecuta como inicializador de cada proceso del pool de generación.
+"""
+
+import io
+import logging
+import time
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from core import mesh_to_stl_bytes
+from letras import generar_malla_base_texto, precalentar_glifos
+from litofania import generar_malla_3d
+
+
+logger = logging.getLogger("lithomaker")
+
+TEXTO_CALENTAMIENTO = "Hola"
+
+
+def imagen_sintetica(px: int = 64) -> bytes:
+    """
+    PNG pequeño con un contorno rojo circular y un degradé interior.
+    """
+    gris = np.tile(np.linspace(0, 255, px, dtype=np.uint8), (px, 1))
+    img = Image.fromarray(np.stack([gris] * 3, axis=-1), "RGB")
+
+    draw = ImageDraw.Draw(img)
+    margen = px // 8
+    draw.ellipse([margen, margen, px - margen, px - margen], outline=(255, 0, 0), width=max(2, px // 16))
+
+    buffer = io.BytesIO()
+    img.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def calentar_proceso() -> float:
+    """
+    Calienta el proceso actual. Devuelve los segundos empleados.
+    """
+    t0 = time.perf_counter()
+
+    precalentar_glifos()
+
+    malla = generar_malla_3d(imagen_sintetica())
+    mesh_to_stl_bytes(malla)
+
+    malla = generar_malla_base_texto(TEXTO_CALENTAMIENTO)
+    mesh_to_stl_bytes(malla)
+
+    segundos = time.perf_counter() - t0
+    logger.info(f"Proceso de generación calentado en {segundos:.2f}s")
+    return segundos
@@ -0,0 +1,58 @@
+"""
+Producto combinado: litofanía de pie sobre la base con texto
+
+La base (letras.py) apoya sobre el plano X,Z con las letras hacia +Y,
+pegadas a la cara X = BASE_ANCHO_MM y legibles desde +X. La litofanía
+(litofania.py, en el plano X,Y con el relieve hacia +Z) se gira 90° en
+Y y queda de pie detrás de las letras:
+
+- su cara de relieve mira hacia el mismo lado que las letras y la
+  imagen se lee de izquierda a derecha desde ese lado
+- su punto más bajo apoya en la cara superior del bloque (Y = BASE_ALTO_MM);
+  la malla no empieza en Y = 0 (la forma o el contorno recortan la grilla)
+- centrada a lo largo del bloque (eje Z), a HOLGURA_MM de las letras
+
+Las dos piezas se generan por separado (y se cachean por separado);
+aquí solo se componen sus transformaciones (ver ensamblaje.py).
+"""
+
+import numpy as np
+
+from ensamblaje import Ensamblaje, Pieza, matriz_afin, matriz_traslacion
+from letras import BASE_ALTO_MM, BASE_ANCHO_MM, TEXTO_X_MM, TEXTO_Z_MM
+from litofania import MARCO_Z
+from malla import Malla, matriz_rotacion
+
+
+HOLGURA_MM = 2.0     # Separación entre la litofanía y las letras (eje X)
+
+
+def matriz_litofania(lado_mm: float, y_min: float = 0.0) -> np.ndarray:
+    """
+    Coloca la litofanía de lado_mm (en su sistema original) de pie
+    sobre el bloque base: X ← z, Y ← y, Z ← lado_mm - x.
+    y_min es la Y más baja de la malla: ese punto queda sobre el bloque.
+    """
+    x_frente = BASE_ANCHO_MM - TEXTO_Z_MM - HOLGURA_MM
+    z_inicio = (TEXTO_X_MM - lado_mm) / 2
+
+    return matriz_traslacion(
+        dx=x_frente - MARCO_Z,
+        dy=BASE_ALTO_MM - y_min,
+        dz=z_inicio + lado_mm,
+    ) @ matriz_afin(matriz_rotacion("y", 90))
+
+
+def ensamblar_conjunto(litofania: Malla, base_texto: Malla, lado_mm: float) -> Ensamblaje:
+    """
+    Ensamblaje de dos cuerpos (base con texto y litofanía).
+    Las mallas no se copian hasta construirlo o serializarlo.
+    """
+    return Ensamblaje([
+        Pieza(base_texto, nombre="base_texto"),
+        Pieza(
+            litofania,
+            matriz_litofania(lado_mm, float(litofania.vertices[:, 1].min())),
+            nombre="litofania",
+        ),
+    ])
@@ -0,0 +1,398 @@
+"""
+Paredes por contorno (marching squares)
+
+Variante de malla_heightmap (malla.py) que reemplaza la escalera de
+paredes por arista de píxel por paredes verticales que siguen el borde
+de la máscara:
+
+1. Marching squares sobre los nodos de la grilla: cada celda cortada
+   aporta una "pieza" (dos en los casos ambiguos) acotada por un
+   segmento entre puntos medios de sus aristas
+2. Los segmentos se encadenan en contornos cerrados y se simplifican
+   (Douglas-Peucker) con tolerancia TOLERANCIA_PX
+3. Cada tramo simplificado es una cuerda: una sola pared (2 triángulos)
+   y, en el relieve y en la base, un polígono que une las piezas del
+   tramo con la cuerda, triangulado por recorte de orejas
+
+Las celdas con sus 4 nodos dentro se mallan igual que siempre. Los
+polígonos de cada tramo comparten con sus vecinos exactamente las
+aristas de la grilla y los puntos medios conservados, así que el sólido
+queda cerrado. Un tramo cuyo polígono no es simple (la cuerda pasa por
+encima de la cadena interior) se parte en dos hasta que lo sea; una
+pieza sola siempre lo es (es convexa).
+"""
+
+import numpy as np
+
+from malla import Malla, calcular_normales
+
+
+TOLERANCIA_PX = 0.7        # Desvío máximo de la pared respecto del contorno
+MAX_PIEZAS_TRAMO = 32      # Acota el costo de triangular cada tramo
+
+_EPS = 1e-9
+
+# Esquinas de la celda en orden horario: (di, dj)
+#   0: (i, j)   1: (i, j+1)   2: (i+1, j+1)   3: (i+1, j)
+_ESQUINAS = ((0, 0), (0, 1), (1, 1), (1, 0))
+
+# Arista k entre las esquinas k y k+1: (horizontal, di, dj) del punto medio
+_ARISTAS = ((True, 0, 0), (False, 0, 1), (True, 1, 0), (False, 0, 0))
+
+
+def _tabla_piezas():
+    """
+    Para cada caso (bit k = esquina k dentro), las piezas de la celda
+    como (arista_entrada, esquinas, arista_salida), recorriendo la celda
+    en sentido horario. Los casos ambiguos (5 y 10) separan las esquinas.
+    """
+    tabla = []
+    for caso in range(16):
+        dentro = [(caso >> k) & 1 for k in range(4)]
+        piezas = []
+
+        if 0 < sum(dentro) < 4:
+            inicio = dentro.index(0)
+            actual = None
+            for paso in range(4):
+                k = (inicio + paso) % 4
+                sig = (k + 1) % 4
+                if dentro[k]:
+                    actual[1].append(k)
+                if dentro[k] != dentro[sig]:
+                    if dentro[sig]:
+                        actual = (k, [], None)
+                    else:
+                        piezas.append((actual[0], tuple(actual[1]), k))
+
+        tabla.append(tuple(piezas))
+    return tuple(tabla)
+
+
+_PIEZAS = _tabla_piezas()
+
+
+# ============================================================
+# GEOMETRÍA 2D
+# ============================================================
+
+def _cruz(a, b, c) -> float:
+    return (b[0] - a[0]) * (c[1] - a[1]) - (b[1] - a[1]) * (c[0] - a[0])
+
+
+def _es_oreja(xy: list, restantes: list, k: int) -> bool:
+    m = len(restantes)
+    a, b, c = restantes[k - 1], restantes[k], restantes[(k + 1) % m]
+    pa, pb, pc = xy[a], xy[b], xy[c]
+    if _cruz(pa, pb, pc) <= _EPS:
+        return False
+    return not any(
+        _cruz(pa, pb, xy[p]) >= -_EPS
+        and _cruz(pb, pc, xy[p]) >= -_EPS
+        and _cruz(pc, pa, xy[p]) >= -_EPS
+        for p in restantes if p != a and p != b and p != c
+    )
+
+
+def _recortar_orejas(xy: list):
+    """
+    Triangula un polígono simple en sentido antihorario.
+    Devuelve triángulos (índices locales, antihorarios) o None si no
+    encuentra una oreja válida (polígono no simple o degenerado).
+    La búsqueda sigue desde la última oreja recortada.
+    """
+    restantes = list(range(len(xy)))
+    triangulos = []
+    k = 0
+
+    while len(restantes) > 3:
+        m = len(restantes)
+        for _ in range(m):
+            k %= m
+            if _es_oreja(xy, restantes, k):
+                break
+            k += 1
+        else:
+            return None
+
+        triangulos.append((restantes[k - 1], restantes[k], restantes[(k + 1) % m]))
+        del restantes[k]
+        k = max(k - 1, 0)
+
+    a, b, c = restantes
+    if _cruz(xy[a], xy[b], xy[c]) <= _EPS:
+        return None
+    triangulos.append((a, b, c))
+    return triangulos
+
+
+def _douglas_peucker(puntos: np.ndarray, tolerancia: float) -> list:
+    """
+    Índices conservados de una polilínea abierta (incluye los extremos).
+    """
+    conservar = [0, len(puntos) - 1]
+    pendientes = [(0, len(puntos) - 1)]
+
+    while pendientes:
+        a, b = pendientes.pop()
+        if b - a < 2:
+            continue
+        d = puntos[b] - puntos[a]
+        largo = np.hypot(*d)
+        rel = puntos[a + 1:b] - puntos[a]
+        if largo > 0:
+            dist = np.abs(d[0] * rel[:, 1] - d[1] * rel[:, 0]) / largo
+        else:
+            dist = np.hypot(rel[:, 0], rel[:, 1])
+        k = int(np.argmax(dist))
+        if dist[k] > tolerancia:
+            medio = a + 1 + k
+            conservar.append(medio)
+            pendientes += [(a, medio), (medio, b)]
+
+    return sorted(conservar)
+
+
+def _simplificar_cerrado(puntos: np.ndarray, tolerancia: float) -> list:
+    """
+    Douglas-Peucker sobre un contorno cerrado: se parte en el punto 0 y
+    en el más lejano a él. Devuelve índices conservados, crecientes.
+    """
+    n = len(puntos)
+    if n <= 4:
+        return list(range(n))
+
+    lejano = int(np.argmax(np.hypot(*(puntos - puntos[0]).T)))
+    lejano = min(max(lejano, 1), n - 1)
+
+    ida = _douglas_peucker(puntos[:lejano + 1], tolerancia)
+    vuelta = _douglas_peucker(np.concatenate([puntos[lejano:], puntos[:1]]), tolerancia)
+
+    return sorted(set(ida) | {lejano + k for k in vuelta if lejano + k < n})
+
+
+# ============================================================
+# HEIGHTMAP → MALLA CON PAREDES POR CONTORNO
+# ============================================================
+
+def malla_heightmap_contorno(
+    z_grid: np.ndarray,
+    mask: np.ndarray,
+    x_lin: np.ndarray,
+    y_lin: np.ndarray,
+    tolerancia_px: float = TOLERANCIA_PX,
+) -> Malla:
+    """
+    Como malla_heightmap (sin decimar), pero con el sólido limitado por
+    el contorno de los nodos válidos y paredes simplificadas.
+
+    - mask : nodos dentro del sólido (los del borde de la grilla se
+             consideran fuera para que todo contorno sea cerrado)
+    - tolerancia_px : desvío máximo de las paredes, en pasos de grilla
+    """
+    filas, cols = z_grid.shape
+
+    dentro = np.array(mask, dtype=bool)
+    dentro[[0, -1], :] = False
+    dentro[:, [0, -1]] = False
+
+    ids = np.full((filas, cols), -1, dtype=np.int32)
+    n_nodos = int(dentro.sum())
+    ids[dentro] = np.arange(n_nodos, dtype=np.int32)
+
+    if n_nodos == 0:
+        return Malla(np.empty((0, 3)), np.empty((0, 3)), np.empty((0, 3)))
+
+    nf, nc = np.nonzero(dentro)
+    xy_nodos = np.stack([x_lin[nc], y_lin[nf]], axis=1)
+    z_nodos = z_grid[nf, nc]
+
+    # --- Caso de marching squares de cada celda ---
+    caso = (
+        dentro[:-1, :-1] * 1 + dentro[:-1, 1:] * 2 +
+        dentro[1:, 1:] * 4 + dentro[1:, :-1] * 8
+    ).astype(np.uint8)
+
+    # --- Celdas llenas: relieve y base como en malla_heightmap ---
+    ii, jj = np.nonzero(caso == 15)
+    a, b = ids[ii, jj], ids[ii, jj + 1]
+    c, d = ids[ii + 1, jj + 1], ids[ii + 1, jj]
+    tope = np.concatenate([np.stack([a, d, c], axis=1), np.stack([a, c, b], axis=1)])
+
+    # --- Piezas de las celdas cortadas ---
+    #   etiqueta de vértice: nodo ≥ 0, punto medio = -(id de arista + 1)
+    n_h = filas * cols
+
+    def id_arista(i, j, k):
+        horizontal, di, dj = _ARISTAS[k]
+        return (0 if horizontal else n_h) + (i + di) * cols + (j + dj)
+
+    entradas, salidas, cadenas = [], [], []
+    ci, cj = np.nonzero((caso > 0) & (caso < 15))
+    nodos_celda = np.stack([ids[ci + di, cj + dj] for di, dj in _ESQUINAS], axis=1)
+
+    for i, j, cs, nodos in zip(ci.tolist(), cj.tolist(), caso[ci, cj].tolist(), nodos_celda.tolist()):
+        for entrada, esquinas, salida in _PIEZAS[cs]:
+            entradas.append(id_arista(i, j, entrada))
+            salidas.append(id_arista(i, j, salida))
+            cadenas.append([nodos[k] for k in esquinas])
+
+    # --- Contornos cerrados: la pieza siguiente sale por donde entró la anterior ---
+    por_salida = {s: k for k, s in enumerate(salidas)}
+    visitada = [False] * len(entradas)
+    contornos = []
+    for inicio in range(len(entradas)):
+        if visitada[inicio]:
+            continue
+        contorno = []
+        k = inicio
+        while not visitada[k]:
+            visitada[k] = True
+            contorno.append(k)
+            k = por_salida[entradas[k]]
+        contornos.append(contorno)
+
+    paso = min(abs(x_lin[1] - x_lin[0]), abs(y_lin[1] - y_lin[0]))
+    tolerancia = tolerancia_px * paso
+
+    # Solo los nodos de celdas cortadas intervienen en los tramos
+    usados = np.unique(nodos_celda[nodos_celda >= 0])
+    xy_puntos = (
+        dict(zip(usados.tolist(), xy_nodos[usados].tolist())),
+        _xy_medios(np.array(entradas), x_lin, y_lin).tolist(),
+        _xy_medios(np.array(salidas), x_lin, y_lin).tolist(),
+    )
+
+    tope_tramos = []          # triángulos con etiquetas (relieve)
+    paredes = []              # (arista inicio, arista fin) de cada cuerda
+
+    for contorno in contornos:
+        # Puntos del contorno: salida de la primera pieza y entrada de cada una
+        n = len(contorno)
+        xy_contorno = np.array([xy_puntos[2][contorno[0]]] + [xy_puntos[1][k] for k in contorno[:-1]])
+        conservados = _simplificar_cerrado(xy_contorno, tolerancia)
+
+        tramos = list(zip(conservados, conservados[1:] + [conservados[0] + n]))
+        while tramos:
+            desde, hasta = tramos.pop()
+            piezas = [contorno[k % n] for k in range(desde, hasta)]
+
+            triangulos = None
+            if len(piezas) <= MAX_PIEZAS_TRAMO:
+                triangulos = _triangular_tramo(piezas, entradas, salidas, cadenas, xy_puntos)
+
+            if triangulos is None:
+                medio = (desde + hasta) // 2
+                tramos += [(desde, medio), (medio, hasta)]
+                continue
+
+            tope_tramos += triangulos
+            paredes.append((salidas[piezas[0]], entradas[piezas[-1]]))
+
+    # --- Puntos medios conservados → vértices ---
+    paredes = np.array(paredes, dtype=np.int64).reshape(-1, 2)
+    etiquetas = np.array(tope_tramos, dtype=np.int64).reshape(-1, 3)
+    aristas_medios = np.unique(np.concatenate([paredes.ravel(), -etiquetas[etiquetas < 0] - 1]))
+    n_medios = len(aristas_medios)
+
+    def indice(etiquetas: np.ndarray) -> np.ndarray:
+        return np.where(
+            etiquetas >= 0,
+            etiquetas,
+            2 * n_nodos + np.searchsorted(aristas_medios, -etiquetas - 1),
+        )
+
+    # Z de cada punto medio: la del extremo de la arista que está dentro
+    horizontal = aristas_medios < n_h
+    resto = np.where(horizontal, aristas_medios, aristas_medios - n_h)
+    fi, fj = resto // cols, resto % cols
+    gi, gj = np.where(horizontal, fi, fi + 1), np.where(horizontal, fj + 1, fj)
+    z_medios = np.where(dentro[fi, fj], z_grid[fi, fj], z_grid[gi, gj])
+
+    vertices = np.empty((2 * n_nodos + 2 * n_medios, 3), dtype=np.float32)
+    vertices[:n_nodos, :2] = xy_nodos
+    vertices[:n_nodos, 2] = z_nodos
+    vertices[n_nodos:2 * n_nodos, :2] = xy_nodos
+    vertices[n_nodos:2 * n_nodos, 2] = 0
+    base_m = 2 * n_nodos
+    vertices[base_m:base_m + n_medios, :2] = _xy_medios(aristas_medios, x_lin, y_lin)
+    vertices[base_m:base_m + n_medios, 2] = z_medios
+    vertices[base_m + n_medios:, :2] = vertices[base_m:base_m + n_medios, :2]
+    vertices[base_m + n_medios:, 2] = 0
+
+    def a_base(caras: np.ndarray) -> np.ndarray:
+        return np.where(caras < n_nodos, caras + n_nodos, caras + n_medios)[:, ::-1]
+
+    # --- Relieve y base ---
+    tope = np.concatenate([tope, indice(etiquetas)]).astype(np.int32)
+    base = a_base(tope)
+
+    # --- Paredes: una por cuerda, normal hacia afuera (izquierda del recorrido) ---
+    p0 = base_m + np.searchsorted(aristas_medios, paredes[:, 0])
+    p1 = base_m + np.searchsorted(aristas_medios, paredes[:, 1])
+    q0, q1 = p0 + n_medios, p1 + n_medios
+    caras_pared = np.concatenate([
+        np.stack([p0, p1, q1], axis=1),
+        np.stack([p0, q1, q0], axis=1),
+    ]).astype(np.int32)
+
+    normales = np.concatenate([
+        calcular_normales(vertices, tope),
+        np.broadcast_to(np.array([0, 0, -1], dtype=np.float32), base.shape),
+        calcular_normales(vertices, caras_pared),
+    ])
+
+    return Malla(vertices, np.concatenate([tope, base, caras_pared]), normales)
+
+
+def _xy_medios(aristas: np.ndarray, x_lin: np.ndarray, y_lin: np.ndarray) -> np.ndarray:
+    """
+    Coordenadas XY del punto medio de cada arista de la grilla
+    (horizontales: fila * cols + col; verticales: desplazadas en filas * cols).
+    """
+    filas, cols = len(y_lin), len(x_lin)
+    n_h = filas * cols
+    horizontal = aristas < n_h
+    resto = np.where(horizontal, aristas, aristas - n_h)
+    i, j = resto // cols, resto % cols
+    x = np.where(horizontal, (x_lin[j] + x_lin[np.minimum(j + 1, cols - 1)]) / 2, x_lin[j])
+    y = np.where(horizontal, y_lin[i], (y_lin[i] + y_lin[np.minimum(i + 1, filas - 1)]) / 2)
+    return np.stack([x, y], axis=1)
+
+
+def _triangular_tramo(piezas, entradas, salidas, cadenas, xy_puntos):
+    """
+    Polígono de un tramo (piezas consecutivas del contorno cerradas por
+    la cuerda) triangulado. Devuelve triángulos con etiquetas de vértice
+    en sentido antihorario, o None si el polígono no es simple.
+    """
+    xy_nodos, xy_entradas, xy_salidas = xy_puntos
+    inicio, fin = piezas[0], piezas[-1]
+
+    # Cadena interior en sentido antihorario: del extremo inicial al final
+    cadena = []
+    for k in piezas:
+        for nodo in reversed(cadenas[k]):
+            if not cadena or cadena[-1] != nodo:
+                cadena.append(nodo)
+
+    etiquetas = [-(salidas[inicio] + 1)] + cadena + [-(entradas[fin] + 1)]
+    xy = [xy_salidas[inicio]] + [xy_nodos[nodo] for nodo in cadena] + [xy_entradas[fin]]
+
+    if len(piezas) == 1:
+        # La pieza de una celda es convexa: abanico desde el primer vértice
+        return [(etiquetas[0], etiquetas[k], etiquetas[k + 1]) for k in range(1, len(etiquetas) - 1)]
+
+    if len(set(cadena)) != len(cadena):
+        return None
+
+    # Toda la cadena estrictamente a la derecha de la cuerda (el interior)
+    (x0, y0), (x1, y1) = xy[0], xy[-1]
+    dx, dy = x1 - x0, y1 - y0
+    if any(dx * (y - y0) - dy * (x - x0) >= -_EPS for x, y in xy[1:-1]):
+        return None
+
+    triangulos = _recortar_orejas(xy)
+    if triangulos is None:
+        return None
+    return [(etiquetas[a], etiquetas[b], etiquetas[c]) for a, b, c in triangulos]
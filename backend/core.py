@@ -1,26 +1,109 @@
-import tempfile
-import os
-from stl.mesh import Mesh
+"""
+Serialización de mallas a STL binario
 
+Formato (little endian):
+- 80 bytes de cabecera
+- uint32 con la cantidad de triángulos
+- 50 bytes por triángulo: normal (3 float32), vértices (9 float32), atributo (uint16)
 
-def mesh_to_stl_bytes(modelo_mesh: Mesh) -> bytes:
+Los registros se escriben directamente sobre una vista estructurada de
+NumPy, sin archivos temporales ni recálculo de normales cuando la malla
+ya las trae.
+"""
+
+import struct
+from typing import Iterable, Iterator
+
+import numpy as np
+
+from malla import Malla
+
+
+CABECERA_STL = b"LithoMaker Pro - binary STL"
+
+STL_DTYPE = np.dtype([
+    ("normal", "<f4", (3,)),
+    ("vertices", "<f4", (3, 3)),
+    ("atributo", "<u2"),
+])
+
+# Triángulos por bloque al transmitir (≈3 MB por bloque)
+CARAS_POR_BLOQUE = 1 << 16
+
+
+def tamano_stl(malla: Malla) -> int:
+    """
+    Tamaño exacto en bytes del STL binario de la malla.
+    """
+    return 84 + STL_DTYPE.itemsize * malla.num_caras
+
+
+def _cabecera(num_caras: int) -> bytes:
+    return CABECERA_STL.ljust(80, b" ") + struct.pack("<I", num_caras)
+
+
+def _llenar_registros(registros: np.ndarray, malla: Malla, inicio: int, fin: int):
     """
-    Convierte un mesh STL a bytes usando archivo temporal seguro.
+    Escribe los triángulos [inicio, fin) en una vista estructurada STL.
     """
+    registros["vertices"] = malla.vertices[malla.caras[inicio:fin]]
+    registros["normal"] = malla.normales_caras()[inicio:fin]
+    registros["atributo"] = 0
 
-    tmp_path = None
 
-    try:
-        with tempfile.NamedTemporaryFile(
-            suffix=".stl",
-            delete=False
-        ) as tmp:
-            tmp_path = tmp.name
-            modelo_mesh.save(tmp_path)
+def mesh_to_stl_bytes(malla: Malla) -> bytearray:
+    """
+    Convierte una malla indexada a STL binario.
+
+    Se reserva un único buffer del tamaño exacto y se llena por bloques
+    (la expansión a triángulos nunca existe completa en memoria). Se
+    devuelve ese mismo bytearray: convertirlo a bytes duplicaría el pico.
+    """
+    buffer = bytearray(tamano_stl(malla))
+    buffer[:84] = _cabecera(malla.num_caras)
+
+    registros = np.frombuffer(buffer, dtype=STL_DTYPE, offset=84)
+    for inicio in range(0, malla.num_caras, CARAS_POR_BLOQUE):
+        fin = min(inicio + CARAS_POR_BLOQUE, malla.num_caras)
+        _llenar_registros(registros[inicio:fin], malla, inicio, fin)
+
+    return buffer
+
+
+def _iterar_registros(malla: Malla, caras_por_bloque: int) -> Iterator[bytes]:
+    registros = np.empty(min(caras_por_bloque, malla.num_caras), dtype=STL_DTYPE)
+
+    for inicio in range(0, malla.num_caras, caras_por_bloque):
+        fin = min(inicio + caras_por_bloque, malla.num_caras)
+        bloque = registros[:fin - inicio]
+        _llenar_registros(bloque, malla, inicio, fin)
+        yield bloque.tobytes()
+
+
+def iterar_stl_bytes(malla: Malla, caras_por_bloque: int = CARAS_POR_BLOQUE) -> Iterator[bytes]:
+    """
+    Genera el STL binario por bloques, para enviarlo con StreamingResponse
+    sin esperar a codificar la malla completa.
+    """
+    yield _cabecera(malla.num_caras)
+    yield from _iterar_registros(malla, caras_por_bloque)
+
+
+def iterar_stl_bandas(
+    bandas: Iterable[Malla], num_caras: int, caras_por_bloque: int = CARAS_POR_BLOQUE
+) -> Iterator[bytes]:
+    """
+    STL binario de una malla que llega por partes (p. ej. bandas de un
+    heightmap). La cantidad total de caras se conoce de antemano y cada
+    parte se libera apenas se codifica.
+    """
+    yield _cabecera(num_caras)
 
-        with open(tmp_path, "rb") as f:
-            return f.read()
+    emitidas = 0
+    for banda in bandas:
+        emitidas += banda.num_caras
+        yield from _iterar_registros(banda, caras_por_bloque)
+        del banda   # no retener la banda anterior mientras se genera la siguiente
 
-    finally:
-        if tmp_path and os.path.exists(tmp_path):
-            os.remove(tmp_path)
+    if emitidas != num_caras:
+        raise ValueError(f"Se anunciaron {num_caras} triángulos y se emitieron {emitidas}")
@@ -0,0 +1,232 @@
+"""
+Ejecución de la generación de mallas fuera del event loop
+
+La generación es CPU-bound: se envía a un pool de procesos para que
+uvicorn siga atendiendo otras peticiones (incluido /health) y se usen
+todos los núcleos. Un límite de trabajos en vuelo (ejecutando + en cola)
+rechaza rápido cuando el servidor está saturado.
+
+Los procesos reportan el avance de los trabajos asíncronos por una cola
+multiprocessing; un hilo del proceso principal la consume y lo entrega
+al callback al_progreso. Los tiempos por etapa vuelven con cada resultado
+y se entregan (junto con la espera en cola) al callback al_medir.
+
+Configuración por variables de entorno:
+- LITHO_WORKERS     → procesos del pool (por defecto: núcleos disponibles)
+- LITHO_MAX_COLA    → trabajos que pueden esperar turno (por defecto: 2 × workers)
+- LITHO_RETRY_AFTER → segundos sugeridos al cliente al rechazar (503)
+- LITHO_CALENTAR    → 1 para calentar cada proceso al iniciarlo (por defecto)
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import progreso
+from calentamiento import calentar_proceso
+
+
+logger = logging.getLogger("lithomaker")
+
+
+WORKERS = int(os.getenv("LITHO_WORKERS", os.cpu_count() or 1))
+MAX_COLA = int(os.getenv("LITHO_MAX_COLA", 2 * WORKERS))
+RETRY_AFTER_S = int(os.getenv("LITHO_RETRY_AFTER", 5))
+CALENTAR = os.getenv("LITHO_CALENTAR", "1") == "1"
+
+
+class Saturado(Exception):
+    """
+    No hay lugar en la cola: el cliente debe reintentar más tarde.
+    """
+
+
+async def reintentar_si_saturado(calcular):
+    """
+    Para trabajos en segundo plano: en vez de rechazar, espera
+    RETRY_AFTER_S y reintenta mientras el pool esté saturado.
+
+    calcular: corrutina sin argumentos
+    """
+    while True:
+        try:
+            return await calcular()
+        except Saturado:
+            await asyncio.sleep(RETRY_AFTER_S)
+
+
+def _pid_tras_espera(espera_s: float) -> int:
+    """
+    Tarea de calentamiento: retiene al worker un momento para que las
+    demás tareas de la ronda las tomen otros procesos.
+    """
+    time.sleep(espera_s)
+    return os.getpid()
+
+
+def _inicializar_proceso(cola, calentar):
+    """
+    Inicializador de cada worker: canal de progreso y calentamiento opcional.
+    """
+    progreso.configurar(cola)
+    if calentar is not None:
+        calentar()
+
+
+class EjecutorMallas:
+    """
+    Pool de procesos con límite de trabajos en vuelo.
+    """
+
+    def __init__(self, workers: int = WORKERS, max_cola: int = MAX_COLA, inicializador=None):
+        self.workers = max(1, workers)
+        self.max_cola = max(0, max_cola)
+        self.inicializador = inicializador
+        self.en_vuelo = 0
+        self.rechazados = 0
+        self._cupos = threading.Lock()
+        self.al_progreso = None
+        self.al_medir = None
+        self._pool = None
+        self._cola_progreso = None
+        self._hilo_progreso = None
+
+    @property
+    def capacidad(self) -> int:
+        return self.workers + self.max_cola
+
+    @property
+    def en_cola(self) -> int:
+        return max(0, self.en_vuelo - self.workers)
+
+    def iniciar(self):
+        if self._pool is None:
+            self._cola_progreso = multiprocessing.Queue()
+            self._hilo_progreso = threading.Thread(
+                target=self._consumir_progreso,
+                args=(self._cola_progreso,),
+                name="progreso-mallas",
+                daemon=True,
+            )
+            self._hilo_progreso.start()
+
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_inicializar_proceso,
+                initargs=(self._cola_progreso, self.inicializador),
+            )
+
+    def cerrar(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+            self._cola_progreso.put(None)
+            self._hilo_progreso.join(timeout=1)
+            self._cola_progreso = None
+            self._hilo_progreso = None
+
+    def _consumir_progreso(self, cola):
+        """
+        Hilo del proceso principal: entrega los reportes de los workers.
+        """
+        while True:
+            mensaje = cola.get()
+            if mensaje is None:
+                return
+            if self.al_progreso is not None:
+                try:
+                    self.al_progreso(*mensaje)
+                except Exception:
+                    logger.exception("Error procesando un reporte de progreso")
+
+    async def ejecutar(self, fn, *args, **kwargs):
+        """
+        Ejecuta fn(*args, **kwargs) en el pool.
+        Lanza Saturado sin encolar si ya se alcanzó la capacidad.
+        """
+        return await self._enviar(None, fn, args, kwargs)
+
+    async def ejecutar_trabajo(self, trabajo_id: str, fn, *args, **kwargs):
+        """
+        Como ejecutar, pero los reportes de progreso de fn llegan a
+        al_progreso asociados a trabajo_id.
+        """
+        return await self._enviar(trabajo_id, fn, args, kwargs)
+
+    async def _enviar(self, trabajo_id, fn, args, kwargs):
+        if self.en_vuelo >= self.capacidad:
+            self.rechazados += 1
+            raise Saturado()
+
+        self.iniciar()
+        with self._cupos:
+            self.en_vuelo += 1
+
+        enviado = time.time()
+        try:
+            futuro = self._pool.submit(
+                partial(progreso.ejecutar_en_worker, trabajo_id, fn, *args, **kwargs)
+            )
+        except BaseException:
+            self._liberar(None)
+            raise
+
+        # El cupo se libera cuando la tarea deja el pool, no cuando deja de
+        # esperarla quien la envió: si la petición se cancela, el worker sigue
+        # ocupado hasta terminar (la tarea solo se descarta si aún no empezó)
+        futuro.add_done_callback(self._liberar)
+        resultado, tiempos, inicio = await asyncio.wrap_future(futuro)
+
+        if self.al_medir is not None:
+            self.al_medir({"cola": max(0.0, inicio - enviado), **tiempos})
+
+        return resultado
+
+    def _liberar(self, _futuro):
+        """
+        Callback del futuro del pool (corre en un hilo del ejecutor).
+        """
+        with self._cupos:
+            self.en_vuelo -= 1
+
+    async def calentar(self, rondas: int = 20) -> set:
+        """
+        Espera a que todos los procesos del pool hayan arrancado (y
+        ejecutado su inicializador). Una tarea por worker no basta: un
+        proceso ya listo puede tomar varias. Se envían rondas de tareas
+        cortas hasta ver `workers` PIDs distintos o agotar las rondas.
+
+        Devuelve los PIDs vistos.
+        """
+        self.iniciar()
+        loop = asyncio.get_running_loop()
+
+        pids = set()
+        for ronda in range(rondas):
+            pids.update(await asyncio.gather(*[
+                loop.run_in_executor(self._pool, _pid_tras_espera, 0.01 * (ronda + 1))
+                for _ in range(self.workers)
+            ]))
+            if len(pids) >= self.workers:
+                return pids
+
+        logger.warning(f"Calentamiento incompleto: {len(pids)} de {self.workers} workers")
+        return pids
+
+    def estado(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_cola": self.max_cola,
+            "en_vuelo": self.en_vuelo,
+            "en_cola": self.en_cola,
+            "rechazados": self.rechazados,
+        }
+
+
+ejecutor = EjecutorMallas(inicializador=calentar_proceso if CALENTAR else None)
@@ -0,0 +1,199 @@
+"""
+Ensamblaje de piezas con transformaciones afines diferidas
+
+Un producto compuesto (bloque con texto, litofanía sobre un soporte...)
+es una lista de piezas: una malla, por lo general compartida desde una
+caché, más una matriz homogénea 4x4. Mover una pieza solo compone
+matrices; nada se copia hasta construir():
+
+    texto = Ensamblaje(glifos).rotar("y", 180).trasladar(dx=45, dy=20)
+    malla = Ensamblaje([Pieza(base), texto]).construir()
+
+construir() reserva de una vez los buffers de la malla final y escribe
+cada pieza con una única transformación (matmul + traslación) sobre su
+tramo del buffer. Las mallas de origen no se modifican.
+"""
+
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from malla import Malla, matriz_rotacion
+
+
+_IDENTIDAD = np.eye(3)
+
+
+# ============================================================
+# MATRICES HOMOGÉNEAS
+# ============================================================
+
+def matriz_traslacion(dx=0, dy=0, dz=0) -> np.ndarray:
+    matriz = np.eye(4)
+    matriz[:3, 3] = (dx, dy, dz)
+    return matriz
+
+
+def matriz_escala(sx=1.0, sy=1.0, sz=1.0) -> np.ndarray:
+    return np.diag([sx, sy, sz, 1.0])
+
+
+def matriz_afin(lineal, centro=None) -> np.ndarray:
+    """
+    Matriz 4x4 de una transformación lineal 3x3, opcionalmente
+    respecto a un centro: p → lineal · (p - centro) + centro.
+    """
+    lineal = np.asarray(lineal, dtype=np.float64)
+    matriz = np.eye(4)
+    matriz[:3, :3] = lineal
+
+    if centro is not None:
+        centro = np.asarray(centro, dtype=np.float64)
+        matriz[:3, 3] = centro - lineal @ centro
+
+    return matriz
+
+
+def aplicar_matriz(matriz: np.ndarray, puntos: np.ndarray, destino: np.ndarray) -> np.ndarray:
+    """
+    destino = puntos transformados por la matriz 4x4 (puntos (N, 3)).
+    Un solo matmul escrito directo en destino, más la traslación en el
+    lugar; la identidad y la traslación nula se omiten.
+    """
+    lineal = matriz[:3, :3]
+    traslacion = matriz[:3, 3]
+
+    if (lineal == _IDENTIDAD).all():
+        np.copyto(destino, puntos)
+    else:
+        np.matmul(puntos, lineal.T.astype(destino.dtype), out=destino)
+
+    if traslacion.any():
+        destino += traslacion.astype(destino.dtype)
+
+    return destino
+
+
+def _aplicar_normales(matriz: np.ndarray, normales: np.ndarray, destino: np.ndarray):
+    """
+    Las normales se transforman con la inversa traspuesta de la parte
+    lineal; en rotaciones (el caso común) es la misma matriz.
+    """
+    lineal = matriz[:3, :3]
+
+    if (lineal == _IDENTIDAD).all():
+        np.copyto(destino, normales)
+        return
+
+    if np.abs(lineal @ lineal.T - _IDENTIDAD).max() <= 1e-9:
+        np.matmul(normales, lineal.T.astype(np.float32), out=destino)
+        return
+
+    np.matmul(normales, np.linalg.inv(lineal).astype(np.float32), out=destino)
+    largo = np.linalg.norm(destino, axis=1, keepdims=True)
+    np.divide(destino, largo, out=destino, where=largo > 0)
+
+
+# ============================================================
+# PIEZAS Y ENSAMBLAJES
+# ============================================================
+
+class _Movible:
+    """
+    rotar/trasladar en términos de transformar(matriz 4x4).
+    Cada llamada compone a la izquierda: se aplica después de las previas.
+    """
+
+    def transformar(self, matriz: np.ndarray):
+        raise NotImplementedError
+
+    def rotar(self, eje="y", grados=90, centro=None):
+        return self.transformar(matriz_afin(matriz_rotacion(eje, grados), centro))
+
+    def trasladar(self, dx=0, dy=0, dz=0):
+        return self.transformar(matriz_traslacion(dx, dy, dz))
+
+    def escalar(self, sx=1.0, sy=1.0, sz=1.0):
+        return self.transformar(matriz_escala(sx, sy, sz))
+
+
+@dataclass(frozen=True)
+class Pieza(_Movible):
+    """
+    Malla (no se copia ni se modifica) + transformación diferida.
+    El nombre identifica el cuerpo en formatos con varios (3MF).
+    """
+    malla: Malla
+    matriz: np.ndarray = field(default_factory=lambda: np.eye(4))
+    nombre: str = ""
+
+    def transformar(self, matriz: np.ndarray) -> "Pieza":
+        return Pieza(self.malla, np.asarray(matriz, dtype=np.float64) @ self.matriz, self.nombre)
+
+
+class Ensamblaje(_Movible):
+    """
+    Conjunto de piezas que se mueve como un todo y se construye
+    en una sola malla.
+    """
+
+    def __init__(self, piezas=()):
+        self.piezas: "list[Pieza]" = []
+        for pieza in piezas:
+            self.agregar(pieza)
+
+    def agregar(self, pieza) -> "Ensamblaje":
+        """
+        Agrega una Malla, una Pieza o las piezas de otro Ensamblaje.
+        """
+        if isinstance(pieza, Ensamblaje):
+            self.piezas.extend(pieza.piezas)
+        elif isinstance(pieza, Malla):
+            self.piezas.append(Pieza(pieza))
+        else:
+            self.piezas.append(pieza)
+        return self
+
+    def transformar(self, matriz: np.ndarray) -> "Ensamblaje":
+        return Ensamblaje(pieza.transformar(matriz) for pieza in self.piezas)
+
+    @property
+    def num_vertices(self) -> int:
+        return sum(p.malla.num_vertices for p in self.piezas)
+
+    @property
+    def num_caras(self) -> int:
+        return sum(p.malla.num_caras for p in self.piezas)
+
+    def construir(self) -> Malla:
+        """
+        Malla final: vértices, caras (con índices desplazados) y normales
+        escritos pieza por pieza en buffers reservados una sola vez.
+        Las reflexiones (determinante negativo) invierten el orden de las
+        caras para conservar la orientación hacia afuera.
+        """
+        piezas = [p for p in self.piezas if p.malla.num_caras]
+
+        vertices = np.empty((sum(p.malla.num_vertices for p in piezas), 3), dtype=np.float32)
+        caras = np.empty((sum(p.malla.num_caras for p in piezas), 3), dtype=np.int32)
+        normales = None
+        if any(p.malla.normales is not None for p in piezas):
+            normales = np.empty(caras.shape, dtype=np.float32)
+
+        iv = ic = 0
+        for pieza in piezas:
+            malla = pieza.malla
+            fv, fc = iv + malla.num_vertices, ic + malla.num_caras
+
+            aplicar_matriz(pieza.matriz, malla.vertices, vertices[iv:fv])
+
+            np.add(malla.caras, iv, out=caras[ic:fc])
+            if np.linalg.det(pieza.matriz[:3, :3]) < 0:
+                caras[ic:fc, 1:] = caras[ic:fc, :0:-1]
+
+            if normales is not None:
+                _aplicar_normales(pieza.matriz, malla.normales_caras(), normales[ic:fc])
+
+            iv, ic = fv, fc
+
+        return Malla(vertices, caras, normales)
@@ -0,0 +1,128 @@
+"""
+Formas paramétricas del producto (Corazón, Círculo, Cuadrado)
+
+Alternativa al contorno rojo pintado por el cliente: el marco y la zona
+de litofanía salen de un campo de distancia con signo (SDF) de la forma,
+en mm sobre la grilla de trabajo (negativo dentro):
+
+- marco     : dentro de la forma y a menos de `ancho_marco` mm del borde
+- interior  : toda la forma (marco + litofanía)
+
+Mismas proporciones que el configurador Streamlit (app.py): el lienzo
+cubre [-1.6, 1.6] unidades por lado. El SDF se cachea por
+(forma, resolución, lado) y las máscaras por (…, ancho del marco), en
+cada proceso de generación.
+"""
+
+from functools import lru_cache
+import unicodedata
+
+import numpy as np
+from scipy.ndimage import distance_transform_edt
+
+
+FORMAS = ("corazon", "circulo", "cuadrado")
+
+RANGO = 1.6              # Medio lado del lienzo en unidades de la forma
+RADIO_CIRCULO = 1.3
+LADO_CUADRADO = 1.3      # Medio lado
+RADIO_CORAZON = 1.6
+
+ANCHO_MARCO_MIN = 1.0    # mm
+ANCHO_MARCO_MAX = 15.0   # mm
+
+CACHE_SDF = 16
+CACHE_MASCARAS = 32
+
+
+def normalizar_forma(forma: str) -> str:
+    """
+    "Corazón" → "corazon". Error si no es una forma conocida.
+    """
+    nombre = unicodedata.normalize("NFKD", forma.strip().lower())
+    nombre = "".join(c for c in nombre if not unicodedata.combining(c))
+    if nombre not in FORMAS:
+        raise ValueError(f"Forma no soportada: {forma} (usa {', '.join(FORMAS)})")
+    return nombre
+
+
+def validar_ancho_marco(ancho_marco: float):
+    if not ANCHO_MARCO_MIN <= ancho_marco <= ANCHO_MARCO_MAX:
+        raise ValueError(
+            f"El ancho del marco debe estar entre {ANCHO_MARCO_MIN:g} y {ANCHO_MARCO_MAX:g} mm"
+        )
+
+
+# ============================================================
+# CAMPOS DE DISTANCIA
+# ============================================================
+
+def _coordenadas(pixels: int):
+    """
+    Coordenadas de la forma en cada nodo (fila 0 arriba, como la imagen).
+    """
+    lin = np.linspace(-RANGO, RANGO, pixels, dtype=np.float32)
+    return lin[None, :], -lin[:, None]
+
+
+def _sdf_circulo(x, y):
+    return np.sqrt(x * x + y * y) - RADIO_CIRCULO
+
+
+def _sdf_cuadrado(x, y):
+    dx = np.abs(x) - LADO_CUADRADO
+    dy = np.abs(y) - LADO_CUADRADO
+    fuera = np.hypot(np.maximum(dx, 0), np.maximum(dy, 0))
+    return fuera + np.minimum(np.maximum(dx, dy), 0)
+
+
+def _sdf_por_mascara(dentro: np.ndarray, paso: float) -> np.ndarray:
+    """
+    SDF euclidiano exacto (en la grilla) de una región sin fórmula cerrada
+    de distancia, en las unidades de `paso`.
+    """
+    sdf = distance_transform_edt(~dentro, sampling=paso).astype(np.float32)
+    sdf -= distance_transform_edt(dentro, sampling=paso)
+    return sdf
+
+
+@lru_cache(maxsize=CACHE_SDF)
+def sdf_forma(forma: str, pixels: int, lado_mm: float) -> np.ndarray:
+    """
+    Distancia con signo al borde de la forma, en mm, (pixels, pixels) float32.
+    El resultado es compartido (caché): es de solo lectura.
+    """
+    x, y = _coordenadas(pixels)
+    mm_por_unidad = lado_mm / (2 * RANGO)
+
+    if forma == "circulo":
+        sdf = _sdf_circulo(x, y) * np.float32(mm_por_unidad)
+    elif forma == "cuadrado":
+        sdf = _sdf_cuadrado(x, y) * np.float32(mm_por_unidad)
+    elif forma == "corazon":
+        # Implícita, no es distancia: se mide sobre la región
+        dentro = (x * x + (y - 0.6 * np.sqrt(np.abs(x))) ** 2) <= RADIO_CORAZON
+        sdf = _sdf_por_mascara(dentro, lado_mm / (pixels - 1))
+    else:
+        raise ValueError(f"Forma no soportada: {forma}")
+
+    sdf = sdf.astype(np.float32, copy=False)
+    sdf.setflags(write=False)
+    return sdf
+
+
+@lru_cache(maxsize=CACHE_MASCARAS)
+def mascaras_forma(forma: str, pixels: int, ancho_marco: float, lado_mm: float):
+    """
+    (marco, interior) de la forma, como máscaras bool de solo lectura.
+    Equivalen al contorno rojo y a su relleno en el flujo por imagen.
+    """
+    validar_ancho_marco(ancho_marco)
+
+    sdf = sdf_forma(forma, pixels, lado_mm)
+    interior = sdf <= 0
+    marco = interior & (sdf > -ancho_marco)
+
+    for mascara in (marco, interior):
+        mascara.setflags(write=False)
+    return marco, interior
@@ -0,0 +1,340 @@
+"""
+Formatos de salida compactos
+
+Además del STL binario (core.py), las mallas indexadas se pueden entregar
+como:
+- 3MF   : ZIP con XML de vértices compartidos y triángulos por índice
+- malla : binario indexado y cuantizado para el visor web
+- STL con Content-Encoding gzip
+
+Todos los codificadores trabajan sobre los arrays de la malla y producen
+bloques de bytes (para StreamingResponse), sin archivos temporales.
+También aceptan un Ensamblaje (ensamblaje.py): el 3MF lleva un objeto
+por pieza con su transformación; los demás formatos lo construyen en
+una sola malla al empezar a transmitir.
+
+Formato "malla" (little endian):
+- 4 bytes  : b"LMSH"
+- uint8    : versión (1)
+- uint8    : bytes por índice (2 o 4)
+- uint16   : reservado
+- uint32   : cantidad de vértices
+- uint32   : cantidad de triángulos
+- 3 float32: origen
+- 3 float32: escala  (posición = origen + q * escala)
+- uint16 (V, 3): vértices cuantizados
+- uint16/uint32 (F, 3): índices
+"""
+
+import struct
+import zipfile
+import zlib
+from typing import Iterator, Optional
+
+import numpy as np
+
+from core import iterar_stl_bytes, tamano_stl
+from ensamblaje import Ensamblaje
+from malla import Malla
+
+
+# Nombre → (media type, extensión)
+FORMATOS = {
+    "stl": ("application/sla", ".stl"),
+    "3mf": ("model/3mf", ".3mf"),
+    "malla": ("application/vnd.lithomaker.malla", ".lmsh"),
+}
+
+# Tipos alternativos reconocidos en Accept
+ALIAS_ACCEPT = {
+    "model/stl": "stl",
+    "application/vnd.ms-package.3dmanufacturing-3dmodel+xml": "3mf",
+}
+
+# Formatos que ya vienen comprimidos (no se aplica gzip encima)
+COMPRIMIDOS = {"3mf"}
+
+MAGIA_MALLA = b"LMSH"
+VERSION_MALLA = 1
+
+# Filas de XML por bloque al codificar 3MF
+FILAS_POR_BLOQUE = 1 << 16
+
+
+# ============================================================
+# NEGOCIACIÓN
+# ============================================================
+
+def negociar_formato(formato: Optional[str], accept: Optional[str]) -> str:
+    """
+    El parámetro explícito manda; si no hay, se toma el primer tipo
+    conocido de la cabecera Accept. Por defecto, STL.
+    """
+    if formato:
+        formato = formato.lower()
+        if formato not in FORMATOS:
+            raise ValueError(f"Formato no soportado: {formato} (usa {', '.join(FORMATOS)})")
+        return formato
+
+    for parte in (accept or "").split(","):
+        tipo = parte.split(";")[0].strip().lower()
+        for nombre, (media_type, _) in FORMATOS.items():
+            if tipo == media_type:
+                return nombre
+        if tipo in ALIAS_ACCEPT:
+            return ALIAS_ACCEPT[tipo]
+
+    return "stl"
+
+
+def acepta_gzip(accept_encoding: Optional[str]) -> bool:
+    for parte in (accept_encoding or "").split(","):
+        codificacion, _, parametro = parte.partition(";")
+        if codificacion.strip().lower() != "gzip":
+            continue
+        parametro = parametro.strip().replace(" ", "")
+        if not parametro.startswith("q="):
+            return True
+        try:
+            return float(parametro[2:]) > 0
+        except ValueError:
+            return True
+    return False
+
+
+# ============================================================
+# ZIP EN STREAMING
+# ============================================================
+
+class SalidaZip:
+    """
+    Destino no buscable para ZipFile: acumula lo escrito hasta que se drena.
+    """
+
+    def __init__(self):
+        self._partes = []
+
+    def write(self, datos) -> int:
+        self._partes.append(bytes(datos))
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def drenar(self) -> bytes:
+        datos = b"".join(self._partes)
+        self._partes.clear()
+        return datos
+
+
+# ============================================================
+# 3MF
+# ============================================================
+
+CONTENT_TYPES_3MF = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="model" ContentType="application/vnd.ms-package.3dmanufacturing-3dmodel+xml"/>'
+    '</Types>'
+)
+
+RELS_3MF = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Target="/3D/3dmodel.model" Id="rel0" '
+    'Type="http://schemas.microsoft.com/3dmanufacturing/2013/01/3dmodel"/>'
+    '</Relationships>'
+)
+
+
+def _filas_xml(plantilla: str, valores: np.ndarray) -> Iterator[bytes]:
+    """
+    Formatea el array fila a fila con la plantilla, por bloques.
+    Un único % sobre todo el bloque es mucho más rápido que np.savetxt.
+    """
+    for inicio in range(0, len(valores), FILAS_POR_BLOQUE):
+        bloque = valores[inicio:inicio + FILAS_POR_BLOQUE]
+        yield ((plantilla * len(bloque)) % tuple(bloque.ravel().tolist())).encode()
+
+
+def _transformacion_3mf(matriz: np.ndarray) -> str:
+    """
+    Atributo transform de un item 3MF (vectores fila: p' = p · M, 4x3).
+    """
+    filas = np.vstack([matriz[:3, :3].T, matriz[:3, 3]])
+    if np.array_equal(filas, np.eye(4, 3)):
+        return ""
+    return ' transform="%s"' % " ".join(f"{v:.6f}" for v in filas.ravel().tolist())
+
+
+def _objetos_3mf(malla, nombre: str):
+    """
+    (nombre, malla, matriz) por objeto: uno por pieza de un Ensamblaje.
+    """
+    if not isinstance(malla, Ensamblaje):
+        return [(nombre, malla, np.eye(4))]
+    return [
+        (pieza.nombre or f"{nombre}_{k}", pieza.malla, pieza.matriz)
+        for k, pieza in enumerate(malla.piezas, 1)
+    ]
+
+
+def _modelo_3mf(malla, nombre: str) -> Iterator[bytes]:
+    objetos = _objetos_3mf(malla, nombre)
+
+    yield (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<model unit="millimeter" xml:lang="es-CL" '
+        'xmlns="http://schemas.microsoft.com/3dmanufacturing/core/2015/02"><resources>'
+    ).encode()
+
+    for id_objeto, (nombre_objeto, malla_objeto, _) in enumerate(objetos, 1):
+        yield f'<object id="{id_objeto}" name="{nombre_objeto}" type="model"><mesh><vertices>'.encode()
+
+        yield from _filas_xml('<vertex x="%.4f" y="%.4f" z="%.4f"/>', malla_objeto.vertices)
+
+        yield b"</vertices><triangles>"
+
+        yield from _filas_xml('<triangle v1="%d" v2="%d" v3="%d"/>', malla_objeto.caras)
+
+        yield b"</triangles></mesh></object>"
+
+    items = "".join(
+        f'<item objectid="{id_objeto}"{_transformacion_3mf(matriz)}/>'
+        for id_objeto, (_, _, matriz) in enumerate(objetos, 1)
+    )
+    yield f"</resources><build>{items}</build></model>".encode()
+
+
+def iterar_3mf(malla, nombre: str = "litofania") -> Iterator[bytes]:
+    """
+    Genera el paquete 3MF por fragmentos (ZIP en streaming).
+    Con un Ensamblaje, cada pieza es un objeto con su propia
+    transformación (sin copiar ni transformar sus vértices).
+    """
+    salida = SalidaZip()
+
+    with zipfile.ZipFile(salida, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", CONTENT_TYPES_3MF)
+        zf.writestr("_rels/.rels", RELS_3MF)
+
+        with zf.open("3D/3dmodel.model", "w", force_zip64=True) as destino:
+            for bloque in _modelo_3mf(malla, nombre):
+                destino.write(bloque)
+                fragmento = salida.drenar()
+                if fragmento:
+                    yield fragmento
+
+    yield salida.drenar()
+
+
+def malla_a_3mf(malla: Malla, nombre: str = "litofania") -> bytes:
+    return b"".join(iterar_3mf(malla, nombre))
+
+
+# ============================================================
+# BINARIO INDEXADO CUANTIZADO (VISOR WEB)
+# ============================================================
+
+def iterar_malla_compacta(malla: Malla) -> Iterator[bytes]:
+    """
+    Vértices cuantizados a uint16 dentro de su caja envolvente (error
+    máximo: medio paso, ~0.7 µm en 90 mm) e índices de 16 o 32 bits.
+    """
+    vertices = malla.vertices
+    if malla.num_vertices:
+        origen = vertices.min(axis=0)
+        extension = vertices.max(axis=0) - origen
+    else:
+        origen = extension = np.zeros(3, dtype=np.float32)
+
+    escala = np.where(extension > 0, extension / 65535.0, 1.0).astype(np.float32)
+    bytes_indice = 2 if malla.num_vertices <= 0xFFFF else 4
+
+    yield struct.pack(
+        "<4sBBHII3f3f",
+        MAGIA_MALLA, VERSION_MALLA, bytes_indice, 0,
+        malla.num_vertices, malla.num_caras,
+        *origen.tolist(), *escala.tolist(),
+    )
+
+    cuantizados = np.clip(np.rint((vertices - origen) / escala), 0, 0xFFFF)
+    yield cuantizados.astype("<u2").tobytes()
+
+    yield malla.caras.astype("<u2" if bytes_indice == 2 else "<u4").tobytes()
+
+
+def tamano_malla_compacta(malla: Malla) -> int:
+    bytes_indice = 2 if malla.num_vertices <= 0xFFFF else 4
+    return (
+        struct.calcsize("<4sBBHII3f3f")
+        + 6 * malla.num_vertices
+        + 3 * bytes_indice * malla.num_caras
+    )
+
+
+def leer_malla_compacta(datos: bytes) -> Malla:
+    """
+    Decodificador de referencia del formato "malla".
+    """
+    magia, version, bytes_indice, _, n_v, n_f, *resto = struct.unpack_from("<4sBBHII3f3f", datos)
+    if magia != MAGIA_MALLA or version != VERSION_MALLA:
+        raise ValueError("No es una malla compacta válida")
+
+    origen = np.array(resto[:3], dtype=np.float32)
+    escala = np.array(resto[3:], dtype=np.float32)
+
+    offset = struct.calcsize("<4sBBHII3f3f")
+    q = np.frombuffer(datos, dtype="<u2", count=n_v * 3, offset=offset).reshape(-1, 3)
+    offset += q.nbytes
+    caras = np.frombuffer(
+        datos, dtype="<u2" if bytes_indice == 2 else "<u4", count=n_f * 3, offset=offset
+    ).reshape(-1, 3)
+
+    return Malla(origen + q * escala, caras)
+
+
+# ============================================================
+# GZIP
+# ============================================================
+
+def iterar_gzip(bloques: Iterator[bytes], nivel: int = 1) -> Iterator[bytes]:
+    """
+    Comprime un flujo de bloques como un único miembro gzip.
+    """
+    compresor = zlib.compressobj(nivel, zlib.DEFLATED, 31)
+    for bloque in bloques:
+        comprimido = compresor.compress(bloque)
+        if comprimido:
+            yield comprimido
+    yield compresor.flush()
+
+
+def tamano_formato(malla: Malla, formato: str) -> Optional[int]:
+    """
+    Tamaño exacto sin comprimir, si se conoce de antemano (3MF no).
+    """
+    if formato == "stl":
+        return tamano_stl(malla)
+    if formato == "malla":
+        return tamano_malla_compacta(malla)
+    return None
+
+
+def _iterar_construido(ensamblaje: Ensamblaje, formato: str, nombre: str) -> Iterator[bytes]:
+    # Generador: la construcción corre al pedir el primer bloque
+    # (fuera del event loop, en el threadpool de StreamingResponse)
+    yield from iterar_formato(ensamblaje.construir(), formato, nombre)
+
+
+def iterar_formato(malla, formato: str, nombre: str = "litofania") -> Iterator[bytes]:
+    if isinstance(malla, Ensamblaje) and formato != "3mf":
+        return _iterar_construido(malla, formato, nombre)
+    if formato == "stl":
+        return iterar_stl_bytes(malla)
+    if formato == "3mf":
+        return iterar_3mf(malla, nombre)
+    if formato == "malla":
+        return iterar_malla_compacta(malla)
+    raise ValueError(f"Formato no soportado: {formato}")
@@ -0,0 +1,90 @@
+"""
+Ingesta de imágenes subidas
+
+- Límites configurables de bytes y de píxeles (protección contra bombas
+  de descompresión), verificados con la cabecera antes de decodificar
+- JPEG en modo draft: el decodificador escala por DCT (1/2, 1/4, 1/8) y
+  entrega una imagen apenas mayor que la grilla de trabajo, así que el
+  costo de decodificar casi no depende de los megapíxeles de la foto
+- Una sola redimensión al tamaño final, sin copias intermedias
+"""
+
+import io
+import os
+
+from PIL import Image, UnidentifiedImageError
+
+
+MAX_BYTES = int(float(os.getenv("LITHO_MAX_MB", 20)) * 1024 * 1024)
+MAX_PIXELES = int(float(os.getenv("LITHO_MAX_MPX", 50)) * 1_000_000)
+
+FORMATOS_IMAGEN = ("PNG", "JPEG")
+
+# Reducción previa por bloques antes del filtro LANCZOS (ver Image.resize):
+# con factores grandes es mucho más rápida y el resultado no se distingue
+REDUCING_GAP = 3.0
+
+
+class ImagenDemasiadoGrande(ValueError):
+    """
+    La imagen supera LITHO_MAX_MB o LITHO_MAX_MPX (HTTP 413).
+    """
+
+
+def verificar_bytes(n_bytes: int):
+    if n_bytes > MAX_BYTES:
+        raise ImagenDemasiadoGrande(
+            f"La imagen pesa {n_bytes / 1024 / 1024:.1f} MB (máximo {MAX_BYTES / 1024 / 1024:g} MB)"
+        )
+
+
+def abrir_imagen(imagen_bytes: bytes) -> Image.Image:
+    """
+    Abre la imagen sin decodificarla (solo lee la cabecera) y valida
+    formato, bytes y píxeles.
+    """
+    verificar_bytes(len(imagen_bytes))
+
+    try:
+        img = Image.open(io.BytesIO(imagen_bytes), formats=FORMATOS_IMAGEN)
+    except Image.DecompressionBombError:
+        raise ImagenDemasiadoGrande(f"La imagen supera los {MAX_PIXELES / 1e6:g} MP")
+    except UnidentifiedImageError:
+        raise ValueError("No se pudo leer la imagen (se aceptan PNG o JPG)")
+
+    ancho, alto = img.size
+    if ancho * alto > MAX_PIXELES:
+        raise ImagenDemasiadoGrande(
+            f"La imagen tiene {ancho}x{alto} px (máximo {MAX_PIXELES / 1e6:g} MP)"
+        )
+
+    return img
+
+
+def decodificar(imagen_bytes: bytes, lado: int) -> Image.Image:
+    """
+    Decodifica la imagen lo más cerca posible de lado × lado (JPEG en
+    modo draft; el resto, a resolución completa).
+    """
+    img = abrir_imagen(imagen_bytes)
+
+    if img.format == "JPEG":
+        img.draft("RGB", (lado, lado))
+
+    img.load()
+    return img
+
+
+def redimensionar(img: Image.Image, lado: int) -> Image.Image:
+    """
+    Lleva la imagen a lado × lado en una pasada. Devuelve modo "RGB", o
+    "L" si ya venía en gris (un solo canal: la luminancia es la imagen).
+    """
+    if img.mode not in ("RGB", "L"):
+        # Paleta, transparencia, CMYK...: a RGB antes de filtrar
+        img = img.convert("RGB")
+
+    if img.size != (lado, lado):
+        img = img.resize((lado, lado), Image.Resampling.LANCZOS, reducing_gap=REDUCING_GAP)
+
+    return img
@@ -3,25 +3,33 @@
 # ============================================================
 # numpy        → manejo de arrays, máscaras y vértices
 # PIL          → renderizado de texto a imagen (heightmap)
-# stl.mesh     → creación del STL
+# malla        → malla indexada (vértices compartidos)
+# ensamblaje   → composición de piezas con transformaciones diferidas
 # mesh_to_stl  → conversión final a bytes (API / descarga)
+# lru_cache    → memoización de fuentes, bloque base y textos
 # ============================================================
 
+from functools import lru_cache
+import os
+
 import numpy as np
 from PIL import Image, ImageDraw, ImageFont
-from stl import mesh
-import math
 
 from core import mesh_to_stl_bytes
+from ensamblaje import Ensamblaje, Pieza, aplicar_matriz, matriz_afin
+from malla import Malla, malla_heightmap, malla_extruida_x, matriz_rotacion
+from progreso import etapa, reportar
 
 
 # ============================================================
 # PARÁMETROS DE INGENIERÍA (ESCALA Y DIMENSIONES FÍSICAS)
 # ============================================================
 
-# Resolución global:
+# Resolución por defecto:
 # 5 píxeles representan 1 mm físico
 RES_PX_MM = 5.0
+RES_PX_MM_MIN = 1.0      # vista previa más gruesa admitida
+RES_PX_MM_MAX = 10.0
 
 # Dimensiones del bloque base (mm)
 BASE_ANCHO_MM = 45.0
@@ -36,6 +44,12 @@ TEXTO_Z_MM = 12.0         # espesor del texto (extrusión)
 # Cantidad máxima de caracteres pensada para el escalado automático
 MAX_CHARS = 12
 
+# Fuente tipográfica (junto a este módulo, independiente del cwd)
+FUENTE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Montserrat-ExtraBold.ttf")
+
+# Textos cuya malla final se mantiene memoizada por proceso
+CACHE_TEXTOS = int(os.getenv("LITHO_CACHE_TEXTOS", 64))
+
 
 # ============================================================
 # CARGA DE FUENTE TIPOGRÁFICA
@@ -45,23 +59,28 @@ def cargar_fuente(size_px):
     """
     Carga una fuente TrueType en tamaño píxel.
     Si falla, utiliza la fuente por defecto del sistema.
+    Cada tamaño se abre una sola vez por proceso.
     """
+    return _fuente(int(size_px))
+
+
+@lru_cache(maxsize=None)
+def _fuente(size_px: int):
     try:
-        return ImageFont.truetype("./Montserrat-ExtraBold.ttf", int(size_px))
-    except:
+        return ImageFont.truetype(FUENTE_PATH, size_px)
+    except OSError:
         return ImageFont.load_default()
 
 
 # ============================================================
 # GENERACIÓN DEL HEIGHTMAP DEL TEXTO
 # ============================================================
-def generar_texto_heightmap(texto: str, ancho_mm=TEXTO_X_MM, alto_mm=TEXTO_Y_MM, debug=False):
-
-    px_w = int(ancho_mm * RES_PX_MM)
-    px_h = int(alto_mm * RES_PX_MM)
-
-    img = Image.new("L", (px_w, px_h), 0)
-    draw = ImageDraw.Draw(img)
+def medir_texto(texto: str, px_w: int, px_h: int):
+    """
+    Calcula el tamaño de fuente y la posición X (origen del primer
+    carácter) para que el texto quepa centrado en un lienzo px_w × px_h.
+    """
+    draw = ImageDraw.Draw(Image.new("L", (1, 1), 0))
 
     n = max(len(texto), 1)
     FONT_BASE_PX = int(px_h * 0.8)
@@ -74,7 +93,6 @@ def generar_texto_heightmap(texto: str, ancho_mm=TEXTO_X_MM, alto_mm=TEXTO_Y_MM,
     # -------------------------------------------------
     bbox = draw.textbbox((0, 0), texto, font=font, anchor="lt")
     text_w = bbox[2] - bbox[0]
-    text_h = bbox[3] - bbox[1]
 
     # Ajuste FINAL si aún se pasa del ancho
     if text_w > px_w:
@@ -88,6 +106,20 @@ def generar_texto_heightmap(texto: str, ancho_mm=TEXTO_X_MM, alto_mm=TEXTO_Y_MM,
     # -------------------------------------------------
     x = (px_w - text_w) // 2
 
+    return font_size, x
+
+
+def generar_texto_heightmap(texto: str, ancho_mm=TEXTO_X_MM, alto_mm=TEXTO_Y_MM, debug=False, res_px_mm=RES_PX_MM):
+
+    px_w = int(ancho_mm * res_px_mm)
+    px_h = int(alto_mm * res_px_mm)
+
+    img = Image.new("L", (px_w, px_h), 0)
+    draw = ImageDraw.Draw(img)
+
+    font_size, x = medir_texto(texto, px_w, px_h)
+    font = cargar_fuente(font_size)
+
     # Baseline EXACTO en el borde inferior
     baseline_y = px_h
 
@@ -112,58 +144,131 @@ def generar_texto_heightmap(texto: str, ancho_mm=TEXTO_X_MM, alto_mm=TEXTO_Y_MM,
     return z, mask
 
 
+# ============================================================
+# CACHÉ DE GLIFOS (MALLA POR CARÁCTER)
+# ============================================================
+
+# Alfabeto que se precalienta al arrancar
+ALFABETO_COMUN = (
+    "ABCDEFGHIJKLMNÑOPQRSTUVWXYZ"
+    "abcdefghijklmnñopqrstuvwxyz"
+    "ÁÉÍÓÚÜáéíóúü0123456789&!?.,-'♥ "
+)
+
+# Glifos (carácter, resolución) memoizados por proceso
+CACHE_GLIFOS = int(os.getenv("LITHO_CACHE_GLIFOS", 1024))
+
+
+def tamano_referencia(res_px_mm: float = RES_PX_MM) -> int:
+    """
+    Tamaño de fuente (px) al que se rasterizan los glifos: el máximo que
+    puede dar medir_texto. Cada texto escala sus glifos hacia abajo.
+    """
+    font_size, _ = medir_texto("", int(TEXTO_X_MM * res_px_mm), int(TEXTO_Y_MM * res_px_mm))
+    return font_size
+
+
+@lru_cache(maxsize=CACHE_GLIFOS)
+def malla_glifo(caracter: str, res_px_mm: float = RES_PX_MM):
+    """
+    Malla extruida de un único carácter al tamaño de referencia, con la
+    línea base en Y = 0 (borde inferior del lienzo, igual que el texto
+    completo), a res_px_mm píxeles por milímetro.
+
+    La clave es solo (carácter, resolución): el tamaño de cada texto se
+    aplica como escala en componer_texto, así el calentamiento sirve
+    para cualquier texto. Llamar siempre con argumentos posicionales.
+
+    Devuelve (malla, origen_px): origen_px es la columna del lienzo del
+    glifo donde cae el origen de escritura del carácter.
+    La malla es compartida y no debe modificarse.
+    """
+    alto_px = int(TEXTO_Y_MM * res_px_mm)
+    font = cargar_fuente(tamano_referencia(res_px_mm))
+    izq, _, der, _ = font.getbbox(caracter, anchor="ls")
+
+    # Un píxel de margen: el mallador descarta la última fila/columna
+    margen = 1
+    origen_px = margen - min(izq, 0)
+    ancho_px = origen_px + max(der, 0) + margen + 1
+
+    img = Image.new("L", (ancho_px, alto_px), 0)
+    ImageDraw.Draw(img).text((origen_px, alto_px), caracter, fill=255, font=font, anchor="ls")
+
+    mask = np.array(img) > 128
+
+    return malla_extruida_x(mask, TEXTO_Z_MM, 1.0 / res_px_mm), origen_px
+
+
+def precalentar_glifos(alfabeto: str = ALFABETO_COMUN, res_px_mm: float = RES_PX_MM):
+    """
+    Genera por adelantado los glifos del alfabeto común a la resolución
+    dada: sirven para cualquier texto (el tamaño se aplica como escala).
+    """
+    for caracter in alfabeto:
+        malla_glifo(caracter, float(res_px_mm))
+
+
+def componer_texto(texto: str, res_px_mm: float = RES_PX_MM) -> Ensamblaje:
+    """
+    Ensambla el texto (en el plano Y,Z, extruido en X) a partir de los
+    glifos cacheados, sin copiarlos: cada uno es una pieza del ensamblaje.
+
+    Cada carácter se desplaza en Z según el avance acumulado que da la
+    fuente (incluye kerning cuando el motor de layout lo soporta).
+    El costo depende de la cantidad de caracteres, no del área rasterizada.
+
+    Los glifos vienen al tamaño de referencia y se escalan en Y,Z (no en
+    el espesor X) alrededor de su origen de escritura sobre la línea base.
+    """
+    px_w = int(TEXTO_X_MM * res_px_mm)
+    px_h = int(TEXTO_Y_MM * res_px_mm)
+
+    font_size, x = medir_texto(texto, px_w, px_h)
+    font = cargar_fuente(font_size)
+    escala = font_size / tamano_referencia(res_px_mm)
+
+    ensamblaje = Ensamblaje()
+    for k, caracter in enumerate(texto):
+        reportar("glifos", k / len(texto))
+        glifo, origen_px = malla_glifo(caracter, float(res_px_mm))
+        if glifo.num_caras == 0:
+            continue
+
+        avance_px = font.getlength(texto[:k])
+        ensamblaje.agregar(
+            Pieza(glifo)
+            .trasladar(dz=-origen_px / res_px_mm)
+            .escalar(1.0, escala, escala)
+            .trasladar(dz=(x + avance_px) / res_px_mm)
+        )
+
+    return ensamblaje
+
+
 
 # ============================================================
 # MOVIMIENTO DE FACES
 # ============================================================
 
 def trasladar_faces(faces, dx=0, dy=0, dz=0):
-    faces = faces.copy()
-    faces[:, :, 0] += dx
-    faces[:, :, 1] += dy
-    faces[:, :, 2] += dz
-    return faces
+    return faces + np.array([dx, dy, dz], dtype=faces.dtype)
 
 
 def rotar_faces(faces, eje="y", grados=90, centro=None):
     """
-    Rota un array de caras STL alrededor de un eje.
+    Rota un array de caras STL (o de vértices) alrededor de un eje.
     
-    faces  : ndarray (N, 3, 3)
+    faces  : ndarray (N, 3, 3) o (V, 3)
     eje    : "x", "y" o "z"
     grados : ángulo de rotación
     centro : (x, y, z) o None → rota respecto al origen
     """
-    theta = math.radians(grados)
-    c, s = math.cos(theta), math.sin(theta)
-
-    if eje == "x":
-        R = np.array([[1, 0, 0],
-                      [0, c, -s],
-                      [0, s,  c]])
-    elif eje == "y":
-        R = np.array([[ c, 0, s],
-                      [ 0, 1, 0],
-                      [-s, 0, c]])
-    elif eje == "z":
-        R = np.array([[c, -s, 0],
-                      [s,  c, 0],
-                      [0,  0, 1]])
-    else:
-        raise ValueError("Eje debe ser 'x', 'y' o 'z'")
-
+    # El centro se pliega en la traslación: un solo matmul sobre la salida
+    matriz = matriz_afin(matriz_rotacion(eje, grados), centro)
     f = faces.reshape(-1, 3)
 
-    if centro is not None:
-        centro = np.array(centro)
-        f = f - centro
-
-    f = f @ R.T
-
-    if centro is not None:
-        f = f + centro
-
-    return f.reshape(faces.shape)
+    return aplicar_matriz(matriz, f, np.empty_like(f)).reshape(faces.shape)
 
 def extruir_faces_x(faces, espesor_mm):
     """
@@ -174,14 +279,16 @@ def extruir_faces_x(faces, espesor_mm):
     f1 = faces.copy()
     f1[:, :, 0] += espesor_mm  # desplaza en X
 
-    # Caras laterales
-    laterales = []
+    # Caras laterales: [a, b, b] y [a, a, b] por cada vértice, intercaladas
+    a = f0.reshape(-1, 3)
+    b = f1.reshape(-1, 3)
+    laterales = np.empty((2 * len(a), 3, 3), dtype=faces.dtype)
+    laterales[0::2, 0] = a
+    laterales[0::2, 1:] = b[:, None]
+    laterales[1::2, :2] = a[:, None]
+    laterales[1::2, 2] = b
 
-    for a, b in zip(f0.reshape(-1, 3), f1.reshape(-1, 3)):
-        laterales.append([a, b, b])
-        laterales.append([a, a, b])
-
-    return np.concatenate([f0, f1, np.array(laterales)])
+    return np.concatenate([f0, f1, laterales])
 
 
 
@@ -189,112 +296,30 @@ def extruir_faces_x(faces, espesor_mm):
 # HEIGHTMAP → STL MANIFOLD (SUPERFICIE CERRADA)
 # ============================================================
 
-def generar_stl_manifold(z_grid, mask):
+def generar_stl_manifold(z_grid, mask, decimar=False, res_px_mm=RES_PX_MM) -> Malla:
     """
-    Convierte una grilla de alturas en un STL sólido y manifold.
+    Convierte una grilla de alturas en un STL sólido y manifold (indexado).
+    Con decimar=True las regiones coplanares se fusionan en rectángulos.
     """
 
     h, w = z_grid.shape
 
-    ancho_mm = w / RES_PX_MM
-    alto_mm = h / RES_PX_MM
+    ancho_mm = w / res_px_mm
+    alto_mm = h / res_px_mm
 
     x = np.linspace(0, ancho_mm, w)
-    y = np.linspace(0, alto_mm, h)
-    X, Y = np.meshgrid(x, y)
-    Y = np.flipud(Y)
-
-    faces = []
+    y = np.linspace(0, alto_mm, h)[::-1]
 
-    for i, j in np.argwhere(mask):
-        if i >= h - 1 or j >= w - 1:
-            continue
+    return malla_heightmap(z_grid, mask, x, y, decimar=decimar)
 
-        # Alturas
-        z0 = z_grid[i, j]
-        z1 = z_grid[i, j + 1]
-        z2 = z_grid[i + 1, j]
-        z3 = z_grid[i + 1, j + 1]
-
-        # Vértices superiores
-        vt0 = [X[i, j], Y[i, j], z0]
-        vt1 = [X[i, j + 1], Y[i, j + 1], z1]
-        vt2 = [X[i + 1, j], Y[i + 1, j], z2]
-        vt3 = [X[i + 1, j + 1], Y[i + 1, j + 1], z3]
-
-        # Vértices inferiores
-        vb0 = [X[i, j], Y[i, j], 0]
-        vb1 = [X[i, j + 1], Y[i, j + 1], 0]
-        vb2 = [X[i + 1, j], Y[i + 1, j], 0]
-        vb3 = [X[i + 1, j + 1], Y[i + 1, j + 1], 0]
-
-        # Superficie superior e inferior
-        faces += [
-            [vt0, vt2, vt3], [vt0, vt3, vt1],
-            [vb0, vb3, vb2], [vb0, vb1, vb3],
-        ]
-
-        # Cierre lateral
-        if i == 0 or not mask[i - 1, j]:
-            faces += [[vt0, vt1, vb1], [vt0, vb1, vb0]]
-        if i + 1 >= h - 1 or not mask[i + 1, j]:
-            faces += [[vt2, vb3, vt3], [vt2, vb2, vb3]]
-        if j == 0 or not mask[i, j - 1]:
-            faces += [[vt0, vb2, vt2], [vt0, vb0, vb2]]
-        if j + 1 >= w - 1 or not mask[i, j + 1]:
-            faces += [[vt1, vt3, vb3], [vt1, vb3, vb1]]
-
-    return np.array(faces)
-
-def generar_stl_manifold_x(z_grid, mask, espesor_mm):
+def generar_stl_manifold_x(z_grid, mask, espesor_mm, res_px_mm=RES_PX_MM) -> Malla:
     """
     Genera un sólido manifold extruido en X
     usando una máscara 2D (Y,Z).
+    Solo emite la superficie exterior (tapas fusionadas y paredes por tramos).
     """
 
-    h, w = z_grid.shape
-
-    dy = 1.0 / RES_PX_MM
-    dz = 1.0 / RES_PX_MM
-
-    y_coords = (h - np.arange(h) - 1) * dy
-    z_coords = np.arange(w) * dz
-
-    faces = []
-
-    for i, j in np.argwhere(mask):
-        if i >= h - 1 or j >= w - 1:
-            continue
-
-        y0 = y_coords[i]
-        y1 = y0 + dy
-        z0 = z_coords[j]
-        z1 = z0 + dz
-
-        x0 = 0.0
-        x1 = espesor_mm
-
-        # vértices
-        v000 = [x0, y0, z0]
-        v001 = [x1, y0, z0]
-        v010 = [x0, y1, z0]
-        v011 = [x1, y1, z0]
-        v100 = [x0, y0, z1]
-        v101 = [x1, y0, z1]
-        v110 = [x0, y1, z1]
-        v111 = [x1, y1, z1]
-
-        # sólido completo (6 caras)
-        faces += [
-            [v000, v010, v110], [v000, v110, v100],  # X-
-            [v001, v101, v111], [v001, v111, v011],  # X+
-            [v000, v001, v011], [v000, v011, v010],  # Z-
-            [v100, v110, v111], [v100, v111, v101],  # Z+
-            [v010, v011, v111], [v010, v111, v110],  # Y+
-            [v000, v100, v101], [v000, v101, v001],  # Y-
-        ]
-
-    return np.array(faces)
+    return malla_extruida_x(mask, espesor_mm, 1.0 / res_px_mm)
 
 
 
@@ -302,59 +327,58 @@ def generar_stl_manifold_x(z_grid, mask, espesor_mm):
 # MODELO FINAL: BASE + TEXTO VERTICAL
 # ============================================================
 
-def generar_base_texto_stl(texto: str) -> bytes:
+@lru_cache(maxsize=1)
+def malla_bloque_base() -> Malla:
     """
-    Genera el STL completo del bloque con texto vertical frontal.
+    Bloque base macizo (constante): se genera una vez por proceso.
     """
     base_w_px = int(BASE_ANCHO_MM * RES_PX_MM)   # 45 mm
-    base_h_px = int(BASE_ALTO_MM  * RES_PX_MM)   # 45 mm
-
-
-    # Heightmap del texto
-    z_texto, mask_texto = generar_texto_heightmap(
-        texto,
-        TEXTO_X_MM,
-        TEXTO_Y_MM,
-    )
+    base_h_px = int(BASE_ALTO_MM  * RES_PX_MM)   # 20 mm
 
     z_base = np.full((base_h_px, base_w_px), BASE_Z_MM)
     mask_base = np.ones_like(z_base, dtype=bool)
 
+    # Bloque completamente plano: la fusión coplanar no pierde geometría
+    return generar_stl_manifold(z_base, mask_base, decimar=True)
 
-    # Bloque base macizo
-    faces_base = generar_stl_manifold(z_base, mask_base)
 
-    faces_texto = generar_stl_manifold_x(
-        z_texto,
-        mask_texto,
-        TEXTO_Z_MM
-    )
+@lru_cache(maxsize=CACHE_TEXTOS)
+def generar_malla_base_texto(texto: str, res_px_mm: float = RES_PX_MM) -> Malla:
+    """
+    Genera la malla completa del bloque con texto vertical frontal.
+    Memoizada por (texto, resolución) (LRU acotada): la malla devuelta es
+    compartida y no debe modificarse.
 
-    faces_texto = rotar_faces(faces_texto, "y", 180)
+    res_px_mm solo afecta al texto (el bloque base es plano y se fusiona
+    igual a cualquier resolución); valores bajos sirven como vista previa.
+    """
+    if not RES_PX_MM_MIN <= res_px_mm <= RES_PX_MM_MAX:
+        raise ValueError(f"La resolución debe estar entre {RES_PX_MM_MIN} y {RES_PX_MM_MAX} px/mm")
 
-    faces_texto = trasladar_faces(
-        faces_texto,
-        dx=BASE_ANCHO_MM,
-        dy=BASE_ALTO_MM,
-        dz=BASE_ANCHO_MM * 2
-    )
 
+    # Bloque base macizo
+    with etapa("bloque_base", 0.0):
+        malla_base = malla_bloque_base()
 
-    # Letras verticales extruidas en X
-    # faces_texto = generar_texto_vertical(
-    #     mask_texto,
-    #     espesor_mm=TEXTO_Z_MM,
-    #     x_plano=BASE_ANCHO_MM - (TEXTO_Z_MM * 2),
-    #     offset_y_mm=BASE_ALTO_MM
-    # )
-    
+    # Texto compuesto desde la caché de glifos
+    with etapa("glifos"):
+        texto_vertical = componer_texto(texto, res_px_mm)
+
+    # Las transformaciones solo se componen: cada glifo se escribe una
+    # vez, ya rotado y trasladado, en la malla final
+    with etapa("ensamblado", 0.9):
+        texto_vertical = texto_vertical.rotar("y", 180).trasladar(
+            dx=BASE_ANCHO_MM,
+            dy=BASE_ALTO_MM,
+            dz=BASE_ANCHO_MM * 2
+        )
 
-    # Unión de geometrías
-    faces = np.concatenate([faces_base, faces_texto])
+        return Ensamblaje([malla_base, texto_vertical]).construir()
 
-    # Creación del STL
-    m = mesh.Mesh(np.zeros(faces.shape[0], dtype=mesh.Mesh.dtype))
-    m.vectors = faces
 
-    return mesh_to_stl_bytes(m)
+def generar_base_texto_stl(texto: str, res_px_mm: float = RES_PX_MM) -> bytearray:
+    """
+    Genera el STL completo del bloque con texto vertical frontal.
+    """
+    return mesh_to_stl_bytes(generar_malla_base_texto(texto, res_px_mm))
  
\ No newline at end of file
@@ -9,22 +9,34 @@ en un modelo STL sólido (watertight), combinando:
 - Paredes laterales continuas (vectoriales) para evitar efecto escalera
 """
 
+from functools import lru_cache
+
 import numpy as np
-from PIL import Image, ImageDraw, ImageFont
-from stl import mesh
-import io
-import tempfile
-import os
+from scipy.ndimage import binary_fill_holes
 
-from core import mesh_to_stl_bytes
+from contorno import malla_heightmap_contorno
+from core import iterar_stl_bandas, mesh_to_stl_bytes
+from formas import mascaras_forma, normalizar_forma
+from ingesta import decodificar, redimensionar
+from malla import Malla, contar_caras_heightmap, iterar_bandas_heightmap, malla_heightmap
+from progreso import etapa, reportar
+from tonos import TONO, tabla_tono
 
 
 # ============================================================
 # PARÁMETROS DE INGENIERÍA (dimensiones físicas y resolución)
 # ============================================================
 
-LADO_MM = 90.0        # Tamaño físico total del modelo en X/Y (mm)
-PIXELS = 600          # Resolución de trabajo (más alto = más detalle)
+LADO_MM = 90.0        # Tamaño físico total del modelo en X/Y por defecto (mm)
+LADO_MM_MIN = 20.0    # Tamaño mínimo admitido
+LADO_MM_MAX = 300.0   # Tamaño máximo admitido (paneles de gran formato)
+CAPA_MM_MIN = 0.04    # Altura de capa mínima admitida
+CAPA_MM_MAX = 1.0     # Máxima (con capas muy altas el redondeo aplana el relieve)
+PIXELS = 600          # Resolución de trabajo por defecto (más alto = más detalle)
+PIXELS_MIN = 32       # Resolución mínima admitida (vista previa)
+PIXELS_MAX = 1200     # Resolución máxima admitida (malla completa en memoria)
+PIXELS_MAX_BANDAS = 4000  # Resolución máxima en modo por bandas
+FILAS_BANDA = 32      # Filas de celdas por banda en el modo por bandas
 RES_PX_MM = 5.0      # Resolución efectiva (píxeles por mm)
 
 # --- Litografía (frente / relieve) ---
@@ -34,7 +46,12 @@ LITHO_MAX_Z = 3.0     # Relieve máximo (zonas oscuras)
 
 # --- Marco estructural ---
 MARCO_Z = 5.0         # Altura total del marco
-MARCO_MM = 4.6        # Ancho físico del marco
+MARCO_MM = 4.6        # Ancho físico del marco (formas paramétricas)
+
+# --- Paredes laterales ---
+# pixel    : una pared por arista de píxel del borde (escalera)
+# contorno : paredes que siguen el contorno simplificado (ver contorno.py)
+PAREDES = ("pixel", "contorno")
 
 
 # ============================================================
@@ -64,122 +81,276 @@ def erode(mask: np.ndarray, iterations: int) -> np.ndarray:
 # GENERACIÓN DE TOPO + BASE DESDE HEIGHTMAP
 # ============================================================
 
-def generar_stl_manifold(z_grid: np.ndarray, mask: np.ndarray) -> np.ndarray:
+def coordenadas_grilla(filas: int, cols: int, lado_mm: float = LADO_MM):
     """
-    Genera las caras superiores (relieve) y la base plana del modelo.
-    Aún crea paredes laterales por píxel, que luego se reemplazan.
+    Coordenada X de cada columna e Y de cada fila (fila 0 arriba).
     """
-    filas, cols = z_grid.shape
+    return np.linspace(0, lado_mm, cols), np.linspace(0, lado_mm, filas)[::-1]
 
-    x_lin = np.linspace(0, LADO_MM, cols)
-    y_lin = np.linspace(0, LADO_MM, filas)
-    X, Y = np.meshgrid(x_lin, y_lin)
-    Y = np.flipud(Y)
 
-    faces = []
-    valid_pixels = np.argwhere(mask)
+def generar_stl_manifold(
+    z_grid: np.ndarray,
+    mask: np.ndarray,
+    decimar: bool = False,
+    lado_mm: float = LADO_MM,
+    paredes: str = "pixel",
+) -> Malla:
+    """
+    Genera las caras superiores (relieve), la base plana y las paredes
+    laterales del modelo como malla indexada.
+
+    Implementación vectorizada: las paredes se detectan desplazando la
+    máscara de celdas y las esquinas se obtienen con indexación avanzada.
+    Expandida, produce los mismos triángulos y en el mismo orden que el
+    recorrido píxel a píxel.
+
+    Con decimar=True las regiones coplanares se fusionan en rectángulos
+    (misma superficie, muchas menos caras).
+
+    Con paredes="contorno" el borde sigue el contorno de la máscara con
+    paredes lisas y simplificadas; no se combina con decimar. Ese modo
+    trabaja sobre nodos, no celdas: el contorno pasa a medio paso de los
+    nodos válidos y los nodos del borde de la grilla cuentan como fuera,
+    así que una máscara que toca el borde pierde esa fila/columna. Las
+    formas del servidor no llegan al borde; un contorno rojo dibujado en
+    el límite de la imagen sí, y su marco sale un paso más angosto.
+    """
+    validar_paredes(paredes)
+    x_lin, y_lin = coordenadas_grilla(*z_grid.shape, lado_mm)
 
-    for i, j in valid_pixels:
-        if i >= filas - 1 or j >= cols - 1:
-            continue
+    if paredes == "contorno":
+        if decimar:
+            raise ValueError("Las paredes por contorno no se combinan con la decimación")
+        return malla_heightmap_contorno(z_grid, mask, x_lin, y_lin)
 
-        z0, z1 = z_grid[i, j], z_grid[i, j + 1]
-        z2, z3 = z_grid[i + 1, j], z_grid[i + 1, j + 1]
+    return malla_heightmap(z_grid, mask, x_lin, y_lin, decimar=decimar)
 
-        x0, y0 = X[i, j], Y[i, j]
-        x1, y1 = X[i, j + 1], Y[i, j + 1]
-        x2, y2 = X[i + 1, j], Y[i + 1, j]
-        x3, y3 = X[i + 1, j + 1], Y[i + 1, j + 1]
 
-        vt0 = [x0, y0, z0]
-        vt1 = [x1, y1, z1]
-        vt2 = [x2, y2, z2]
-        vt3 = [x3, y3, z3]
+def ajustar_a_capas(z: np.ndarray, capa_mm: float) -> np.ndarray:
+    """
+    Redondea alturas (in situ) al múltiplo más cercano de la altura de capa.
+    Así más celdas vecinas quedan coplanares y se pueden fusionar.
+    """
+    z /= capa_mm
+    np.round(z, out=z)
+    z *= capa_mm
+    return z
 
-        vb0 = [x0, y0, 0]
-        vb1 = [x1, y1, 0]
-        vb2 = [x2, y2, 0]
-        vb3 = [x3, y3, 0]
 
-        # Cara superior (relieve)
-        faces.append([vt0, vt2, vt3])
-        faces.append([vt0, vt3, vt1])
+@lru_cache(maxsize=64)
+def tabla_relieve(tono: str = TONO, capa_mm: float | None = None) -> np.ndarray:
+    """
+    Gris (uint8) → Z del relieve (256 entradas float32, solo lectura):
+    perfil de tono (tonos.py) entre BASE_Z + LITHO_MIN_Z (blanco) y
+    BASE_Z + LITHO_MAX_Z (negro), ya ajustado a la altura de capa.
+    """
+    tabla = tabla_tono(tono, BASE_Z + LITHO_MIN_Z, BASE_Z + LITHO_MAX_Z)
+    if capa_mm:
+        tabla = ajustar_a_capas(tabla, capa_mm)
+    tabla.setflags(write=False)
+    return tabla
 
-        # Cara inferior (base)
-        faces.append([vb0, vb3, vb2])
-        faces.append([vb0, vb1, vb3])
+# ============================================================
+# FUNCIÓN PRINCIPAL
+# ============================================================
 
-        # Paredes voxelizadas (se mantienen pero luego se sustituyen)
-        if i == 0 or not mask[i - 1, j]:
-            faces.append([vt0, vt1, vb1])
-            faces.append([vt0, vb1, vb0])
+def validar_lado(lado_mm: float):
+    if not LADO_MM_MIN <= lado_mm <= LADO_MM_MAX:
+        raise ValueError(f"El tamaño debe estar entre {LADO_MM_MIN:g} y {LADO_MM_MAX:g} mm")
 
-        if i == filas - 2 or not mask[i + 1, j]:
-            faces.append([vt2, vb3, vt3])
-            faces.append([vt2, vb2, vb3])
 
-        if j == 0 or not mask[i, j - 1]:
-            faces.append([vt0, vb2, vt2])
-            faces.append([vt0, vb0, vb2])
+def validar_capa(capa_mm: float | None):
+    if capa_mm is not None and not CAPA_MM_MIN <= capa_mm <= CAPA_MM_MAX:
+        raise ValueError(f"La altura de capa debe estar entre {CAPA_MM_MIN:g} y {CAPA_MM_MAX:g} mm")
 
-        if j == cols - 2 or not mask[i, j + 1]:
-            faces.append([vt1, vt3, vb3])
-            faces.append([vt1, vb3, vb1])
 
-    return np.array(faces)
+def validar_paredes(paredes: str):
+    if paredes not in PAREDES:
+        raise ValueError(f"Paredes no soportadas: {paredes} (usa {', '.join(PAREDES)})")
 
-# ============================================================
-# FUNCIÓN PRINCIPAL
-# ============================================================
 
-def generar_modelo_3d(imagen_bytes: bytes) -> bytes:
+def mapa_z(
+    imagen_bytes: bytes,
+    capa_mm: float | None,
+    pixels: int,
+    forma: str | None = None,
+    ancho_marco: float = MARCO_MM,
+    lado_mm: float = LADO_MM,
+    tono: str = TONO,
+):
     """
-    Pipeline principal:
-    - Detecta contorno rojo
-    - Rellena interior
-    - Genera relieve (litografía)
+    Etapas previas al mallado:
+    - Detecta contorno rojo y rellena el interior, o bien toma el marco
+      y el interior de una forma paramétrica (ver formas.py)
+    - Genera relieve (litografía) con el perfil de tono (ver tonos.py)
     - Construye marco estructural
-    - Genera STL watertight
-    """
 
-    # --- Cargar imagen ---
-    img = Image.open(io.BytesIO(imagen_bytes)).convert("RGB")
-    img = img.resize((PIXELS, PIXELS), Image.Resampling.LANCZOS)
-    rgb = np.array(img)
+    Devuelve (z, mask): alturas float32 (pixels × pixels) y celdas sólidas.
+    """
+    # --- Cargar imagen (ver ingesta.py) ---
+    with etapa("decodificacion", 0.0):
+        img = decodificar(imagen_bytes, pixels)
+
+    with etapa("redimension", 0.1):
+        img = redimensionar(img, pixels)
+
+    if forma is not None:
+        # --- Marco e interior de la forma (cacheados) ---
+        with etapa("forma", 0.15):
+            red, interior = mascaras_forma(normalizar_forma(forma), pixels, ancho_marco, lado_mm)
+    else:
+        # --- Detectar contorno rojo ---
+        with etapa("deteccion_rojo", 0.15):
+            if img.mode != "RGB":
+                raise ValueError("No se detectó borde rojo")
+
+            rgb = np.asarray(img)
+            red = (
+                (rgb[..., 0] > 200) &
+                (rgb[..., 1] < 60) &
+                (rgb[..., 2] < 60)
+            )
+            del rgb
+
+        if not np.any(red):
+            raise ValueError("No se detectó borde rojo")
+
+        # --- Rellenar interior ---
+        with etapa("relleno", 0.2):
+            interior = binary_fill_holes(red)
 
-    # --- Detectar contorno rojo ---
-    red = (
-        (rgb[..., 0] > 200) &
-        (rgb[..., 1] < 60) &
-        (rgb[..., 2] < 60)
+    # --- Litofanía desde gris ---
+    # Luminancia uint8 (ITU-R 601, en C dentro de Pillow) y un único
+    # gather sobre la tabla del tono, ya ajustada a la altura de capa
+    with etapa("relieve", 0.25):
+        gris = np.asarray(img if img.mode == "L" else img.convert("L"))
+        del img
+
+        z = tabla_relieve(tono, capa_mm)[gris]
+        del gris
+
+        # --- Mapa Z final ---
+        z[~interior] = 0
+        del interior
+
+        z[red] = MARCO_Z
+        del red
+
+        mask = z > 0
+
+    return z, mask
+
+
+def generar_malla_3d(
+    imagen_bytes: bytes,
+    decimar: bool = False,
+    capa_mm: float | None = None,
+    pixels: int = PIXELS,
+    lado_mm: float = LADO_MM,
+    forma: str | None = None,
+    ancho_marco: float = MARCO_MM,
+    paredes: str = "pixel",
+    tono: str = TONO,
+) -> Malla:
+    """
+    Pipeline principal: mapa de alturas (mapa_z) y malla watertight.
+
+    Opciones de mallado:
+    - decimar : fusiona regiones coplanares (sin pérdida geométrica)
+    - capa_mm : ajusta el relieve a la altura de capa de la impresora
+                (con pérdida acotada a media capa)
+    - pixels  : resolución de trabajo (lado de la grilla). El tamaño físico
+                no cambia; valores bajos sirven como vista previa
+    - lado_mm : tamaño físico del modelo en X/Y
+    - paredes : "pixel" (escalera) o "contorno" (lisas, menos triángulos)
+    - tono    : perfil de gris → relieve (ver tonos.PERFILES)
+
+    Con `forma` ("corazon", "circulo", "cuadrado") el marco de
+    `ancho_marco` mm se genera en el servidor y la imagen puede venir
+    sin contorno rojo (p. ej. en escala de grises).
+    """
+    if not PIXELS_MIN <= pixels <= PIXELS_MAX:
+        raise ValueError(f"La resolución debe estar entre {PIXELS_MIN} y {PIXELS_MAX} px")
+    validar_lado(lado_mm)
+    validar_capa(capa_mm)
+    validar_paredes(paredes)
+
+    z, mask = mapa_z(imagen_bytes, capa_mm, pixels, forma, ancho_marco, lado_mm, tono)
+
+    with etapa("mallado", 0.35):
+        malla = generar_stl_manifold(z, mask, decimar=decimar, lado_mm=lado_mm, paredes=paredes)
+    reportar("mallado", 1.0)
+
+    return malla
+
+
+def generar_modelo_3d(
+    imagen_bytes: bytes,
+    decimar: bool = False,
+    capa_mm: float | None = None,
+    pixels: int = PIXELS,
+    lado_mm: float = LADO_MM,
+    forma: str | None = None,
+    ancho_marco: float = MARCO_MM,
+    paredes: str = "pixel",
+    tono: str = TONO,
+) -> bytearray:
+    """
+    Igual que generar_malla_3d, pero devuelve el STL binario completo.
+    """
+    return mesh_to_stl_bytes(
+        generar_malla_3d(imagen_bytes, decimar, capa_mm, pixels, lado_mm, forma, ancho_marco, paredes, tono)
     )
 
-    if not np.any(red):
-        raise ValueError("No se detectó borde rojo")
 
-     # --- Rellenar interior ---
-    from scipy.ndimage import binary_fill_holes
-    interior = binary_fill_holes(red)
+# ============================================================
+# GRAN FORMATO: MALLADO POR BANDAS
+# ============================================================
+
+def escribir_stl_por_bandas(
+    imagen_bytes: bytes,
+    ruta: str,
+    capa_mm: float | None = None,
+    pixels: int = PIXELS,
+    lado_mm: float = LADO_MM,
+    filas_banda: int = FILAS_BANDA,
+    forma: str | None = None,
+    ancho_marco: float = MARCO_MM,
+    tono: str = TONO,
+) -> int:
+    """
+    Escribe el STL en `ruta` banda por banda de filas del heightmap.
 
-    # --- Litofanía desde gris ---
-    gray = (
-        0.299 * rgb[..., 0] +
-        0.587 * rgb[..., 1] +
-        0.114 * rgb[..., 2]
-    )
+    La malla completa nunca existe en memoria: cada banda se malla, se
+    escribe y se libera. Solo el mapa de alturas (4 bytes por píxel) y la
+    máscara ocupan memoria proporcional a la resolución; el pico del
+    mallado depende de filas_banda × pixels, no del tamaño del STL.
+    Sin decimación (fusionar regiones a través de los cortes dejaría
+    vértices en T). Las costuras son exactas (ver malla_banda_heightmap).
+
+    Devuelve la cantidad de triángulos.
+    """
+    if not PIXELS_MIN <= pixels <= PIXELS_MAX_BANDAS:
+        raise ValueError(f"La resolución debe estar entre {PIXELS_MIN} y {PIXELS_MAX_BANDAS} px")
+    validar_lado(lado_mm)
+    validar_capa(capa_mm)
 
-    relieve = LITHO_MIN_Z + (1 - gray / 255.0) * (LITHO_MAX_Z - LITHO_MIN_Z)
+    z, mask = mapa_z(imagen_bytes, capa_mm, pixels, forma, ancho_marco, lado_mm, tono)
+    x_lin, y_lin = coordenadas_grilla(*z.shape, lado_mm)
 
-    # --- Mapa Z final ---
-    z = np.zeros_like(relieve, dtype=float)
-    z[interior] = BASE_Z + relieve[interior]
-    z[red] = MARCO_Z
+    with etapa("conteo", 0.3):
+        num_caras = contar_caras_heightmap(mask, filas_banda)
 
-    mask = z > 0
+    n_bandas = max(1, -(-(pixels - 1) // filas_banda))
 
-    faces = generar_stl_manifold(z, mask)
+    def bandas():
+        for k, banda in enumerate(iterar_bandas_heightmap(z, mask, x_lin, y_lin, filas_banda)):
+            reportar("mallado", 0.35 + 0.65 * k / n_bandas)
+            yield banda
 
-    m = mesh.Mesh(np.zeros(faces.shape[0], dtype=mesh.Mesh.dtype))
-    m.vectors = faces
+    with etapa("mallado", 0.35), open(ruta, "wb") as destino:
+        for bloque in iterar_stl_bandas(bandas(), num_caras):
+            destino.write(bloque)
+    reportar("mallado", 1.0)
 
-    return mesh_to_stl_bytes(m)
+    return num_caras
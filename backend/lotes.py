@@ -0,0 +1,105 @@
+"""
+Generación por lotes con respuesta ZIP en streaming
+
+Cada ítem del lote se genera en el pool de procesos (como máximo
+`concurrencia` a la vez por lote) y se agrega al ZIP apenas termina,
+sin esperar al resto. El ZIP se escribe en modo streaming (descriptores
+de datos tras cada archivo), así que nunca se arma completo en memoria.
+
+Un ítem que falla no interrumpe el lote: su error queda registrado en
+resumen.json, que se escribe al final del ZIP.
+"""
+
+import asyncio
+import json
+import logging
+import zipfile
+from dataclasses import dataclass
+from typing import AsyncIterator, Awaitable, Callable, Optional
+
+from core import iterar_stl_bytes
+from ejecutor import reintentar_si_saturado
+from formatos import SalidaZip
+
+
+logger = logging.getLogger("lithomaker")
+
+NIVEL_COMPRESION = 1   # El STL comprime bien incluso con el nivel más rápido
+
+
+@dataclass
+class ItemLote:
+    nombre: str
+    generar: Optional[Callable[[], Awaitable]]   # -> (malla, origen_cache)
+    error: Optional[str] = None                  # error detectado antes de generar
+
+
+def _escribir_stl(zf: zipfile.ZipFile, salida: SalidaZip, nombre: str, malla) -> list:
+    """
+    Comprime el STL en el ZIP bloque a bloque (se ejecuta en un hilo).
+    Devuelve los fragmentos ZIP producidos.
+    """
+    fragmentos = []
+    with zf.open(nombre, "w", force_zip64=True) as destino:
+        for bloque in iterar_stl_bytes(malla):
+            destino.write(bloque)
+            fragmentos.append(salida.drenar())
+    fragmentos.append(salida.drenar())
+    return fragmentos
+
+
+async def zip_lote(items: "list[ItemLote]", concurrencia: int) -> AsyncIterator[bytes]:
+    """
+    Genera los ítems en paralelo y produce el ZIP por fragmentos,
+    en el orden en que terminan.
+    """
+    salida = SalidaZip()
+    zf = zipfile.ZipFile(
+        salida, "w",
+        compression=zipfile.ZIP_DEFLATED,
+        compresslevel=NIVEL_COMPRESION,
+    )
+
+    semaforo = asyncio.Semaphore(max(1, concurrencia))
+
+    async def generar(indice: int, item: ItemLote):
+        if item.error is not None:
+            return indice, None, None, ValueError(item.error)
+        try:
+            async with semaforo:
+                malla, origen = await reintentar_si_saturado(item.generar)
+            return indice, malla, origen, None
+        except Exception as e:
+            return indice, None, None, e
+
+    tareas = [asyncio.create_task(generar(i, item)) for i, item in enumerate(items)]
+    resumen = [None] * len(items)
+
+    try:
+        for siguiente in asyncio.as_completed(tareas):
+            indice, malla, origen, error = await siguiente
+            item = items[indice]
+
+            if error is not None:
+                if isinstance(error, ValueError):
+                    detalle = str(error)
+                else:
+                    logger.error(f"Error inesperado en ítem de lote {item.nombre}", exc_info=error)
+                    detalle = "Error interno al generar el modelo"
+                resumen[indice] = {"archivo": item.nombre, "estado": "error", "detalle": detalle}
+                continue
+
+            for fragmento in await asyncio.to_thread(_escribir_stl, zf, salida, item.nombre, malla):
+                if fragmento:
+                    yield fragmento
+
+            resumen[indice] = {"archivo": item.nombre, "estado": "ok", "cache": origen}
+
+        zf.writestr("resumen.json", json.dumps(resumen, ensure_ascii=False, indent=2))
+        zf.close()
+        yield salida.drenar()
+
+    finally:
+        # Cliente desconectado o error: no seguir generando para nadie
+        for tarea in tareas:
+            tarea.cancel()
@@ -3,14 +3,39 @@ FastAPI backend para LithoMaker Pro
 Frontend-driven: recibe imagen final y genera STL
 """
 
-from fastapi import FastAPI, File, UploadFile, Form
+import time
+
+# Referencia para medir el tiempo de arranque (antes de los imports pesados)
+T_INICIO = time.perf_counter()
+
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, File, UploadFile, Form, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
-import io
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
+from typing import List, Optional
+import asyncio
 import logging
+import os
+import re
+import tempfile
 
-from litofania import generar_modelo_3d
-from letras import generar_base_texto_stl
+import metricas
+from cache import cache_mallas
+from conjunto import ensamblar_conjunto
+from core import tamano_stl
+from ejecutor import ejecutor, Saturado, RETRY_AFTER_S
+from formatos import FORMATOS, COMPRIMIDOS, acepta_gzip, iterar_formato, iterar_gzip, negociar_formato
+from ingesta import ImagenDemasiadoGrande, MAX_BYTES, abrir_imagen, verificar_bytes
+from lotes import ItemLote, zip_lote
+from formas import normalizar_forma, validar_ancho_marco
+from litofania import (
+    escribir_stl_por_bandas, generar_malla_3d, validar_capa, validar_paredes, LADO_MM, MARCO_MM, PIXELS,
+)
+from letras import generar_malla_base_texto, RES_PX_MM
+from tonos import TONO, normalizar_tono
+from trabajos import gestor_trabajos
+import validacion
 
 
 # -----------------------
@@ -19,6 +44,64 @@ from letras import generar_base_texto_stl
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("lithomaker")
 
+LOTE_MAX = int(os.getenv("LITHO_LOTE_MAX", 100))
+
+# Resolución de la vista previa (lado en píxeles de la litofanía)
+PREVIEW_PX = int(os.getenv("LITHO_PREVIEW_PX", 150))
+
+# Nivel de gzip para STL / malla cuando el cliente lo acepta (0 desactiva)
+GZIP_NIVEL = int(os.getenv("LITHO_GZIP_NIVEL", 1))
+
+# Modo por bandas (gran formato): filas por banda y carpeta de los STL temporales
+FILAS_BANDA = int(os.getenv("LITHO_FILAS_BANDA", 32))
+BANDAS_DIR = os.getenv("LITHO_BANDAS_DIR") or None
+
+logger.info(f"Módulos importados en {time.perf_counter() - T_INICIO:.2f}s")
+
+# -----------------------
+# Arranque y calentamiento
+# -----------------------
+arranque = {"estado": "calentando", "segundos": None}
+
+
+async def calentar_servidor():
+    """
+    Calienta el pool de generación; /ready responde OK solo al terminar.
+    """
+    t0 = time.perf_counter()
+    try:
+        await ejecutor.calentar()
+    except Exception:
+        logger.exception("Falló el calentamiento del pool de generación")
+        arranque["estado"] = "error"
+        return
+
+    arranque["estado"] = "listo"
+    arranque["segundos"] = round(time.perf_counter() - T_INICIO, 3)
+    logger.info(
+        f"Servidor listo en {arranque['segundos']:.2f}s "
+        f"(calentamiento {time.perf_counter() - t0:.2f}s)"
+    )
+
+# -----------------------
+# Ciclo de vida (pool de procesos)
+# -----------------------
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    ejecutor.iniciar()
+    logger.info(
+        f"Pool de generación: {ejecutor.workers} procesos, cola máx. {ejecutor.max_cola}"
+    )
+    ejecutor.al_progreso = gestor_trabajos.actualizar
+    ejecutor.al_medir = metricas.registrar_tiempos
+    calentamiento = asyncio.create_task(calentar_servidor())
+    purga = asyncio.create_task(gestor_trabajos.purgar_periodicamente())
+    yield
+    calentamiento.cancel()
+    purga.cancel()
+    gestor_trabajos.cancelar_todos()
+    ejecutor.cerrar()
+
 # -----------------------
 # App FastAPI
 # -----------------------
@@ -26,6 +109,7 @@ app = FastAPI(
     title="LithoMaker Pro API",
     description="API para generar modelos STL desde imágenes raster",
     version="2.0.0",
+    lifespan=lifespan,
 )
 
 # -----------------------
@@ -37,45 +121,401 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Cache"],
 )
 
+# -----------------------
+# Límite de subida (antes de leer el cuerpo)
+# -----------------------
+# Rutas que reciben una sola imagen; el margen cubre los demás campos del formulario
+RUTAS_IMAGEN = ("/api/generate-3d/", "/api/jobs/generate-3d/", "/api/generate-litho-stand/")
+MARGEN_FORMULARIO = 64 * 1024
+
+@app.middleware("http")
+async def limitar_subidas(request: Request, call_next):
+    """
+    Rechaza con 413 según Content-Length, sin recibir ni parsear el cuerpo.
+    Sin Content-Length (chunked), el límite se aplica al leer la imagen.
+    """
+    if request.method == "POST" and request.url.path in RUTAS_IMAGEN:
+        largo = request.headers.get("content-length", "")
+        if largo.isdigit() and int(largo) > MAX_BYTES + MARGEN_FORMULARIO:
+            return respuesta_demasiado_grande(
+                f"La imagen supera el máximo de {MAX_BYTES / 1024 / 1024:g} MB"
+            )
+    return await call_next(request)
+
+# -----------------------
+# Tiempos por petición (Server-Timing + /metrics)
+# -----------------------
+@app.middleware("http")
+async def medir_peticion(request: Request, call_next):
+    """
+    Server-Timing con las etapas de la generación (medidas en el worker)
+    y el total hasta el inicio de la respuesta. La serialización se
+    transmite después de las cabeceras: solo aparece en /metrics.
+    """
+    t0 = time.perf_counter()
+    with metricas.peticion() as tiempos:
+        respuesta = await call_next(request)
+    total = time.perf_counter() - t0
+
+    ruta = request.scope.get("route")
+    ruta = ruta.path if ruta is not None else "otra"
+    metricas.LATENCIA.observar(total, ruta=ruta)
+    metricas.PETICIONES.inc(ruta=ruta, codigo=respuesta.status_code)
+
+    respuesta.headers["Server-Timing"] = metricas.server_timing({**tiempos, "total": total})
+    return respuesta
+
 # -----------------------
 # Health check
 # -----------------------
 @app.get("/health")
 async def health_check():
-    return {"status": "ok"}
+    return {
+        "status": "ok",
+        "generacion": ejecutor.estado(),
+        "cache": cache_mallas.estado(),
+        "trabajos": gestor_trabajos.estado(),
+    }
+
+# -----------------------
+# Readiness (tras el calentamiento)
+# -----------------------
+@app.get("/ready")
+async def ready_check():
+    if arranque["estado"] != "listo":
+        return JSONResponse(status_code=503, content={"status": arranque["estado"]})
+    return {"status": "ready", "arranque_s": arranque["segundos"]}
+
+# -----------------------
+# Métricas (formato Prometheus)
+# -----------------------
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(
+        metricas.exponer({
+            "generacion": ejecutor.estado(),
+            "cache": cache_mallas.estado(),
+            "trabajos": gestor_trabajos.estado(),
+        }),
+        media_type=metricas.CONTENT_TYPE,
+    )
+
+# -----------------------
+# Respuesta de malla (streaming, formato negociado)
+# -----------------------
+def respuesta_malla(
+    malla, nombre: str, formato: str, gzip: bool, headers: Optional[dict] = None
+) -> StreamingResponse:
+    """
+    Envía la malla (o un Ensamblaje de varios cuerpos) por bloques a
+    medida que se codifica.
+
+    - formato : "stl" | "3mf" | "malla" (ver formatos.py)
+    - gzip    : Content-Encoding gzip (no aplica a 3MF, que ya es un ZIP)
+
+    El STL sin comprimir informa Content-Length (se conoce de antemano).
+    """
+    media_type, extension = FORMATOS[formato]
+    cabeceras = {
+        "Content-Disposition": f"attachment; filename={nombre}{extension}",
+        "Vary": "Accept, Accept-Encoding",
+        **(headers or {}),
+    }
+
+    contenido = iterar_formato(malla, formato, nombre)
+
+    if gzip and GZIP_NIVEL > 0 and formato not in COMPRIMIDOS:
+        contenido = iterar_gzip(contenido, GZIP_NIVEL)
+        cabeceras["Content-Encoding"] = "gzip"
+    elif formato == "stl":
+        cabeceras["Content-Length"] = str(tamano_stl(malla))
+
+    metricas.TRIANGULOS.observar(malla.num_caras, producto=nombre)
+
+    return StreamingResponse(
+        metricas.medir_salida(contenido, formato), media_type=media_type, headers=cabeceras
+    )
+
+def respuesta_demasiado_grande(detalle) -> JSONResponse:
+    logger.warning(f"Imagen rechazada: {detalle}")
+    return JSONResponse(status_code=413, content={"detail": str(detalle)})
+
+async def leer_imagen(file: UploadFile) -> bytes:
+    """
+    Lee la imagen subida validando tamaño en bytes y, por la cabecera,
+    formato y píxeles, antes de mandarla al pool de generación.
+    """
+    if file.size is not None:
+        verificar_bytes(file.size)
+    image_bytes = await file.read()
+    abrir_imagen(image_bytes)
+    return image_bytes
+
+def respuesta_saturado() -> JSONResponse:
+    """
+    Rechazo rápido cuando el pool está lleno.
+    """
+    logger.warning("Pool de generación saturado, petición rechazada")
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Servidor ocupado, intenta nuevamente en unos segundos"},
+        headers={"Retry-After": str(RETRY_AFTER_S)},
+    )
+
+# -----------------------
+# Gran formato (mallado por bandas a archivo temporal)
+# -----------------------
+def iterar_archivo(ruta: str, tamano_bloque: int = 1 << 20):
+    with open(ruta, "rb") as f:
+        while bloque := f.read(tamano_bloque):
+            yield bloque
+
+def borrar_archivo(ruta: str):
+    try:
+        os.remove(ruta)
+    except FileNotFoundError:
+        pass
+
+async def respuesta_por_bandas(image_bytes: bytes, parametros: dict, gzip: bool) -> StreamingResponse:
+    """
+    El worker escribe el STL banda por banda en un archivo temporal y
+    se transmite desde disco: la malla completa no existe en memoria en
+    ningún proceso. El archivo se borra al terminar la respuesta.
+    """
+    fd, ruta = tempfile.mkstemp(prefix="litho_", suffix=".stl", dir=BANDAS_DIR)
+    os.close(fd)
+
+    try:
+        num_caras = await ejecutor.ejecutar(
+            escribir_stl_por_bandas, image_bytes, ruta,
+            capa_mm=parametros["capa_mm"],
+            pixels=parametros["pixels"],
+            lado_mm=parametros.get("lado_mm", LADO_MM),
+            filas_banda=FILAS_BANDA,
+            forma=parametros.get("forma"),
+            ancho_marco=parametros.get("ancho_marco", MARCO_MM),
+            tono=parametros.get("tono", TONO),
+        )
+    except BaseException:
+        borrar_archivo(ruta)
+        raise
+
+    metricas.TRIANGULOS.observar(num_caras, producto="litho")
+
+    cabeceras = {
+        "Content-Disposition": "attachment; filename=litho.stl",
+        "Vary": "Accept, Accept-Encoding",
+        "X-Cache": "bandas",
+    }
+    contenido = iterar_archivo(ruta)
+    if gzip and GZIP_NIVEL > 0:
+        contenido = iterar_gzip(contenido, GZIP_NIVEL)
+        cabeceras["Content-Encoding"] = "gzip"
+    else:
+        cabeceras["Content-Length"] = str(os.path.getsize(ruta))
+
+    return StreamingResponse(
+        metricas.medir_salida(contenido, "stl"),
+        media_type=FORMATOS["stl"][0],
+        headers=cabeceras,
+        background=BackgroundTask(borrar_archivo, ruta),
+    )
+
+# -----------------------
+# Generación (con caché)
+# -----------------------
+def debe_validar(validar: bool) -> bool:
+    return validar or validacion.MODO != "0"
+
+async def generar_en_pool(trabajo_id: Optional[str], fn, *args, validar: bool = False, **kwargs):
+    if debe_validar(validar):
+        # Se valida en el worker, junto a la generación (ver validacion.py)
+        fn, args = validacion.generar_validada, (fn, *args)
+    if trabajo_id is None:
+        return await ejecutor.ejecutar(fn, *args, **kwargs)
+    return await ejecutor.ejecutar_trabajo(trabajo_id, fn, *args, **kwargs)
+
+async def revisar_validacion(malla, producto: str, origen: str, validar: bool):
+    """
+    Informa el reporte de una malla recién generada y, si la petición lo
+    pide (o LITHO_VALIDAR=estricto), rechaza las inválidas.
+    Las mallas que vienen del disco o que se generaron sin validar se
+    validan ahora en el pool.
+    """
+    if not debe_validar(validar):
+        return
+
+    nuevo = origen == "calculado"
+    if malla.validacion is None:
+        malla.validacion = await ejecutor.ejecutar(validacion.validar_malla, malla)
+        metricas.registrar_tiempos({"validacion": malla.validacion.segundos})
+        nuevo = True
+
+    reporte = malla.validacion
+    if nuevo:
+        metricas.registrar_validacion(reporte, producto)
+        if not reporte.valida:
+            logger.warning(f"Malla {producto}: {reporte}")
+
+    if validar or validacion.MODO == "estricto":
+        validacion.exigir_valida(reporte)
+
+async def malla_litofania(
+    image_bytes: bytes, parametros: dict, trabajo_id: Optional[str] = None, validar: bool = False
+):
+    malla, origen = await cache_mallas.obtener_o_calcular(
+        cache_mallas.clave(image_bytes, **parametros),
+        lambda: generar_en_pool(trabajo_id, generar_malla_3d, image_bytes, validar=validar, **parametros),
+    )
+    await revisar_validacion(malla, "litho", origen, validar)
+    return malla, origen
+
+async def malla_base_texto(
+    texto: str, res_px_mm: float = RES_PX_MM, trabajo_id: Optional[str] = None, validar: bool = False
+):
+    malla, origen = await cache_mallas.obtener_o_calcular(
+        cache_mallas.clave(texto.encode(), producto="base_texto", res_px_mm=res_px_mm),
+        lambda: generar_en_pool(trabajo_id, generar_malla_base_texto, texto, res_px_mm, validar=validar),
+    )
+    await revisar_validacion(malla, "base_texto", origen, validar)
+    return malla, origen
+
+# -----------------------
+# Resolución (vista previa / descarga)
+# -----------------------
+def parametros_litofania(
+    decimar: bool,
+    capa_mm: Optional[float],
+    preview: bool,
+    resolucion: Optional[int],
+    lado_mm: Optional[float] = None,
+    forma: Optional[str] = None,
+    ancho_marco: Optional[float] = None,
+    paredes: Optional[str] = None,
+    tono: Optional[str] = None,
+) -> dict:
+    """
+    preview usa PREVIEW_PX y fusiona coplanares (sin pérdida) para que el
+    visor reciba un STL chico; resolucion (px) fija el valor explícitamente.
+    lado_mm solo entra en la clave de caché si difiere del tamaño estándar,
+    y ancho_marco solo si hay forma (sin forma, el marco es el contorno rojo).
+    paredes="contorno" no se combina con decimar (la vista previa no decima).
+    tono solo entra en la clave si no es el perfil por defecto.
+    """
+    if resolucion is None:
+        resolucion = PREVIEW_PX if preview else PIXELS
+    validar_capa(capa_mm)
+    contorno = paredes is not None and paredes != "pixel"
+    if contorno:
+        validar_paredes(paredes)
+        if decimar:
+            raise ValueError("Las paredes por contorno no se combinan con la decimación")
+    parametros = {"decimar": decimar or (preview and not contorno), "capa_mm": capa_mm, "pixels": resolucion}
+    if lado_mm is not None and lado_mm != LADO_MM:
+        parametros["lado_mm"] = lado_mm
+    if forma:
+        parametros["forma"] = normalizar_forma(forma)
+        parametros["ancho_marco"] = MARCO_MM if ancho_marco is None else ancho_marco
+        validar_ancho_marco(parametros["ancho_marco"])
+    if contorno:
+        parametros["paredes"] = paredes
+    if tono is not None and normalizar_tono(tono) != TONO:
+        parametros["tono"] = normalizar_tono(tono)
+    return parametros
+
+def resolucion_texto(preview: bool, resolucion: Optional[float]) -> float:
+    """
+    px/mm del texto; la vista previa escala igual que la litofanía.
+    """
+    if resolucion is not None:
+        return resolucion
+    return RES_PX_MM * PREVIEW_PX / PIXELS if preview else RES_PX_MM
 
 # -----------------------
 # Generar STL
 # -----------------------
 @app.post("/api/generate-3d/")
-async def generate_3d(file: UploadFile = File(...)):
+async def generate_3d(
+    request: Request,
+    file: UploadFile = File(...),
+    decimar: bool = Form(False),
+    capa_mm: Optional[float] = Form(None),
+    preview: bool = Form(False),
+    resolucion: Optional[int] = Form(None),
+    formato: Optional[str] = Form(None),
+    lado_mm: Optional[float] = Form(None),
+    bandas: bool = Form(False),
+    forma: Optional[str] = Form(None),
+    ancho_marco: Optional[float] = Form(None),
+    paredes: Optional[str] = Form(None),
+    tono: Optional[str] = Form(None),
+    validar: bool = Form(False),
+):
     """
     Genera un STL a partir de una imagen FINAL enviada por el frontend.
 
     - Negro = vacío
     - Blanco / gris = relieve
+
+    Opcional:
+    - decimar    : fusiona regiones coplanares (STL mucho más liviano)
+    - capa_mm    : ajusta el relieve a la altura de capa de la impresora
+    - preview    : malla liviana para el visor (resolución reducida)
+    - resolucion : lado de la grilla de trabajo en píxeles
+    - formato    : "stl", "3mf" o "malla" (si no, según la cabecera Accept)
+    - lado_mm    : tamaño físico en X/Y (mm)
+    - bandas     : gran formato; malla por bandas con memoria acotada
+                   (solo STL, sin decimar, sin caché)
+    - forma      : "corazon", "circulo" o "cuadrado"; el marco se genera en
+                   el servidor y la imagen no necesita contorno rojo
+    - ancho_marco: ancho del marco de la forma (mm)
+    - paredes    : "pixel" (por defecto) o "contorno": paredes lisas que
+                   siguen el borde, con muchos menos triángulos (sin decimar)
+    - tono       : perfil de gris → relieve (contraste, curva S, gamma o
+                   calibración por filamento; ver tonos.py)
+    - validar    : rechaza la malla si no es cerrada y manifold (validacion.py)
     """
 
     if file.content_type not in ("image/png", "image/jpeg"):
         return {"detail": "Solo se aceptan imágenes PNG o JPG"}
 
     try:
-        image_bytes = await file.read()
+        formato = negociar_formato(formato, request.headers.get("accept"))
+        image_bytes = await leer_imagen(file)
         logger.info("Generando STL desde imagen raster")
 
-        stl_bytes = generar_modelo_3d(image_bytes)
+        parametros = parametros_litofania(
+            decimar, capa_mm, preview, resolucion, lado_mm, forma, ancho_marco, paredes, tono
+        )
+        gzip = acepta_gzip(request.headers.get("accept-encoding"))
+
+        if bandas:
+            if formato != "stl" or parametros["decimar"]:
+                raise ValueError("El modo por bandas solo genera STL sin decimar")
+            if "paredes" in parametros:
+                raise ValueError("El modo por bandas solo genera paredes por píxel")
+            if validar or validacion.MODO == "estricto":
+                raise ValueError("El modo por bandas no admite validar")
+            if debe_validar(validar):
+                # LITHO_VALIDAR=1 solo informa: se avisa y se cuenta como omitida
+                logger.warning("Modo por bandas: la malla no se valida")
+                metricas.registrar_validacion_omitida("litho")
+            return await respuesta_por_bandas(image_bytes, parametros, gzip)
 
-        logger.info(f"STL generado ({len(stl_bytes)} bytes)")
+        malla, origen = await malla_litofania(image_bytes, parametros, validar=validar)
 
-        return StreamingResponse(
-            io.BytesIO(stl_bytes),
-            media_type="application/sla",
-            headers={
-                "Content-Disposition": "attachment; filename=litho.stl"
-            },
-        )
+        logger.info(f"Malla generada ({malla.num_caras} triángulos, {origen}), formato {formato}")
+
+        return respuesta_malla(malla, "litho", formato, gzip, {"X-Cache": origen})
+
+    except Saturado:
+        return respuesta_saturado()
+
+    except ImagenDemasiadoGrande as e:
+        return respuesta_demasiado_grande(e)
 
     except ValueError as e:
         logger.warning(f"Error de validación: {e}")
@@ -86,19 +526,318 @@ async def generate_3d(file: UploadFile = File(...)):
         return {"detail": "Error interno al generar el modelo"}
 
 @app.post("/api/generate-text-base/")
-async def generate_text_base(texto: str = Form(...)):
+async def generate_text_base(
+    request: Request,
+    texto: str = Form(...),
+    preview: bool = Form(False),
+    resolucion: Optional[float] = Form(None),
+    formato: Optional[str] = Form(None),
+    validar: bool = Form(False),
+):
+    """
+    Opcional:
+    - preview    : malla liviana para el visor (resolución reducida)
+    - resolucion : píxeles por mm del texto
+    - formato    : "stl", "3mf" o "malla" (si no, según la cabecera Accept)
+    - validar    : rechaza la malla si no es cerrada y manifold
+    """
     logger.info(f"Generando base texto: {texto}")
 
-    stl_bytes = generar_base_texto_stl(texto)
+    try:
+        formato = negociar_formato(formato, request.headers.get("accept"))
+        malla, origen = await malla_base_texto(
+            texto, resolucion_texto(preview, resolucion), validar=validar
+        )
+    except Saturado:
+        return respuesta_saturado()
+    except ValueError as e:
+        logger.warning(f"Error de validación: {e}")
+        return {"detail": str(e)}
+
+    return respuesta_malla(
+        malla, "base_texto", formato,
+        acepta_gzip(request.headers.get("accept-encoding")),
+        {"X-Cache": origen},
+    )
+
+# -----------------------
+# Litofanía + base con texto
+# -----------------------
+@app.post("/api/generate-litho-stand/")
+async def generate_litho_stand(
+    request: Request,
+    file: UploadFile = File(...),
+    texto: str = Form(...),
+    decimar: bool = Form(False),
+    capa_mm: Optional[float] = Form(None),
+    preview: bool = Form(False),
+    resolucion: Optional[int] = Form(None),
+    lado_mm: Optional[float] = Form(None),
+    forma: Optional[str] = Form(None),
+    ancho_marco: Optional[float] = Form(None),
+    paredes: Optional[str] = Form(None),
+    tono: Optional[str] = Form(None),
+    formato: Optional[str] = Form(None),
+    validar: bool = Form(False),
+):
+    """
+    Litofanía de pie sobre la base con texto, en un solo archivo con los
+    dos cuerpos ya posicionados (ver conjunto.py).
+
+    Las piezas se generan a la vez en procesos distintos del pool (y se
+    cachean por separado): la latencia es la de la más lenta, no la suma.
+    Parámetros de la litofanía como en /api/generate-3d/ (resolucion en
+    px); preview también aplica al texto.
+    - formato : "3mf" (un objeto por pieza), "stl" (ambos sólidos) o "malla"
+    """
+    if file.content_type not in ("image/png", "image/jpeg"):
+        return JSONResponse(status_code=400, content={"detail": "Solo se aceptan imágenes PNG o JPG"})
+
+    try:
+        formato = negociar_formato(formato, request.headers.get("accept"))
+        parametros = parametros_litofania(
+            decimar, capa_mm, preview, resolucion, lado_mm, forma, ancho_marco, paredes, tono
+        )
+        image_bytes = await leer_imagen(file)
+        logger.info(f"Generando litofanía con base texto: {texto}")
+
+        (litho, origen_litho), (base, origen_base) = await asyncio.gather(
+            metricas.medir_parte(
+                "litofania", malla_litofania(image_bytes, parametros, validar=validar)
+            ),
+            metricas.medir_parte(
+                "base_texto",
+                malla_base_texto(texto, resolucion_texto(preview, None), validar=validar),
+            ),
+        )
+
+        conjunto = ensamblar_conjunto(litho, base, parametros.get("lado_mm", LADO_MM))
+
+        return respuesta_malla(
+            conjunto, "litho_base", formato,
+            acepta_gzip(request.headers.get("accept-encoding")),
+            {"X-Cache": f"litofania={origen_litho}, base_texto={origen_base}"},
+        )
+
+    except Saturado:
+        return respuesta_saturado()
+
+    except ImagenDemasiadoGrande as e:
+        return respuesta_demasiado_grande(e)
+
+    except ValueError as e:
+        logger.warning(f"Error de validación: {e}")
+        return JSONResponse(status_code=400, content={"detail": str(e)})
+
+    except Exception:
+        logger.exception("Error inesperado generando litofanía con base texto")
+        return JSONResponse(status_code=500, content={"detail": "Error interno al generar el modelo"})
+
+# -----------------------
+# Lotes (ZIP en streaming)
+# -----------------------
+def nombre_en_lote(indice: int, nombre: str) -> str:
+    base = os.path.splitext(os.path.basename(nombre or ""))[0]
+    base = re.sub(r"[^\w\-]+", "_", base).strip("_") or "litho"
+    return f"{indice:03d}_{base}.stl"
+
+@app.post("/api/generate-batch/")
+async def generate_batch(
+    files: List[UploadFile] = File([]),
+    textos: List[str] = Form([]),
+    decimar: bool = Form(False),
+    capa_mm: Optional[float] = Form(None),
+    forma: Optional[str] = Form(None),
+    ancho_marco: Optional[float] = Form(None),
+    paredes: Optional[str] = Form(None),
+    tono: Optional[str] = Form(None),
+    validar: bool = Form(False),
+):
+    """
+    Genera varias litofanías (y bases con texto) en paralelo y devuelve
+    un ZIP que se transmite a medida que cada STL termina.
+
+    Los errores por ítem no cortan el lote: se informan en resumen.json.
+    """
+    total = len(files) + len(textos)
+    if total == 0:
+        return JSONResponse(status_code=400, content={"detail": "El lote está vacío"})
+    if total > LOTE_MAX:
+        return JSONResponse(
+            status_code=413,
+            content={"detail": f"El lote admite como máximo {LOTE_MAX} ítems"},
+        )
+
+    try:
+        parametros = parametros_litofania(
+            decimar, capa_mm, preview=False, resolucion=None,
+            forma=forma, ancho_marco=ancho_marco, paredes=paredes, tono=tono,
+        )
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"detail": str(e)})
+    items = []
+
+    for file in files:
+        nombre = nombre_en_lote(len(items) + 1, file.filename)
+
+        if file.content_type not in ("image/png", "image/jpeg"):
+            items.append(ItemLote(nombre, None, error="Solo se aceptan imágenes PNG o JPG"))
+            continue
+
+        try:
+            image_bytes = await leer_imagen(file)
+        except ValueError as e:
+            items.append(ItemLote(nombre, None, error=str(e)))
+            continue
+
+        items.append(ItemLote(
+            nombre,
+            lambda image_bytes=image_bytes: malla_litofania(image_bytes, parametros, validar=validar),
+        ))
+
+    for texto in textos:
+        items.append(ItemLote(
+            nombre_en_lote(len(items) + 1, f"base_{texto}"),
+            lambda texto=texto: malla_base_texto(texto, validar=validar),
+        ))
+
+    logger.info(f"Lote de {len(files)} imágenes y {len(textos)} textos")
 
     return StreamingResponse(
-        io.BytesIO(stl_bytes),
-        media_type="application/sla",
-        headers={
-            "Content-Disposition": "attachment; filename=base_texto.stl"
+        zip_lote(items, concurrencia=ejecutor.workers),
+        media_type="application/zip",
+        headers={"Content-Disposition": "attachment; filename=lote.zip"},
+    )
+
+# -----------------------
+# Trabajos asíncronos
+# -----------------------
+def respuesta_trabajo(trabajo) -> JSONResponse:
+    return JSONResponse(
+        status_code=202,
+        content={
+            **trabajo.resumen(),
+            "url_estado": f"/api/jobs/{trabajo.id}",
+            "url_resultado": f"/api/jobs/{trabajo.id}/result",
         },
+        headers={"Location": f"/api/jobs/{trabajo.id}"},
     )
 
+def respuesta_trabajo_inexistente() -> JSONResponse:
+    return JSONResponse(status_code=404, content={"detail": "Trabajo inexistente o expirado"})
+
+@app.post("/api/jobs/generate-3d/")
+async def job_generate_3d(
+    file: UploadFile = File(...),
+    decimar: bool = Form(False),
+    capa_mm: Optional[float] = Form(None),
+    preview: bool = Form(False),
+    resolucion: Optional[int] = Form(None),
+    formato: Optional[str] = Form(None),
+    lado_mm: Optional[float] = Form(None),
+    forma: Optional[str] = Form(None),
+    ancho_marco: Optional[float] = Form(None),
+    paredes: Optional[str] = Form(None),
+    tono: Optional[str] = Form(None),
+    validar: bool = Form(False),
+):
+    """
+    Encola la generación de una litofanía y devuelve el id del trabajo.
+    Mismos parámetros que /api/generate-3d/ (salvo bandas).
+    """
+    if file.content_type not in ("image/png", "image/jpeg"):
+        return JSONResponse(status_code=400, content={"detail": "Solo se aceptan imágenes PNG o JPG"})
+
+    try:
+        parametros = parametros_litofania(
+            decimar, capa_mm, preview, resolucion, lado_mm, forma, ancho_marco, paredes, tono
+        )
+        image_bytes = await leer_imagen(file)
+        trabajo = gestor_trabajos.crear(
+            "litofania",
+            "litho",
+            lambda trabajo_id: malla_litofania(image_bytes, parametros, trabajo_id, validar),
+            negociar_formato(formato, None),
+        )
+    except Saturado:
+        return respuesta_saturado()
+    except ImagenDemasiadoGrande as e:
+        return respuesta_demasiado_grande(e)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"detail": str(e)})
+
+    logger.info(f"Trabajo {trabajo.id} encolado (litofanía)")
+    return respuesta_trabajo(trabajo)
+
+@app.post("/api/jobs/generate-text-base/")
+async def job_generate_text_base(
+    texto: str = Form(...),
+    preview: bool = Form(False),
+    resolucion: Optional[float] = Form(None),
+    formato: Optional[str] = Form(None),
+    validar: bool = Form(False),
+):
+    res_px_mm = resolucion_texto(preview, resolucion)
+
+    try:
+        trabajo = gestor_trabajos.crear(
+            "base_texto",
+            "base_texto",
+            lambda trabajo_id: malla_base_texto(texto, res_px_mm, trabajo_id, validar),
+            negociar_formato(formato, None),
+        )
+    except Saturado:
+        return respuesta_saturado()
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"detail": str(e)})
+
+    logger.info(f"Trabajo {trabajo.id} encolado (base texto: {texto})")
+    return respuesta_trabajo(trabajo)
+
+@app.get("/api/jobs/{trabajo_id}")
+async def job_status(trabajo_id: str):
+    trabajo = gestor_trabajos.obtener(trabajo_id)
+    if trabajo is None:
+        return respuesta_trabajo_inexistente()
+    return trabajo.resumen()
+
+@app.get("/api/jobs/{trabajo_id}/result")
+async def job_result(trabajo_id: str, request: Request):
+    trabajo = gestor_trabajos.obtener(trabajo_id)
+    if trabajo is None:
+        return respuesta_trabajo_inexistente()
+
+    if trabajo.estado == "error":
+        return JSONResponse(status_code=trabajo.codigo_error, content={"detail": trabajo.error})
+
+    if trabajo.estado != "listo":
+        return JSONResponse(
+            status_code=409,
+            content=trabajo.resumen(),
+            headers={"Retry-After": "1"},
+        )
+
+    cabeceras = {
+        "Content-Disposition": f"attachment; filename={trabajo.nombre_archivo}",
+        "X-Cache": trabajo.cache or "",
+        "Vary": "Accept-Encoding",
+    }
+
+    if (
+        GZIP_NIVEL > 0
+        and trabajo.formato not in COMPRIMIDOS
+        and acepta_gzip(request.headers.get("accept-encoding"))
+    ):
+        resultado = memoryview(trabajo.resultado)
+        bloques = (resultado[i:i + (1 << 22)] for i in range(0, len(resultado), 1 << 22))
+        return StreamingResponse(
+            iterar_gzip(bloques, GZIP_NIVEL),
+            media_type=trabajo.media_type,
+            headers={**cabeceras, "Content-Encoding": "gzip"},
+        )
+
+    return Response(content=trabajo.resultado, media_type=trabajo.media_type, headers=cabeceras)
+
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,711 @@
+"""
+Malla indexada (vértices compartidos)
+
+Representación interna de todos los sólidos del backend:
+- vertices : (V, 3) float32 → coordenadas únicas
+- caras    : (F, 3) int32   → índices de vértices por triángulo
+- normales : (F, 3) float32 → opcional; se calculan al serializar si faltan
+- validacion : reporte de validacion.py, si la malla se validó al generarse
+
+Cada nodo de la grilla se guarda una sola vez y los triángulos solo
+referencian índices. La expansión al formato (N, 3, 3) de numpy-stl
+se hace únicamente al serializar.
+"""
+
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Iterator, Optional
+import math
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from validacion import Reporte
+
+
+# Caras por bloque en los cálculos que expanden triángulos
+CARAS_POR_BLOQUE = 1 << 16
+
+
+# ============================================================
+# TIPO MALLA
+# ============================================================
+
+@dataclass
+class Malla:
+    vertices: np.ndarray
+    caras: np.ndarray
+    normales: Optional[np.ndarray] = None
+    validacion: Optional["Reporte"] = field(default=None, compare=False)
+
+    def __post_init__(self):
+        self.vertices = np.asarray(self.vertices, dtype=np.float32).reshape(-1, 3)
+        self.caras = np.asarray(self.caras, dtype=np.int32).reshape(-1, 3)
+        if self.normales is not None:
+            self.normales = np.asarray(self.normales, dtype=np.float32).reshape(-1, 3)
+
+    @property
+    def num_vertices(self) -> int:
+        return len(self.vertices)
+
+    @property
+    def num_caras(self) -> int:
+        return len(self.caras)
+
+    @property
+    def nbytes(self) -> int:
+        extra = self.normales.nbytes if self.normales is not None else 0
+        return self.vertices.nbytes + self.caras.nbytes + extra
+
+    def triangulos(self) -> np.ndarray:
+        """
+        Expande la malla al formato (N, 3, 3) float32 (un vértice por esquina).
+        """
+        return self.vertices[self.caras]
+
+    def normales_caras(self) -> np.ndarray:
+        """
+        Normal unitaria de cada cara. Si la malla no las trae
+        (conocidas analíticamente), se calculan una vez y se guardan.
+        """
+        if self.normales is None:
+            self.normales = calcular_normales(self.vertices, self.caras)
+        return self.normales
+
+    def transformar(self, matriz, centro=None) -> "Malla":
+        """
+        Aplica una transformación lineal 3x3 (opcionalmente respecto a un centro).
+        """
+        v = self.vertices.astype(np.float64)
+
+        if centro is not None:
+            centro = np.asarray(centro, dtype=np.float64)
+            v = v - centro
+
+        matriz = np.asarray(matriz, dtype=np.float64)
+        v = v @ matriz.T
+
+        if centro is not None:
+            v = v + centro
+
+        normales = None
+        if self.normales is not None:
+            normales = self.normales @ np.linalg.inv(matriz)
+            normales /= np.linalg.norm(normales, axis=1, keepdims=True).clip(1e-12)
+
+        return Malla(v, self.caras, normales)
+
+    def rotar(self, eje="y", grados=90, centro=None) -> "Malla":
+        return self.transformar(matriz_rotacion(eje, grados), centro)
+
+    def trasladar(self, dx=0, dy=0, dz=0) -> "Malla":
+        desplazamiento = np.array([dx, dy, dz], dtype=np.float32)
+        return Malla(self.vertices + desplazamiento, self.caras, self.normales)
+
+    @staticmethod
+    def concatenar(mallas) -> "Malla":
+        """
+        Une varias mallas en una sola, desplazando los índices de cada parte.
+        """
+        mallas = list(mallas)
+        if not mallas:
+            return Malla(np.empty((0, 3)), np.empty((0, 3)))
+
+        offsets = np.cumsum([0] + [m.num_vertices for m in mallas[:-1]])
+
+        normales = None
+        if any(m.normales is not None for m in mallas):
+            normales = np.concatenate([m.normales_caras() for m in mallas])
+
+        return Malla(
+            np.concatenate([m.vertices for m in mallas]),
+            np.concatenate([m.caras + off for m, off in zip(mallas, offsets)]),
+            normales,
+        )
+
+
+def calcular_normales(vertices: np.ndarray, caras: np.ndarray) -> np.ndarray:
+    """
+    Normales unitarias por producto vectorial (cero en caras degeneradas).
+    Se calculan por bloques sobre el arreglo de salida: los temporales
+    no crecen con la malla.
+    """
+    normales = np.empty((len(caras), 3), dtype=np.float32)
+
+    for inicio in range(0, len(caras), CARAS_POR_BLOQUE):
+        bloque = caras[inicio:inicio + CARAS_POR_BLOQUE]
+        v0 = vertices[bloque[:, 0]]
+        n = np.cross(vertices[bloque[:, 1]] - v0, vertices[bloque[:, 2]] - v0)
+        largo = np.linalg.norm(n, axis=1, keepdims=True)
+        np.divide(n, largo, out=n, where=largo > 0)
+        normales[inicio:inicio + len(bloque)] = n
+
+    return normales
+
+
+def matriz_rotacion(eje: str, grados: float) -> np.ndarray:
+    """
+    Matriz de rotación 3x3 alrededor de un eje cartesiano.
+    """
+    theta = math.radians(grados)
+    c, s = math.cos(theta), math.sin(theta)
+
+    if eje == "x":
+        return np.array([[1, 0, 0],
+                         [0, c, -s],
+                         [0, s,  c]])
+    if eje == "y":
+        return np.array([[ c, 0, s],
+                         [ 0, 1, 0],
+                         [-s, 0, c]])
+    if eje == "z":
+        return np.array([[c, -s, 0],
+                         [s,  c, 0],
+                         [0,  0, 1]])
+
+    raise ValueError("Eje debe ser 'x', 'y' o 'z'")
+
+
+# ============================================================
+# UTILIDADES DE INDEXACIÓN
+# ============================================================
+
+def _indexar_nodos(usados: np.ndarray) -> np.ndarray:
+    """
+    Asigna un índice consecutivo a cada nodo usado (-1 para los no usados).
+    """
+    ids = np.full(usados.shape, -1, dtype=np.int32)
+    ids[usados] = np.arange(int(usados.sum()), dtype=np.int32)
+    return ids
+
+
+def _celdas_y_paredes(mask: np.ndarray):
+    """
+    Celdas válidas de una máscara por píxel y sus paredes N/S/O/E.
+
+    Una celda (i, j) existe si el píxel es válido y no está en el borde
+    inferior/derecho de la grilla. Hay pared cuando la celda vecina
+    no existe (o está fuera de la grilla).
+    """
+    celdas = np.asarray(mask, dtype=bool)[:-1, :-1]
+
+    norte = celdas.copy()
+    norte[1:] &= ~celdas[:-1]
+    sur = celdas.copy()
+    sur[:-1] &= ~celdas[1:]
+    oeste = celdas.copy()
+    oeste[:, 1:] &= ~celdas[:, :-1]
+    este = celdas.copy()
+    este[:, :-1] &= ~celdas[:, 1:]
+
+    return celdas, (norte, sur, oeste, este)
+
+
+def _celdas_banda(mask: np.ndarray, desde: int, hasta: int):
+    """
+    Como _celdas_y_paredes, para las filas de celdas [desde, hasta).
+    Se mira una fila vecina arriba y abajo, así las paredes en el corte
+    entre bandas salen igual que sobre la grilla completa.
+    """
+    s0 = max(desde - 1, 0)
+    s1 = min(hasta + 2, mask.shape[0])
+    celdas, paredes = _celdas_y_paredes(mask[s0:s1])
+
+    recorte = slice(desde - s0, desde - s0 + (hasta - desde))
+    return celdas[recorte], tuple(p[recorte] for p in paredes)
+
+
+def _vertices_nodos(z_grid: np.ndarray, celdas: np.ndarray, x_lin: np.ndarray, y_lin: np.ndarray):
+    """
+    Vértice superior (Z del heightmap) e inferior (Z=0) de cada nodo
+    usado por alguna celda. Devuelve (ids, n_nodos, vertices).
+    """
+    filas, cols = z_grid.shape
+
+    usados = np.zeros((filas, cols), dtype=bool)
+    usados[:-1, :-1] |= celdas
+    usados[:-1, 1:] |= celdas
+    usados[1:, :-1] |= celdas
+    usados[1:, 1:] |= celdas
+
+    ids = _indexar_nodos(usados)
+    n_nodos = int(usados.sum())
+
+    nf, nc = np.nonzero(usados)
+    vertices = np.empty((2 * n_nodos, 3), dtype=np.float32)
+    vertices[:n_nodos, 0] = x_lin[nc]
+    vertices[:n_nodos, 1] = y_lin[nf]
+    vertices[:n_nodos, 2] = z_grid[nf, nc]
+    vertices[n_nodos:, :2] = vertices[:n_nodos, :2]
+    vertices[n_nodos:, 2] = 0
+
+    return ids, n_nodos, vertices
+
+
+# ============================================================
+# HEIGHTMAP → MALLA (RELIEVE + BASE + PAREDES)
+# ============================================================
+
+# Esquinas locales de cada celda: vt0..vt3 (relieve) y vb0..vb3 (base, Z=0)
+#   0:(i,j)  1:(i,j+1)  2:(i+1,j)  3:(i+1,j+1)
+_TRI_TOPE = np.array([[0, 2, 3], [0, 3, 1]])
+_TRI_BASE = np.array([[4, 7, 6], [4, 5, 7]])
+_TRI_NORTE = np.array([[0, 1, 5], [0, 5, 4]])
+_TRI_SUR = np.array([[2, 7, 3], [2, 6, 7]])
+_TRI_OESTE = np.array([[0, 6, 2], [0, 4, 6]])
+_TRI_ESTE = np.array([[1, 3, 7], [1, 7, 5]])
+
+# Normales conocidas (columnas → +X, filas → -Y)
+_N_BASE = np.array([0, 0, -1], dtype=np.float32)
+_N_PLANO = np.array([0, 0, 1], dtype=np.float32)
+_N_PAREDES = np.array([
+    [0, 1, 0],   # norte
+    [0, -1, 0],  # sur
+    [-1, 0, 0],  # oeste
+    [1, 0, 0],   # este
+], dtype=np.float32)
+
+
+def malla_heightmap(
+    z_grid: np.ndarray,
+    mask: np.ndarray,
+    x_lin: np.ndarray,
+    y_lin: np.ndarray,
+    decimar: bool = False,
+) -> Malla:
+    """
+    Convierte una grilla de alturas en un sólido cerrado indexado.
+
+    - x_lin   : coordenada X de cada columna (creciente)
+    - y_lin   : coordenada Y de cada fila (decreciente: fila 0 arriba)
+    - decimar : fusiona regiones coplanares (marco, base, tonos planos)
+                en rectángulos; la superficie resultante es idéntica
+
+    Cada nodo genera como máximo un vértice superior (Z del heightmap)
+    y uno inferior (Z=0). Sin decimar, las caras se emiten en el mismo
+    orden que el recorrido píxel a píxel: relieve, base y paredes N/S/O/E.
+    """
+    if decimar:
+        celdas, paredes_grid = _celdas_y_paredes(mask)
+        ids, n_nodos, vertices = _vertices_nodos(z_grid, celdas, x_lin, y_lin)
+        return _malla_heightmap_decimada(z_grid, celdas, paredes_grid, ids, n_nodos, vertices)
+
+    return malla_banda_heightmap(z_grid, mask, x_lin, y_lin, 0, z_grid.shape[0] - 1)
+
+
+def malla_banda_heightmap(
+    z_grid: np.ndarray,
+    mask: np.ndarray,
+    x_lin: np.ndarray,
+    y_lin: np.ndarray,
+    desde: int,
+    hasta: int,
+) -> Malla:
+    """
+    Malla (sin decimar) de las filas de celdas [desde, hasta) de la grilla.
+
+    Las paredes se deciden mirando las filas vecinas fuera de la banda y
+    los nodos del corte tienen las mismas coordenadas en las dos bandas
+    que lo comparten: concatenadas, las bandas producen exactamente los
+    mismos triángulos, en el mismo orden, que la grilla completa.
+    """
+    celdas, paredes_grid = _celdas_banda(mask, desde, hasta)
+    ids, n_nodos, vertices = _vertices_nodos(
+        z_grid[desde:hasta + 1], celdas, x_lin, y_lin[desde:hasta + 1]
+    )
+
+    ii, jj = np.nonzero(celdas)
+    paredes = [p[ii, jj] for p in paredes_grid]
+
+    # --- Índices de las 8 esquinas de cada celda ---
+    esquinas = np.empty((ii.size, 8), dtype=np.int32)
+    for k, (di, dj) in enumerate(((0, 0), (0, 1), (1, 0), (1, 1))):
+        esquinas[:, k] = ids[ii + di, jj + dj]
+    esquinas[:, 4:] = esquinas[:, :4] + n_nodos
+    del ii, jj, ids
+
+    # --- Conteo previo: posición de la primera cara de cada celda ---
+    n_caras = np.full(len(esquinas), 4, dtype=np.int32)
+    for pared in paredes:
+        n_caras += 2 * pared
+    inicio = np.cumsum(n_caras, dtype=np.int32)
+    inicio -= n_caras
+    total = int(inicio[-1] + n_caras[-1]) if len(inicio) else 0
+    del n_caras
+
+    # --- Buffers de salida de tamaño exacto, llenados in situ ---
+    caras = np.empty((total, 3), dtype=np.int32)
+    normales = np.empty((total, 3), dtype=np.float32)
+
+    caras[inicio] = esquinas[:, _TRI_TOPE[0]]
+    caras[inicio + 1] = esquinas[:, _TRI_TOPE[1]]
+    caras[inicio + 2] = esquinas[:, _TRI_BASE[0]]
+    caras[inicio + 3] = esquinas[:, _TRI_BASE[1]]
+
+    # Solo el relieve necesita producto vectorial; base y paredes son conocidas
+    normales[inicio] = calcular_normales(vertices, esquinas[:, _TRI_TOPE[0]])
+    normales[inicio + 1] = calcular_normales(vertices, esquinas[:, _TRI_TOPE[1]])
+    normales[inicio + 2] = _N_BASE
+    normales[inicio + 3] = _N_BASE
+
+    pos = inicio + 4
+    for tabla, pared, normal in zip((_TRI_NORTE, _TRI_SUR, _TRI_OESTE, _TRI_ESTE), paredes, _N_PAREDES):
+        sel = np.nonzero(pared)[0]
+        caras[pos[sel]] = esquinas[sel][:, tabla[0]]
+        caras[pos[sel] + 1] = esquinas[sel][:, tabla[1]]
+        normales[pos[sel]] = normal
+        normales[pos[sel] + 1] = normal
+        pos = pos + 2 * pared
+
+    return Malla(vertices, caras, normales)
+
+
+# ============================================================
+# HEIGHTMAP POR BANDAS (MEMORIA ACOTADA)
+# ============================================================
+
+def _rangos_bandas(filas: int, filas_banda: int):
+    """
+    Filas de celdas [desde, hasta) de cada banda para una grilla de `filas` nodos.
+    """
+    if filas_banda < 1:
+        raise ValueError("La banda debe tener al menos una fila")
+    filas_celdas = max(filas - 1, 0)
+    for desde in range(0, filas_celdas, filas_banda):
+        yield desde, min(desde + filas_banda, filas_celdas)
+
+
+def contar_caras_heightmap(mask: np.ndarray, filas_banda: int) -> int:
+    """
+    Cantidad de triángulos de malla_heightmap (sin decimar), contados
+    por bandas solo a partir de la máscara.
+    """
+    total = 0
+    for desde, hasta in _rangos_bandas(mask.shape[0], filas_banda):
+        celdas, paredes = _celdas_banda(mask, desde, hasta)
+        total += 4 * int(celdas.sum()) + 2 * sum(int(p.sum()) for p in paredes)
+    return total
+
+
+def iterar_bandas_heightmap(
+    z_grid: np.ndarray,
+    mask: np.ndarray,
+    x_lin: np.ndarray,
+    y_lin: np.ndarray,
+    filas_banda: int,
+) -> Iterator[Malla]:
+    """
+    Malla de la grilla banda por banda (ver malla_banda_heightmap):
+    el pico de memoria depende del tamaño de la banda, no del de la grilla.
+    """
+    for desde, hasta in _rangos_bandas(z_grid.shape[0], filas_banda):
+        yield malla_banda_heightmap(z_grid, mask, x_lin, y_lin, desde, hasta)
+
+
+# ============================================================
+# DECIMACIÓN: FUSIÓN DE CELDAS COPLANARES
+# ============================================================
+
+def _rectangulos_planos(plano: np.ndarray, clave: np.ndarray) -> np.ndarray:
+    """
+    Agrupa celdas planas con la misma clave (altura) en rectángulos.
+
+    Estrategia voraz: corridas horizontales por fila que se extienden
+    hacia abajo mientras coincidan columna inicial, final y clave.
+    Devuelve (R, 4) con (f0, c0, f1, c1) en celdas, extremos exclusivos.
+    """
+    cols = plano.shape[1]
+
+    sigue = np.zeros_like(plano)
+    sigue[:, 1:] = plano[:, 1:] & plano[:, :-1] & (clave[:, 1:] == clave[:, :-1])
+
+    inicio = plano & ~sigue
+    fin = plano.copy()
+    fin[:, :-1] &= ~sigue[:, 1:]
+
+    fi, ci = np.nonzero(inicio)
+    _, cf = np.nonzero(fin)
+    claves = clave[fi, ci]
+
+    rects = []
+    abiertos = {}
+
+    for f, c0, c1, k in zip(fi.tolist(), ci.tolist(), (cf + 1).tolist(), claves.tolist()):
+        idx = abiertos.get((c0, c1, k))
+
+        if idx is not None and rects[idx][2] == f:
+            rects[idx][2] = f + 1
+        else:
+            abiertos[(c0, c1, k)] = len(rects)
+            rects.append([f, c0, f + 1, c1])
+
+    return np.array(rects, dtype=np.int64).reshape(-1, 4)
+
+
+def _zipper(a, pos_a, b, pos_b) -> list:
+    """
+    Triangula un rectángulo a partir de sus dos cadenas de borde.
+
+    a, b : índices de nodos desde la esquina inicial hasta la opuesta
+           (a: lado izquierdo + superior, b: inferior + derecho)
+    pos  : posición de cada nodo a lo largo de su cadena
+
+    Las cadenas se "cosen" avanzando siempre por el nodo más cercano
+    al origen, sin usar nunca tres puntos colineales.
+    """
+    tris = [(a[0], b[1], a[1])]
+
+    i, j = 1, 1
+    ultimo_a, ultimo_b = len(a) - 2, len(b) - 2
+
+    while i < ultimo_a or j < ultimo_b:
+        if j == ultimo_b or (i < ultimo_a and pos_a[i + 1] <= pos_b[j + 1]):
+            tris.append((a[i], a[i + 1], b[j]))
+            i += 1
+        else:
+            tris.append((a[i], b[j], b[j + 1]))
+            j += 1
+
+    tris.append((a[i], b[j], a[-1]))
+    return tris
+
+
+def _triangular_rectangulos(rects: np.ndarray, necesarios: np.ndarray, ids: np.ndarray) -> np.ndarray:
+    """
+    Triangula rectángulos de celdas incluyendo en su borde todos los
+    nodos necesarios (esquinas de otras piezas y nodos de pared), de modo
+    que no quedan vértices en T y la malla sigue cerrada.
+    """
+    tris = []
+
+    for f0, c0, f1, c1 in rects.tolist():
+        izq = (f0 + np.nonzero(necesarios[f0:f1 + 1, c0])[0][::-1]).tolist()
+        sup = (c0 + 1 + np.nonzero(necesarios[f0, c0 + 1:c1 + 1])[0]).tolist()
+        inf = (c0 + np.nonzero(necesarios[f1, c0:c1 + 1])[0]).tolist()
+        der = (f0 + np.nonzero(necesarios[f0:f1, c1])[0][::-1]).tolist()
+
+        a = [(f, c0) for f in izq] + [(f0, c) for c in sup]
+        pos_a = [f1 - f for f in izq] + [(f1 - f0) + (c - c0) for c in sup]
+        b = [(f1, c) for c in inf] + [(f, c1) for f in der]
+        pos_b = [c - c0 for c in inf] + [(c1 - c0) + (f1 - f) for f in der]
+
+        tris += _zipper(a, pos_a, b, pos_b)
+
+    if not tris:
+        return np.empty((0, 3), dtype=np.int64)
+
+    nodos = np.array(tris, dtype=np.int64)
+    return ids[nodos[..., 0], nodos[..., 1]]
+
+
+def _orientar(caras: np.ndarray, vertices: np.ndarray, normal: np.ndarray) -> np.ndarray:
+    """
+    Invierte los triángulos cuya normal apunta en sentido contrario a la pedida.
+    """
+    v = vertices[caras]
+    cruz = np.cross(v[:, 1] - v[:, 0], v[:, 2] - v[:, 0])
+    invertir = cruz @ normal < 0
+    caras[invertir] = caras[invertir][:, [0, 2, 1]]
+    return caras
+
+
+def _compactar(vertices: np.ndarray, caras: np.ndarray, normales: np.ndarray) -> Malla:
+    """
+    Elimina los vértices que ya no referencia ninguna cara.
+    """
+    usados = np.zeros(len(vertices), dtype=bool)
+    usados[caras.ravel()] = True
+    nuevo = np.cumsum(usados) - 1
+    return Malla(vertices[usados], nuevo[caras], normales)
+
+
+def _malla_heightmap_decimada(z_grid, celdas, paredes_grid, ids, n_nodos, vertices) -> Malla:
+    """
+    Variante de malla_heightmap que fusiona celdas coplanares:
+    - Relieve: celdas con sus 4 esquinas a la misma altura
+    - Base: todo el plano Z=0
+    Las paredes se mantienen por arista de píxel.
+    """
+    filas, cols = z_grid.shape
+
+    z00 = z_grid[:-1, :-1]
+    plano = (
+        celdas &
+        (z00 == z_grid[:-1, 1:]) &
+        (z00 == z_grid[1:, :-1]) &
+        (z00 == z_grid[1:, 1:])
+    )
+
+    # --- Nodos usados por las paredes (pertenecen a ambos planos) ---
+    nodos_pared = np.zeros((filas, cols), dtype=bool)
+    norte, sur, oeste, este = paredes_grid
+    nodos_pared[:-1, :-1] |= norte | oeste
+    nodos_pared[:-1, 1:] |= norte | este
+    nodos_pared[1:, :-1] |= sur | oeste
+    nodos_pared[1:, 1:] |= sur | este
+
+    def esquinas_de(mascara_celdas):
+        nodos = np.zeros((filas, cols), dtype=bool)
+        nodos[:-1, :-1] |= mascara_celdas
+        nodos[:-1, 1:] |= mascara_celdas
+        nodos[1:, :-1] |= mascara_celdas
+        nodos[1:, 1:] |= mascara_celdas
+        return nodos
+
+    def plano_decimado(fusionables, clave, tabla, desplazamiento, signo, normal):
+        rects = _rectangulos_planos(fusionables, clave)
+        rects = rects[(rects[:, 2] - rects[:, 0]) * (rects[:, 3] - rects[:, 1]) > 1]
+
+        cubiertas = np.zeros_like(celdas)
+        necesarios = nodos_pared.copy()
+        for f0, c0, f1, c1 in rects.tolist():
+            cubiertas[f0:f1, c0:c1] = True
+            necesarios[[f0, f0, f1, f1], [c0, c1, c0, c1]] = True
+
+        sueltas = celdas & ~cubiertas
+        necesarios |= esquinas_de(sueltas)
+
+        ii, jj = np.nonzero(sueltas)
+        esquinas = np.stack([
+            ids[ii, jj], ids[ii, jj + 1], ids[ii + 1, jj], ids[ii + 1, jj + 1]
+        ], axis=1) + desplazamiento
+        caras_sueltas = esquinas[:, tabla].reshape(-1, 3)
+
+        caras_rects = _triangular_rectangulos(rects, necesarios, ids + desplazamiento)
+        caras_rects = _orientar(caras_rects, vertices, signo * _N_PLANO)
+
+        if normal is None:
+            normales_sueltas = calcular_normales(vertices, caras_sueltas)
+        else:
+            normales_sueltas = np.broadcast_to(normal, caras_sueltas.shape)
+
+        return [
+            (caras_sueltas, normales_sueltas),
+            (caras_rects, np.broadcast_to(signo * _N_PLANO, caras_rects.shape)),
+        ]
+
+    partes = []
+    partes += plano_decimado(plano, z00, _TRI_TOPE, 0, 1.0, None)
+    partes += plano_decimado(celdas, np.zeros_like(z00), _TRI_BASE - 4, n_nodos, -1.0, _N_BASE)
+
+    ii, jj = np.nonzero(celdas)
+    esquinas = np.empty((ii.size, 8), dtype=np.int32)
+    for k, (di, dj) in enumerate(((0, 0), (0, 1), (1, 0), (1, 1))):
+        esquinas[:, k] = ids[ii + di, jj + dj]
+    esquinas[:, 4:] = esquinas[:, :4] + n_nodos
+
+    for tabla, pared, normal in zip((_TRI_NORTE, _TRI_SUR, _TRI_OESTE, _TRI_ESTE), paredes_grid, _N_PAREDES):
+        sel = pared[ii, jj]
+        caras_pared = esquinas[sel][:, tabla].reshape(-1, 3)
+        partes.append((caras_pared, np.broadcast_to(normal, caras_pared.shape)))
+
+    return _compactar(
+        vertices,
+        np.concatenate([caras for caras, _ in partes]),
+        np.concatenate([normales for _, normales in partes]),
+    )
+
+
+# ============================================================
+# MÁSCARA 2D → SÓLIDO EXTRUIDO EN X (MALLADO VORAZ)
+# ============================================================
+
+def _tramos_pared(pared: np.ndarray, cortes: np.ndarray):
+    """
+    Une aristas de borde consecutivas de una misma fila en tramos.
+
+    pared  : (F, C) arista unitaria entre los nodos (f, c) y (f, c+1)
+    cortes : (F, C+1) nodos donde un tramo debe partirse obligatoriamente
+
+    Devuelve (fila, col_inicio, col_fin) de cada tramo, en nodos.
+    """
+    continua = np.zeros_like(pared)
+    continua[:, 1:] = pared[:, 1:] & pared[:, :-1] & ~cortes[:, 1:-1]
+
+    inicio = pared & ~continua
+    fin = pared.copy()
+    fin[:, :-1] &= ~continua[:, 1:]
+
+    fi, ci = np.nonzero(inicio)
+    _, cf = np.nonzero(fin)
+
+    return fi, ci, cf + 1
+
+
+def malla_extruida_x(mask: np.ndarray, espesor_mm: float, paso_mm: float) -> Malla:
+    """
+    Extruye en X una máscara 2D (filas → Y, columnas → Z) emitiendo solo
+    la superficie exterior del sólido:
+
+    - Tapas X- y X+ : celdas fusionadas en rectángulos
+    - Paredes       : aristas de borde unidas en tramos a lo largo de filas
+                      y columnas, un cuadrilátero por tramo
+
+    Los tramos se parten en toda esquina de rectángulo que cae sobre el
+    borde, y cada rectángulo incluye esas esquinas: no hay vértices en T
+    y el sólido queda cerrado. Cada píxel válido es un cubo de lado paso_mm.
+    """
+    h, w = mask.shape
+    celdas, (norte, sur, oeste, este) = _celdas_y_paredes(mask)
+
+    if not celdas.any():
+        return Malla(np.empty((0, 3)), np.empty((0, 3)), np.empty((0, 3)))
+
+    rects = _rectangulos_planos(celdas, np.zeros(celdas.shape, dtype=np.int8))
+
+    # --- Nodos necesarios: esquinas de todos los rectángulos ---
+    necesarios = np.zeros((h, w), dtype=bool)
+    f0, c0, f1, c1 = rects.T
+    necesarios[f0, c0] = necesarios[f0, c1] = True
+    necesarios[f1, c0] = necesarios[f1, c1] = True
+
+    ids = _indexar_nodos(necesarios)
+    n_nodos = int(necesarios.sum())
+
+    nf, nc = np.nonzero(necesarios)
+    vertices = np.empty((2 * n_nodos, 3), dtype=np.float32)
+    vertices[:n_nodos, 0] = 0.0
+    vertices[n_nodos:, 0] = espesor_mm
+    vertices[:n_nodos, 1] = (h - nf) * paso_mm
+    vertices[:n_nodos, 2] = nc * paso_mm
+    vertices[n_nodos:, 1:] = vertices[:n_nodos, 1:]
+
+    partes = []
+
+    # --- Tapas ---
+    tapa = _triangular_rectangulos(rects, necesarios, ids)
+    for desplazamiento, normal in ((0, [-1, 0, 0]), (n_nodos, [1, 0, 0])):
+        normal = np.array(normal, dtype=np.float32)
+        caras = _orientar(tapa + desplazamiento, vertices, normal)
+        partes.append((caras, normal))
+
+    # --- Paredes horizontales (norte: fila f, sur: fila f+1) ---
+    for pared, df, normal in ((norte, 0, [0, 1, 0]), (sur, 1, [0, -1, 0])):
+        fi, ca, cb = _tramos_pared(pared, necesarios[df:df + h - 1])
+        fi = fi + df
+        a, b = ids[fi, ca], ids[fi, cb]
+        partes.append(_quads_pared(a, b, n_nodos, vertices, normal))
+
+    # --- Paredes verticales (oeste: col c, este: col c+1), por transposición ---
+    for pared, dc, normal in ((oeste, 0, [0, 0, -1]), (este, 1, [0, 0, 1])):
+        ci, fa, fb = _tramos_pared(pared.T, necesarios[:, dc:dc + w - 1].T)
+        ci = ci + dc
+        a, b = ids[fa, ci], ids[fb, ci]
+        partes.append(_quads_pared(a, b, n_nodos, vertices, normal))
+
+    return Malla(
+        vertices,
+        np.concatenate([caras for caras, _ in partes]),
+        np.concatenate([np.broadcast_to(n, caras.shape) for caras, n in partes]),
+    )
+
+
+def _quads_pared(a, b, n_nodos, vertices, normal):
+    """
+    Cuadriláteros verticales (en X) entre los nodos a→b de cada tramo.
+    """
+    normal = np.array(normal, dtype=np.float32)
+    caras = np.concatenate([
+        np.stack([a, b, b + n_nodos], axis=1),
+        np.stack([a, b + n_nodos, a + n_nodos], axis=1),
+    ])
+    return _orientar(caras, vertices, normal), normal
@@ -0,0 +1,290 @@
+"""
+Métricas de generación
+
+- Tiempos por petición: las etapas medidas durante una petición (en el
+  proceso principal o devueltas por el worker) se acumulan en un
+  ContextVar y se informan en la cabecera Server-Timing.
+- Registro Prometheus mínimo, sin dependencias: contadores, gauges e
+  histogramas con etiquetas, expuestos en formato de texto (0.0.4).
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterator, Optional
+
+
+# Etapas de la petición en curso: nombre → segundos
+tiempos_peticion: ContextVar[Optional[dict]] = ContextVar("tiempos_peticion", default=None)
+
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BUCKETS_TRIANGULOS = (1e3, 1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 2.5e6, 5e6)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# ============================================================
+# REGISTRO PROMETHEUS
+# ============================================================
+
+def _valor(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+def _etiquetas(nombres: tuple, valores: tuple, extra: str = "") -> str:
+    partes = [f'{n}="{str(v)}"' for n, v in zip(nombres, valores)]
+    if extra:
+        partes.append(extra)
+    return "{" + ",".join(partes) + "}" if partes else ""
+
+
+class _Metrica:
+    tipo = ""
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: tuple = ()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self._lock = threading.Lock()
+
+    def _clave(self, etiquetas: dict) -> tuple:
+        return tuple(etiquetas.get(n, "") for n in self.etiquetas)
+
+    def exponer(self) -> "list[str]":
+        return [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}"]
+
+
+class Contador(_Metrica):
+    tipo = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._valores: dict = {}
+
+    def inc(self, valor: float = 1, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0) + valor
+
+    def exponer(self):
+        lineas = super().exponer()
+        with self._lock:
+            for clave, valor in sorted(self._valores.items()):
+                lineas.append(f"{self.nombre}{_etiquetas(self.etiquetas, clave)} {_valor(valor)}")
+        return lineas
+
+
+class Gauge(_Metrica):
+    """
+    Valor leído al exponer: `leer` devuelve un número o un dict
+    {tupla de etiquetas: valor}.
+    """
+    tipo = "gauge"
+
+    def __init__(self, nombre, ayuda, leer: Callable, etiquetas: tuple = ()):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.leer = leer
+
+    def exponer(self):
+        lineas = super().exponer()
+        valor = self.leer()
+        valores = valor if isinstance(valor, dict) else {(): valor}
+        for clave, v in sorted(valores.items()):
+            lineas.append(f"{self.nombre}{_etiquetas(self.etiquetas, clave)} {_valor(v)}")
+        return lineas
+
+
+class Histograma(_Metrica):
+    tipo = "histogram"
+
+    def __init__(self, nombre, ayuda, etiquetas: tuple = (), buckets: tuple = BUCKETS_SEGUNDOS):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.buckets = tuple(buckets)
+        self._series: dict = {}
+
+    def observar(self, valor: float, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self._lock:
+            serie = self._series.get(clave)
+            if serie is None:
+                serie = self._series[clave] = [[0] * (len(self.buckets) + 1), 0.0]
+            serie[0][bisect_left(self.buckets, valor)] += 1
+            serie[1] += valor
+
+    def exponer(self):
+        lineas = super().exponer()
+        with self._lock:
+            for clave, (conteos, suma) in sorted(self._series.items()):
+                acumulado = 0
+                for limite, n in zip(self.buckets + (float("inf"),), conteos):
+                    acumulado += n
+                    le = "+Inf" if limite == float("inf") else _valor(limite)
+                    etiquetas = _etiquetas(self.etiquetas, clave, f'le="{le}"')
+                    lineas.append(f"{self.nombre}_bucket{etiquetas} {acumulado}")
+                lineas.append(f"{self.nombre}_sum{_etiquetas(self.etiquetas, clave)} {_valor(suma)}")
+                lineas.append(f"{self.nombre}_count{_etiquetas(self.etiquetas, clave)} {acumulado}")
+        return lineas
+
+
+class Registro:
+
+    def __init__(self):
+        self._metricas: "list[_Metrica]" = []
+
+    def agregar(self, metrica: _Metrica) -> _Metrica:
+        self._metricas.append(metrica)
+        return metrica
+
+    def exponer(self) -> str:
+        lineas = []
+        for metrica in self._metricas:
+            lineas += metrica.exponer()
+        return "\n".join(lineas) + "\n"
+
+
+registro = Registro()
+
+PETICIONES = registro.agregar(Contador(
+    "litho_peticiones_total", "Peticiones HTTP atendidas", ("ruta", "codigo"),
+))
+LATENCIA = registro.agregar(Histograma(
+    "litho_peticion_segundos", "Latencia hasta el inicio de la respuesta", ("ruta",),
+))
+ETAPAS = registro.agregar(Histograma(
+    "litho_etapa_segundos", "Duración de cada etapa de generación", ("etapa",),
+))
+TRIANGULOS = registro.agregar(Histograma(
+    "litho_malla_triangulos", "Triángulos por malla entregada", ("producto",), BUCKETS_TRIANGULOS,
+))
+BYTES_SALIDA = registro.agregar(Contador(
+    "litho_bytes_salida_total", "Bytes de mallas enviados (tras compresión)", ("formato",),
+))
+VALIDACIONES = registro.agregar(Contador(
+    "litho_validaciones_total", "Mallas validadas (u omitidas) por resultado", ("producto", "resultado"),
+))
+DEFECTOS = registro.agregar(Contador(
+    "litho_validacion_defectos_total", "Defectos y avisos encontrados por el validador", ("producto", "defecto"),
+))
+
+_en_vuelo = 0
+registro.agregar(Gauge(
+    "litho_peticiones_en_vuelo", "Peticiones HTTP en curso", lambda: _en_vuelo,
+))
+
+
+# ============================================================
+# TIEMPOS POR PETICIÓN
+# ============================================================
+
+def registrar_tiempos(tiempos: dict):
+    """
+    Suma las etapas a la petición en curso y a los histogramas.
+    """
+    actuales = tiempos_peticion.get()
+    for nombre, segundos in tiempos.items():
+        ETAPAS.observar(segundos, etapa=nombre)
+        if actuales is not None:
+            actuales[nombre] = actuales.get(nombre, 0.0) + segundos
+
+
+def registrar_validacion(reporte, producto: str):
+    """
+    Cuenta una malla validada (ver validacion.Reporte) y sus defectos.
+    """
+    VALIDACIONES.inc(producto=producto, resultado="valida" if reporte.valida else "invalida")
+    for defecto, n in reporte.defectos().items():
+        DEFECTOS.inc(n, producto=producto, defecto=defecto)
+
+
+def registrar_validacion_omitida(producto: str):
+    """
+    Cuenta una malla que debía validarse y no se validó (modo por bandas).
+    """
+    VALIDACIONES.inc(producto=producto, resultado="omitida")
+
+
+async def medir_parte(prefijo: str, pendiente):
+    """
+    Espera una parte de una petición compuesta (en su propia tarea, p. ej.
+    dentro de asyncio.gather) y suma sus etapas a la petición como
+    "prefijo.etapa": las partes en paralelo no se mezclan.
+    """
+    padre = tiempos_peticion.get()
+    propios = {}
+    token = tiempos_peticion.set(propios)
+    try:
+        return await pendiente
+    finally:
+        tiempos_peticion.reset(token)
+        if padre is not None:
+            for nombre, segundos in propios.items():
+                padre[f"{prefijo}.{nombre}"] = padre.get(f"{prefijo}.{nombre}", 0.0) + segundos
+
+
+def server_timing(tiempos: dict) -> str:
+    return ", ".join(f"{nombre};dur={segundos * 1000:.1f}" for nombre, segundos in tiempos.items())
+
+
+@contextmanager
+def peticion():
+    """
+    Abre el contexto de tiempos de una petición HTTP.
+    """
+    global _en_vuelo
+    tiempos = {}
+    token = tiempos_peticion.set(tiempos)
+    _en_vuelo += 1
+    try:
+        yield tiempos
+    finally:
+        _en_vuelo -= 1
+        tiempos_peticion.reset(token)
+
+
+def medir_salida(bloques: Iterator[bytes], formato: str) -> Iterator[bytes]:
+    """
+    Envuelve el cuerpo transmitido: mide la serialización (tiempo dentro
+    del codificador) y cuenta los bytes enviados.
+    Se consume en el threadpool de Starlette; el registro es thread-safe.
+    """
+    segundos = 0.0
+    total = 0
+    iterador = iter(bloques)
+
+    while True:
+        t0 = time.perf_counter()
+        try:
+            bloque = next(iterador)
+        except StopIteration:
+            break
+        finally:
+            segundos += time.perf_counter() - t0
+        total += len(bloque)
+        yield bloque
+
+    ETAPAS.observar(segundos, etapa="serializacion")
+    BYTES_SALIDA.inc(total, formato=formato)
+
+
+# ============================================================
+# EXPOSICIÓN
+# ============================================================
+
+def exponer(estados: Optional[dict] = None) -> str:
+    """
+    Texto Prometheus del registro más el estado instantáneo de los
+    componentes ({"generacion": ejecutor.estado(), ...}): cada valor
+    numérico se expone como gauge litho_<componente>_<clave>.
+    """
+    lineas = [registro.exponer().rstrip("\n")]
+
+    for componente, estado in (estados or {}).items():
+        for clave, valor in estado.items():
+            if isinstance(valor, bool) or not isinstance(valor, (int, float)):
+                continue
+            nombre = f"litho_{componente}_{clave}"
+            lineas += [f"# TYPE {nombre} gauge", f"{nombre} {_valor(valor)}"]
+
+    return "\n".join(lineas) + "\n"
@@ -0,0 +1,78 @@
+"""
+Progreso y tiempos por etapa en los procesos de generación
+
+Los pipelines envuelven cada etapa en `with etapa(nombre, fraccion)`:
+- el tiempo de la etapa se acumula y vuelve al proceso principal junto
+  con el resultado (ver ejecutar_en_worker)
+- dentro de un trabajo asíncrono, el avance viaja por una cola
+  multiprocessing al proceso principal
+
+Fuera del pool (scripts, benchmark) ambas cosas son no-ops baratas.
+"""
+
+import time
+from contextlib import contextmanager
+
+
+# Cola hacia el proceso principal (se configura al iniciar cada worker)
+_cola = None
+
+# Trabajo que este proceso está ejecutando ahora
+_trabajo_actual = None
+
+# Tiempos por etapa de la llamada en curso (None: no se miden)
+_tiempos = None
+
+
+def configurar(cola):
+    global _cola
+    _cola = cola
+
+
+def reportar(etapa: str, fraccion: float):
+    """
+    etapa    : nombre corto de la etapa en curso
+    fraccion : avance de la generación en [0, 1]
+    """
+    if _cola is None or _trabajo_actual is None:
+        return
+    _cola.put((_trabajo_actual, etapa, float(fraccion)))
+
+
+@contextmanager
+def etapa(nombre: str, fraccion: float = None):
+    """
+    Mide la duración del bloque bajo `nombre` y, si se indica,
+    reporta `fraccion` como avance al comenzar.
+    """
+    if fraccion is not None:
+        reportar(nombre, fraccion)
+
+    if _tiempos is None:
+        yield
+        return
+
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        _tiempos[nombre] = _tiempos.get(nombre, 0.0) + time.perf_counter() - t0
+
+
+def ejecutar_en_worker(trabajo_id, fn, *args, **kwargs):
+    """
+    Punto de entrada en el worker.
+    Devuelve (resultado, tiempos_por_etapa, inicio) con inicio en
+    time.time() para que el proceso principal calcule la espera en cola.
+    """
+    global _trabajo_actual, _tiempos
+
+    inicio = time.time()
+    _trabajo_actual = trabajo_id
+    _tiempos = {}
+    try:
+        resultado = fn(*args, **kwargs)
+        return resultado, _tiempos, inicio
+    finally:
+        _trabajo_actual = None
+        _tiempos = None
@@ -0,0 +1,9 @@
+"""
+Los módulos del backend se importan planos (como en main.py),
+así que el directorio backend/ va al sys.path.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+
+from cache import CacheMallas
+from malla import Malla
+
+
+MALLA = Malla(vertices=[(0, 0, 0), (1, 0, 0), (0, 1, 0)], caras=[(0, 1, 2)])
+
+
+def test_cancelar_al_primero_no_corta_a_los_coalescidos():
+    cache = CacheMallas(max_bytes=1024 * 1024)
+    calculos = 0
+
+    async def calcular():
+        nonlocal calculos
+        calculos += 1
+        await asyncio.sleep(0.1)
+        return MALLA
+
+    async def escenario():
+        primero = asyncio.create_task(cache.obtener_o_calcular("k", calcular))
+        await asyncio.sleep(0.01)
+        segundo = asyncio.create_task(cache.obtener_o_calcular("k", calcular))
+        await asyncio.sleep(0.01)
+
+        primero.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await primero
+
+        return await segundo, await cache.obtener_o_calcular("k", calcular)
+
+    (malla, origen), (_, origen_despues) = asyncio.run(escenario())
+
+    assert malla is MALLA
+    assert origen == "coalescido"
+    assert origen_despues == "memoria"
+    assert calculos == 1
+
+
+def test_errores_llegan_a_todos_los_que_esperan():
+    cache = CacheMallas(max_bytes=1024 * 1024)
+
+    async def calcular():
+        await asyncio.sleep(0.05)
+        raise ValueError("imagen inválida")
+
+    async def escenario():
+        return await asyncio.gather(
+            cache.obtener_o_calcular("k", calcular),
+            cache.obtener_o_calcular("k", calcular),
+            return_exceptions=True,
+        )
+
+    resultados = asyncio.run(escenario())
+    assert all(isinstance(r, ValueError) for r in resultados)
+    assert not cache._en_curso
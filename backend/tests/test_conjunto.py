@@ -0,0 +1,29 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from conjunto import ensamblar_conjunto
+from ensamblaje import Ensamblaje
+from letras import BASE_ALTO_MM, malla_bloque_base
+from litofania import generar_malla_3d
+
+
+def _imagen_gris(px: int = 150) -> bytes:
+    gris = np.tile(np.linspace(40, 220, px, dtype=np.uint8), (px, 1))
+    buffer = io.BytesIO()
+    Image.fromarray(gris).convert("RGB").save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("forma", ["cuadrado", "circulo", "corazon"])
+def test_litofania_apoya_sobre_el_bloque(forma):
+    litofania = generar_malla_3d(_imagen_gris(), pixels=150, lado_mm=100, forma=forma)
+    assert litofania.vertices[:, 1].min() > 0     # la forma no empieza en Y = 0
+
+    conjunto = ensamblar_conjunto(litofania, malla_bloque_base(), 100)
+    pieza = next(p for p in conjunto.piezas if p.nombre == "litofania")
+    vertices = Ensamblaje([pieza]).construir().vertices
+
+    assert vertices[:, 1].min() == pytest.approx(BASE_ALTO_MM, abs=1e-4)
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from contorno import malla_heightmap_contorno
+from malla import malla_heightmap
+from validacion import validar_malla
+
+
+def _grilla(mask: np.ndarray):
+    filas, cols = mask.shape
+    return np.arange(cols, dtype=np.float64), np.arange(filas, dtype=np.float64)[::-1]
+
+
+def _disco(lado: int = 60, radio: float = 20.0) -> np.ndarray:
+    yy, xx = np.mgrid[0:lado, 0:lado]
+    return (yy - lado / 2) ** 2 + (xx - lado / 2) ** 2 <= radio ** 2
+
+
+def _volumen(malla) -> float:
+    v = malla.vertices.astype(np.float64)[malla.caras]
+    return float(np.einsum("ij,ij->i", v[:, 0], np.cross(v[:, 1], v[:, 2])).sum() / 6)
+
+
+@pytest.mark.parametrize("semilla", range(40))
+def test_mascaras_aleatorias_dan_mallas_validas(semilla):
+    rng = np.random.default_rng(semilla)
+    mask = rng.random((24, 28)) < 0.6
+    # Suavizado: manchas con huecos, istmos y celdas sueltas
+    vecinos = sum(np.roll(np.roll(mask, di, 0), dj, 1) for di in (-1, 0, 1) for dj in (-1, 0, 1))
+    mask = vecinos >= 5
+    z = 1.0 + rng.random(mask.shape)
+    x_lin, y_lin = _grilla(mask)
+
+    malla = malla_heightmap_contorno(z, mask, x_lin, y_lin)
+
+    assert validar_malla(malla).valida
+    assert _volumen(malla) > 0
+
+
+@pytest.mark.parametrize("pendiente", [0.0, 0.05])
+def test_volumen_como_malla_heightmap(pendiente):
+    mask = _disco()
+    yy, xx = np.mgrid[0:mask.shape[0], 0:mask.shape[1]]
+    z = 2.0 + pendiente * (xx + yy)
+    x_lin, y_lin = _grilla(mask)
+
+    contorno = malla_heightmap_contorno(z, mask, x_lin, y_lin)
+    pixel = malla_heightmap(z, mask, x_lin, y_lin)
+
+    # Misma superficie salvo el desvío de la simplificación a lo largo del borde
+    assert _volumen(contorno) == pytest.approx(_volumen(pixel), rel=0.02)
+    assert contorno.num_caras < pixel.num_caras
+
+
+def test_borde_de_la_grilla_queda_fuera():
+    mask = np.ones((10, 10), dtype=bool)
+    x_lin, y_lin = _grilla(mask)
+
+    malla = malla_heightmap_contorno(np.full(mask.shape, 2.0), mask, x_lin, y_lin)
+
+    # Los nodos del borde cuentan como fuera: el contorno pasa a medio paso
+    # de la primera fila/columna interior, no por el borde de la grilla
+    assert validar_malla(malla).valida
+    assert malla.vertices[:, 0].min() == pytest.approx(0.5)
+    assert malla.vertices[:, 0].max() == pytest.approx(8.5)
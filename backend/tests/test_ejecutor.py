@@ -0,0 +1,38 @@
+import asyncio
+import time
+
+from ejecutor import EjecutorMallas
+
+
+def test_cancelar_la_espera_no_libera_el_cupo():
+    ejecutor = EjecutorMallas(workers=1, max_cola=0)
+
+    async def escenario():
+        await ejecutor.calentar()
+        espera = asyncio.create_task(ejecutor.ejecutar(time.sleep, 0.5))
+        await asyncio.sleep(0.2)
+
+        espera.cancel()
+        await asyncio.sleep(0.05)
+        ocupado = ejecutor.en_vuelo
+
+        await asyncio.sleep(0.5)
+        return ocupado, ejecutor.en_vuelo
+
+    try:
+        ocupado, libre = asyncio.run(escenario())
+    finally:
+        ejecutor.cerrar()
+
+    assert ocupado == 1
+    assert libre == 0
+
+
+def test_calentar_alcanza_a_todos_los_workers():
+    ejecutor = EjecutorMallas(workers=3)
+    try:
+        pids = asyncio.run(ejecutor.calentar())
+    finally:
+        ejecutor.cerrar()
+
+    assert len(pids) == 3
@@ -0,0 +1,20 @@
+import letras
+from validacion import validar_malla
+
+
+def test_precalentar_cubre_textos_reales():
+    letras.malla_glifo.cache_clear()
+    letras.precalentar_glifos()
+    calentados = letras.malla_glifo.cache_info()
+
+    for texto in ("Ana", "Valentina", "Jose Luis"):
+        letras.componer_texto(texto)
+
+    info = letras.malla_glifo.cache_info()
+    assert info.misses == calentados.misses
+    assert info.hits - calentados.hits == len("Ana" "Valentina" "Jose Luis")
+
+
+def test_glifos_escalados_forman_malla_valida():
+    reporte = validar_malla(letras.generar_malla_base_texto.__wrapped__("Valentina 12"))
+    assert reporte.valida, reporte
@@ -0,0 +1,14 @@
+import math
+import os
+
+import pytest
+
+from litofania import escribir_stl_por_bandas, generar_malla_3d
+
+
+@pytest.mark.parametrize("capa_mm", [0.0, -0.2, 0.02, 2.5, math.nan, math.inf])
+def test_capa_fuera_de_rango(capa_mm):
+    with pytest.raises(ValueError, match="altura de capa"):
+        generar_malla_3d(b"", capa_mm=capa_mm)
+    with pytest.raises(ValueError, match="altura de capa"):
+        escribir_stl_por_bandas(b"", os.devnull, capa_mm=capa_mm)
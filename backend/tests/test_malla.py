@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from malla import malla_heightmap
+from validacion import validar_malla
+
+
+# Máscara de referencia: un anillo con un hueco y una celda suelta
+MASCARA = np.array([
+    [1, 1, 1, 1, 0, 0],
+    [1, 1, 1, 1, 0, 0],
+    [1, 1, 0, 1, 1, 1],
+    [1, 1, 1, 1, 1, 1],
+    [0, 0, 0, 1, 1, 0],
+    [0, 0, 0, 1, 1, 0],
+], dtype=bool)
+
+
+def _alturas(mask: np.ndarray) -> np.ndarray:
+    filas, cols = mask.shape
+    return 1.0 + np.add.outer(np.arange(filas) * 0.25, np.arange(cols) * 0.5)
+
+
+def _referencia(z: np.ndarray, mask: np.ndarray, x_lin, y_lin):
+    """
+    Recorrido píxel a píxel: triángulos y volumen esperados.
+    El volumen bajo cada celda es el de sus dos triángulos de relieve
+    (0,2,3) y (0,3,1), prismas de área × altura media.
+    """
+    celdas = mask[:-1, :-1]
+    filas, cols = celdas.shape
+    triangulos = volumen = 0.0
+
+    for i in range(filas):
+        for j in range(cols):
+            if not celdas[i, j]:
+                continue
+            triangulos += 4
+            for di, dj in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+                vi, vj = i + di, j + dj
+                if not (0 <= vi < filas and 0 <= vj < cols and celdas[vi, vj]):
+                    triangulos += 2
+
+            area = abs((x_lin[j + 1] - x_lin[j]) * (y_lin[i + 1] - y_lin[i])) / 2
+            z0, z1, z2, z3 = z[i, j], z[i, j + 1], z[i + 1, j], z[i + 1, j + 1]
+            volumen += area * ((z0 + z2 + z3) + (z0 + z3 + z1)) / 3
+
+    return int(triangulos), volumen
+
+
+def _volumen(malla) -> float:
+    v = malla.vertices.astype(np.float64)[malla.caras]
+    return float(np.einsum("ij,ij->i", v[:, 0], np.cross(v[:, 1], v[:, 2])).sum() / 6)
+
+
+@pytest.mark.parametrize("decimar", [False, True])
+def test_malla_heightmap_contra_referencia(decimar):
+    filas, cols = MASCARA.shape
+    x_lin = np.arange(cols, dtype=np.float64)
+    y_lin = np.arange(filas, dtype=np.float64)[::-1] * 1.5
+    z = _alturas(MASCARA)
+
+    malla = malla_heightmap(z, MASCARA, x_lin, y_lin, decimar=decimar)
+    triangulos, volumen = _referencia(z, MASCARA, x_lin, y_lin)
+
+    if not decimar:
+        assert malla.num_caras == triangulos
+    assert _volumen(malla) == pytest.approx(volumen, rel=1e-6)
+    assert validar_malla(malla).valida
+
+
+def test_caja_plana():
+    mask = np.ones((4, 4), dtype=bool)
+    z = np.full((4, 4), 2.0)
+    lin = np.arange(4, dtype=np.float64)
+
+    malla = malla_heightmap(z, mask, lin, lin[::-1])
+
+    # 9 celdas × (2 relieve + 2 base) + 12 aristas de borde × 2
+    assert malla.num_caras == 9 * 4 + 12 * 2
+    assert _volumen(malla) == pytest.approx(3 * 3 * 2)
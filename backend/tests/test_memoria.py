@@ -0,0 +1,18 @@
+import pytest
+
+import benchmark
+
+
+# Una resolución donde la cota por megapíxel pesa más que el margen fijo
+CASOS = [
+    caso for caso in benchmark.construir_casos((300,), benchmark.RELLENOS[-1:], ("Hola",))
+    if caso.limite_memoria_mb is not None
+]
+
+
+@pytest.mark.parametrize("caso", CASOS, ids=lambda caso: caso.clave)
+def test_pico_de_memoria_por_megapixel(caso):
+    resultado = benchmark.medir(caso, repeticiones=1)
+
+    assert resultado.pico_mb <= caso.limite_memoria_mb
+    assert resultado.valida is not False
@@ -0,0 +1,42 @@
+import asyncio
+
+from malla import Malla
+from trabajos import GestorTrabajos
+
+
+TETRAEDRO = Malla(
+    vertices=[(0, 0, 0), (1, 0, 0), (0, 1, 0), (0, 0, 1)],
+    caras=[(0, 2, 1), (0, 1, 3), (0, 3, 2), (1, 2, 3)],
+)
+BYTES_STL = 84 + 50 * 4
+
+
+async def _terminar(gestor: GestorTrabajos, cantidad: int):
+    async def generar(trabajo_id):
+        return TETRAEDRO, "miss"
+
+    trabajos = [gestor.crear("prueba", f"t{i}", generar) for i in range(cantidad)]
+    while gestor.pendientes:
+        await asyncio.sleep(0.01)
+    return trabajos
+
+
+def test_terminados_se_desalojan_por_cantidad():
+    gestor = GestorTrabajos(max_pendientes=16, ttl_s=600, concurrencia=1, max_terminados=3)
+    trabajos = asyncio.run(_terminar(gestor, 5))
+
+    assert gestor.terminados == 3
+    assert gestor.desalojados == 2
+    assert gestor.obtener(trabajos[0].id) is None
+    assert gestor.obtener(trabajos[-1].id).resultado is not None
+
+
+def test_terminados_se_desalojan_por_bytes():
+    gestor = GestorTrabajos(
+        max_pendientes=16, ttl_s=600, concurrencia=1,
+        max_resultados_mb=2.5 * BYTES_STL / (1024 * 1024),
+    )
+    asyncio.run(_terminar(gestor, 5))
+
+    assert gestor.terminados == 2
+    assert gestor.bytes_retenidos <= gestor.max_resultados_bytes
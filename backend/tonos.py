@@ -0,0 +1,101 @@
+"""
+Perfiles de tono: luminancia (uint8) → altura del relieve (mm)
+
+Cada perfil es una cadena de ajustes sobre la luminancia normalizada
+t ∈ [0, 1] (0 = negro, 1 = blanco), compilada en una tabla de 256
+entradas. Aplicarla es un único gather indexado sobre la imagen en
+escala de grises (uint8), sin aritmética por píxel:
+
+1. contraste : se estira alrededor del gris medio
+2. curva_s   : mezcla con una curva S (smoothstep) que abre los medios tonos
+3. gamma     : t ** gamma (> 1 oscurece los medios tonos)
+4. espesor   : lineal en t entre el espesor máximo (negro) y el mínimo
+   (blanco) o, con atenuacion_mm, según Beer–Lambert: la luz transmitida
+   cae como exp(-k · espesor), así que se elige el espesor cuya
+   transmisión es lineal en t. k depende del filamento; los valores de
+   PERFILES son de partida y se ajustan con una tira de calibración
+
+"lineal" reproduce el mapeo histórico (espesor lineal en la luminancia).
+"""
+
+from dataclasses import dataclass
+from typing import Optional
+import unicodedata
+
+import numpy as np
+
+
+TONO = "lineal"          # Perfil por defecto
+
+
+@dataclass(frozen=True)
+class PerfilTono:
+    contraste: float = 1.0
+    curva_s: float = 0.0               # 0 = sin curva, 1 = smoothstep completo
+    gamma: float = 1.0
+    atenuacion_mm: Optional[float] = None   # k (1/mm) del filamento; None = lineal
+
+
+PERFILES = {
+    "lineal": PerfilTono(),
+    "contraste": PerfilTono(contraste=1.3),
+    "curva_s": PerfilTono(curva_s=0.6),
+    "gamma": PerfilTono(gamma=1.8),
+    "suave": PerfilTono(contraste=0.85, gamma=0.8),
+    # Calibración por filamento (Beer–Lambert)
+    "pla_blanco": PerfilTono(atenuacion_mm=0.9),
+    "pla_natural": PerfilTono(atenuacion_mm=0.5),
+    "petg_blanco": PerfilTono(atenuacion_mm=0.7),
+}
+
+
+def normalizar_tono(tono: str) -> str:
+    """
+    "PLA Blanco" → "pla_blanco". Error si no es un perfil conocido.
+    """
+    nombre = unicodedata.normalize("NFKD", tono.strip().lower())
+    nombre = "".join(c for c in nombre if not unicodedata.combining(c))
+    nombre = nombre.replace(" ", "_").replace("-", "_")
+    if nombre not in PERFILES:
+        raise ValueError(f"Tono no soportado: {tono} (usa {', '.join(PERFILES)})")
+    return nombre
+
+
+# ============================================================
+# COMPILACIÓN DE TABLAS
+# ============================================================
+
+def curva_tono(perfil: PerfilTono) -> np.ndarray:
+    """
+    Luminancia ajustada t' ∈ [0, 1] para cada nivel de gris 0..255 (float64).
+    """
+    t = np.arange(256, dtype=np.float64) / 255.0
+
+    if perfil.contraste != 1.0:
+        t = np.clip((t - 0.5) * perfil.contraste + 0.5, 0.0, 1.0)
+
+    if perfil.curva_s:
+        t = t + perfil.curva_s * (t * t * (3 - 2 * t) - t)
+
+    if perfil.gamma != 1.0:
+        t = t ** perfil.gamma
+
+    return t
+
+
+def tabla_tono(tono: str, z_min: float, z_max: float) -> np.ndarray:
+    """
+    Tabla (256,) float32: altura del relieve (mm, espesor total) por nivel
+    de gris, entre z_max (negro) y z_min (blanco).
+    """
+    perfil = PERFILES[normalizar_tono(tono)]
+    t = curva_tono(perfil)
+
+    if perfil.atenuacion_mm is None:
+        z = z_max - t * (z_max - z_min)
+    else:
+        k = perfil.atenuacion_mm
+        claro, oscuro = np.exp(-k * z_min), np.exp(-k * z_max)
+        z = -np.log(oscuro + t * (claro - oscuro)) / k
+
+    return z.astype(np.float32)
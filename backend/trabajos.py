@@ -0,0 +1,290 @@
+"""
+Trabajos asíncronos de generación
+
+Alternativa a los endpoints síncronos para generaciones lentas: el
+cliente envía el trabajo, consulta su estado (etapa y porcentaje) y
+descarga el STL cuando está listo, sin mantener abierta la conexión.
+
+- La cola vive en el proceso: como máximo `concurrencia` trabajos usan
+  el pool de generación a la vez, el resto espera su turno.
+- El avance de la generación llega desde los workers (ver progreso.py);
+  la serialización se mide por bytes escritos (si el tamaño del formato
+  se conoce de antemano).
+- Los resultados se descartan `ttl_s` segundos después de terminar, o
+  antes si los terminados superan `max_terminados` trabajos o
+  `max_resultados_mb` MB de resultados retenidos (los más antiguos primero).
+
+Configuración por variables de entorno:
+- LITHO_TRABAJOS_MAX → trabajos pendientes admitidos (en cola + en curso)
+- LITHO_TRABAJOS_TTL → segundos que se conserva un resultado terminado
+- LITHO_TRABAJOS_TERMINADOS → trabajos terminados retenidos como máximo
+- LITHO_TRABAJOS_RESULTADOS_MB → MB de resultados retenidos como máximo
+"""
+
+import asyncio
+import logging
+import os
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Optional
+
+from ejecutor import Saturado, WORKERS, reintentar_si_saturado
+from formatos import FORMATOS, iterar_formato, tamano_formato
+
+
+logger = logging.getLogger("lithomaker")
+
+TRABAJOS_MAX = int(os.getenv("LITHO_TRABAJOS_MAX", 32))
+TRABAJOS_TTL_S = float(os.getenv("LITHO_TRABAJOS_TTL", 600))
+TRABAJOS_TERMINADOS = int(os.getenv("LITHO_TRABAJOS_TERMINADOS", 256))
+TRABAJOS_RESULTADOS_MB = float(os.getenv("LITHO_TRABAJOS_RESULTADOS_MB", 512))
+
+# Reparto del porcentaje entre generación y serialización
+PESO_GENERACION = 90.0
+
+
+@dataclass
+class Trabajo:
+    id: str
+    tipo: str
+    nombre: str
+    formato: str = "stl"
+    estado: str = "en_cola"        # en_cola | generando | serializando | listo | error
+    etapa: str = "en_cola"
+    progreso: float = 0.0          # porcentaje [0, 100]
+    creado: float = field(default_factory=time.time)
+    terminado: Optional[float] = None
+    error: Optional[str] = None
+    codigo_error: int = 500
+    cache: Optional[str] = None
+    bytes_serializados: int = 0
+    bytes_totales: int = 0
+    resultado: Optional[bytes] = None
+
+    @property
+    def nombre_archivo(self) -> str:
+        return self.nombre + FORMATOS[self.formato][1]
+
+    @property
+    def media_type(self) -> str:
+        return FORMATOS[self.formato][0]
+
+    @property
+    def pendiente(self) -> bool:
+        return self.estado in ("en_cola", "generando", "serializando")
+
+    def resumen(self) -> dict:
+        return {
+            "id": self.id,
+            "tipo": self.tipo,
+            "formato": self.formato,
+            "estado": self.estado,
+            "etapa": self.etapa,
+            "progreso": round(self.progreso, 1),
+            "bytes_serializados": self.bytes_serializados,
+            "bytes_totales": self.bytes_totales,
+            "cache": self.cache,
+            "error": self.error,
+        }
+
+
+class GestorTrabajos:
+
+    def __init__(
+        self,
+        max_pendientes: int,
+        ttl_s: float,
+        concurrencia: int,
+        max_terminados: int = TRABAJOS_TERMINADOS,
+        max_resultados_mb: float = TRABAJOS_RESULTADOS_MB,
+    ):
+        self.max_pendientes = max_pendientes
+        self.ttl_s = ttl_s
+        self.concurrencia = max(1, concurrencia)
+        self.max_terminados = max_terminados
+        self.max_resultados_bytes = int(max_resultados_mb * 1024 * 1024)
+
+        self._trabajos: "dict[str, Trabajo]" = {}
+        self._tareas: set = set()
+        self._semaforo = None
+
+        self.rechazados = 0
+        self.desalojados = 0
+
+    # ------------------------------------------------------------
+    # Ciclo de vida
+    # ------------------------------------------------------------
+
+    def crear(self, tipo: str, nombre: str, generar, formato: str = "stl") -> Trabajo:
+        """
+        Registra un trabajo y lo encola.
+        El resultado se serializa en `formato` (ver formatos.py).
+
+        generar: corrutina generar(trabajo_id) -> (malla, origen_cache)
+        Lanza Saturado si ya hay demasiados trabajos pendientes.
+        """
+        self.purgar()
+
+        if self.pendientes >= self.max_pendientes:
+            self.rechazados += 1
+            raise Saturado()
+
+        if self._semaforo is None:
+            self._semaforo = asyncio.Semaphore(self.concurrencia)
+
+        trabajo = Trabajo(id=uuid.uuid4().hex, tipo=tipo, nombre=nombre, formato=formato)
+        self._trabajos[trabajo.id] = trabajo
+
+        tarea = asyncio.create_task(self._ejecutar(trabajo, generar))
+        self._tareas.add(tarea)
+        tarea.add_done_callback(self._tareas.discard)
+
+        return trabajo
+
+    async def _ejecutar(self, trabajo: Trabajo, generar):
+        try:
+            async with self._semaforo:
+                trabajo.estado = trabajo.etapa = "generando"
+
+                # El pool puede estar lleno por peticiones síncronas: se reintenta
+                malla, trabajo.cache = await reintentar_si_saturado(
+                    lambda: generar(trabajo.id)
+                )
+
+            trabajo.estado = trabajo.etapa = "serializando"
+            trabajo.progreso = PESO_GENERACION
+            trabajo.resultado = await asyncio.to_thread(self._serializar, trabajo, malla)
+
+            trabajo.estado = trabajo.etapa = "listo"
+            trabajo.progreso = 100.0
+
+        except asyncio.CancelledError:
+            trabajo.estado = "error"
+            trabajo.error = "Trabajo cancelado"
+            raise
+
+        except ValueError as e:
+            logger.warning(f"Error de validación en trabajo {trabajo.id}: {e}")
+            trabajo.estado = "error"
+            trabajo.error = str(e)
+            trabajo.codigo_error = 422
+
+        except Exception:
+            logger.exception(f"Error inesperado en trabajo {trabajo.id}")
+            trabajo.estado = "error"
+            trabajo.error = "Error interno al generar el modelo"
+
+        finally:
+            trabajo.terminado = time.time()
+            self._recortar()
+
+    @staticmethod
+    def _serializar(trabajo: Trabajo, malla) -> bytes:
+        trabajo.bytes_totales = tamano_formato(malla, trabajo.formato) or 0
+
+        bloques = []
+        for bloque in iterar_formato(malla, trabajo.formato, trabajo.nombre):
+            bloques.append(bloque)
+            trabajo.bytes_serializados += len(bloque)
+            if trabajo.bytes_totales:
+                trabajo.progreso = PESO_GENERACION + (100.0 - PESO_GENERACION) * (
+                    trabajo.bytes_serializados / trabajo.bytes_totales
+                )
+
+        return b"".join(bloques)
+
+    def actualizar(self, trabajo_id: str, etapa: str, fraccion: float):
+        """
+        Reporte de un worker (llamado desde el hilo de progreso del ejecutor).
+        """
+        trabajo = self._trabajos.get(trabajo_id)
+        if trabajo is None or trabajo.estado != "generando":
+            return
+
+        trabajo.etapa = etapa
+        trabajo.progreso = max(trabajo.progreso, PESO_GENERACION * min(max(fraccion, 0.0), 1.0))
+
+    # ------------------------------------------------------------
+    # Consulta y expiración
+    # ------------------------------------------------------------
+
+    def obtener(self, trabajo_id: str) -> Optional[Trabajo]:
+        self.purgar()
+        return self._trabajos.get(trabajo_id)
+
+    @property
+    def pendientes(self) -> int:
+        return sum(1 for t in self._trabajos.values() if t.pendiente)
+
+    @property
+    def terminados(self) -> int:
+        return sum(1 for t in self._trabajos.values() if t.terminado is not None)
+
+    @property
+    def bytes_retenidos(self) -> int:
+        return sum(len(t.resultado) for t in self._trabajos.values() if t.resultado)
+
+    def purgar(self):
+        """
+        Descarta los trabajos terminados hace más de ttl_s segundos.
+        """
+        limite = time.time() - self.ttl_s
+        vencidos = [
+            t.id for t in self._trabajos.values()
+            if t.terminado is not None and t.terminado < limite
+        ]
+        for trabajo_id in vencidos:
+            del self._trabajos[trabajo_id]
+
+    def _recortar(self):
+        """
+        Desaloja los trabajos terminados más antiguos mientras superen
+        max_terminados o max_resultados_bytes (antes de su TTL).
+        El último terminado se conserva aunque por sí solo supere el límite.
+        """
+        terminados = sorted(
+            (t for t in self._trabajos.values() if t.terminado is not None),
+            key=lambda t: t.terminado,
+        )
+        retenidos = sum(len(t.resultado) for t in terminados if t.resultado)
+
+        while len(terminados) > 1 and (
+            len(terminados) > self.max_terminados or retenidos > self.max_resultados_bytes
+        ):
+            trabajo = terminados.pop(0)
+            retenidos -= len(trabajo.resultado or b"")
+            del self._trabajos[trabajo.id]
+            self.desalojados += 1
+            logger.info(f"Trabajo {trabajo.id} desalojado antes de su TTL (límite de retención)")
+
+    async def purgar_periodicamente(self, intervalo_s: float = 30.0):
+        while True:
+            await asyncio.sleep(intervalo_s)
+            self.purgar()
+
+    def cancelar_todos(self):
+        for tarea in list(self._tareas):
+            tarea.cancel()
+
+    def estado(self) -> dict:
+        return {
+            "pendientes": self.pendientes,
+            "total": len(self._trabajos),
+            "max_pendientes": self.max_pendientes,
+            "concurrencia": self.concurrencia,
+            "ttl_s": self.ttl_s,
+            "terminados": self.terminados,
+            "max_terminados": self.max_terminados,
+            "bytes_retenidos": self.bytes_retenidos,
+            "max_resultados_bytes": self.max_resultados_bytes,
+            "rechazados": self.rechazados,
+            "desalojados": self.desalojados,
+        }
+
+
+gestor_trabajos = GestorTrabajos(
+    max_pendientes=TRABAJOS_MAX,
+    ttl_s=TRABAJOS_TTL_S,
+    concurrencia=WORKERS,
+)
@@ -0,0 +1,211 @@
+"""
+Validación de mallas: estanqueidad y variedad (manifold)
+
+Una malla imprimible es una superficie cerrada y orientable: cada arista
+la comparten exactamente dos caras que la recorren en sentidos opuestos,
+y ninguna cara repite un vértice ni está duplicada. Todo se verifica con
+arrays, sin recorrer caras en Python:
+
+- Cada arista dirigida se codifica en un entero (vértice menor, vértice
+  mayor, sentido) y se ordena una sola vez. En una malla válida las
+  claves quedan en pares (ida, vuelta) consecutivos, así que el caso
+  común se resuelve con una comparación; el conteo detallado de aristas
+  de borde, no manifold o invertidas (y de caras duplicadas, que
+  siempre rompen ese emparejamiento) solo se calcula si algo falla
+- Caras con índices repetidos (defecto) y de área nula (aviso: no abren
+  la superficie, pero conviene que no crezcan; p. ej. las paredes por
+  píxel que llegan a un nodo de altura 0)
+
+Modo global con LITHO_VALIDAR (ver README):
+- "0"        : solo se valida si la petición lo pide (validar=true)
+- "1"        : se valida toda malla generada y se informa en /metrics
+- "estricto" : además se rechazan las mallas inválidas
+"""
+
+from dataclasses import dataclass, fields
+import os
+import time
+
+import numpy as np
+
+from malla import CARAS_POR_BLOQUE, Malla
+from progreso import etapa
+
+
+MODOS = ("0", "1", "estricto")
+MODO = os.getenv("LITHO_VALIDAR", "0").strip().lower()
+if MODO not in MODOS:
+    raise ValueError(f"LITHO_VALIDAR debe ser uno de {', '.join(MODOS)}")
+
+AREA_MIN_MM2 = 1e-10       # Debajo de esto la cara cuenta como de área nula
+
+# Hasta 2^21 vértices, los tres índices ordenados de una cara caben en un int64
+_BITS_CARA = 21
+
+
+class MallaInvalida(ValueError):
+    """
+    La malla generada no es cerrada/manifold y la validación es estricta.
+    """
+
+
+@dataclass
+class Reporte:
+    caras: int = 0
+    aristas: int = 0
+    degeneradas: int = 0          # índices repetidos
+    duplicadas: int = 0           # mismos tres vértices que otra cara
+    aristas_borde: int = 0        # usadas por una sola cara (agujeros)
+    aristas_no_manifold: int = 0  # usadas por más de dos caras
+    aristas_invertidas: int = 0   # dos caras que la recorren en el mismo sentido
+    area_nula: int = 0            # aviso: vértices distintos pero alineados
+    segundos: float = 0.0
+
+    DEFECTOS = (
+        "degeneradas", "duplicadas", "aristas_borde", "aristas_no_manifold", "aristas_invertidas",
+    )
+    CONTEOS = DEFECTOS + ("area_nula",)
+
+    @property
+    def valida(self) -> bool:
+        return not any(getattr(self, defecto) for defecto in self.DEFECTOS)
+
+    def defectos(self) -> dict:
+        return {d: getattr(self, d) for d in self.CONTEOS if getattr(self, d)}
+
+    def resumen(self) -> dict:
+        return {**{f.name: getattr(self, f.name) for f in fields(self)}, "valida": self.valida}
+
+    def __str__(self) -> str:
+        estado = "válida" if self.valida else "inválida"
+        detalle = ", ".join(f"{d.replace('_', ' ')}: {n}" for d, n in self.defectos().items())
+        return f"malla {estado} ({detalle or f'{self.caras} caras, {self.aristas} aristas'})"
+
+
+# ============================================================
+# VALIDACIÓN
+# ============================================================
+
+def _areas_nulas(malla: Malla) -> np.ndarray:
+    """
+    Máscara de caras con área (casi) nula, calculada por bloques.
+    """
+    v = malla.vertices
+    nulas = np.empty(malla.num_caras, dtype=bool)
+    limite = np.float32((2 * AREA_MIN_MM2) ** 2)
+
+    for inicio in range(0, malla.num_caras, CARAS_POR_BLOQUE):
+        bloque = malla.caras[inicio:inicio + CARAS_POR_BLOQUE]
+        p0 = v[bloque[:, 0]]
+        e1 = v[bloque[:, 1]] - p0
+        e2 = v[bloque[:, 2]] - p0
+        cx = e1[:, 1] * e2[:, 2] - e1[:, 2] * e2[:, 1]
+        cy = e1[:, 2] * e2[:, 0] - e1[:, 0] * e2[:, 2]
+        cz = e1[:, 0] * e2[:, 1] - e1[:, 1] * e2[:, 0]
+        nulas[inicio:inicio + len(bloque)] = cx * cx + cy * cy + cz * cz <= limite
+
+    return nulas
+
+
+def _contar_duplicadas(caras: np.ndarray, n_vertices: int) -> int:
+    ordenadas = np.sort(caras, axis=1).astype(np.int64)
+
+    if n_vertices <= 1 << _BITS_CARA:
+        claves = (ordenadas[:, 0] << 2 * _BITS_CARA) | (ordenadas[:, 1] << _BITS_CARA) | ordenadas[:, 2]
+        claves.sort()
+        return int(np.count_nonzero(claves[1:] == claves[:-1]))
+
+    return len(ordenadas) - len(np.unique(ordenadas, axis=0))
+
+
+def _contar_aristas(claves: np.ndarray, reporte: Reporte):
+    """
+    Conteo detallado sobre las claves ordenadas (arista << 1 | sentido).
+    """
+    arista = claves >> 1
+    inicio = np.flatnonzero(np.concatenate([[True], arista[1:] != arista[:-1]]))
+    usos = np.diff(np.append(inicio, len(claves)))
+    idas = np.add.reduceat(1 - (claves & 1), inicio) if len(inicio) else usos
+
+    reporte.aristas = len(inicio)
+    reporte.aristas_borde = int(np.count_nonzero(usos == 1))
+    reporte.aristas_no_manifold = int(np.count_nonzero(usos > 2))
+    reporte.aristas_invertidas = int(np.count_nonzero((usos == 2) & (idas != 1)))
+
+
+def validar_malla(malla: Malla) -> Reporte:
+    """
+    Reporte de estanqueidad y variedad de la malla (no la modifica).
+    Malla de 600 × 600 px (~700k caras): ~150 ms.
+    """
+    t0 = time.perf_counter()
+    caras = malla.caras
+    n = malla.num_vertices
+    reporte = Reporte(caras=len(caras))
+
+    if len(caras) == 0:
+        reporte.segundos = time.perf_counter() - t0
+        return reporte
+
+    # --- Caras degeneradas ---
+    repetidos = (caras[:, 0] == caras[:, 1]) | (caras[:, 1] == caras[:, 2]) | (caras[:, 2] == caras[:, 0])
+    reporte.degeneradas = int(np.count_nonzero(repetidos))
+    reporte.area_nula = int(np.count_nonzero(_areas_nulas(malla) & ~repetidos))
+
+    # --- Aristas dirigidas: (menor * n + mayor) * 2 + sentido ---
+    a = caras.ravel().astype(np.int64)
+    b = caras[:, [1, 2, 0]].ravel().astype(np.int64)
+    if reporte.degeneradas:
+        # Los lazos (a == b) ya cuentan como caras degeneradas
+        a, b = a[a != b], b[a != b]
+
+    sentido = a > b
+    claves = np.minimum(a, b)
+    np.maximum(a, b, out=b)
+    del a
+    claves *= n
+    claves += b
+    del b
+    claves <<= 1
+    claves |= sentido
+    del sentido
+    claves.sort()
+
+    # Caso común: pares (ida, vuelta) consecutivos de la misma arista
+    pares = (
+        len(claves) % 2 == 0
+        and not np.any(claves[0::2] & 1)
+        and np.array_equal(claves[1::2], claves[0::2] + 1)
+    )
+    if pares:
+        reporte.aristas = len(claves) // 2
+    else:
+        _contar_aristas(claves, reporte)
+        reporte.duplicadas = _contar_duplicadas(caras, n)
+
+    reporte.segundos = time.perf_counter() - t0
+    return reporte
+
+
+def exigir_valida(reporte: Reporte):
+    if not reporte.valida:
+        raise MallaInvalida(f"La malla generada no es imprimible: {reporte}")
+
+
+# ============================================================
+# EN EL WORKER
+# ============================================================
+
+def generar_validada(fn, *args, **kwargs) -> Malla:
+    """
+    Genera la malla con fn(*args, **kwargs) y la valida en el mismo
+    proceso (sin copiarla de nuevo entre procesos). El reporte viaja y
+    queda en la caché junto con la malla (malla.validacion); exigirlo o
+    no es decisión de cada petición.
+    """
+    malla = fn(*args, **kwargs)
+
+    with etapa("validacion"):
+        malla.validacion = validar_malla(malla)
+
+    return malla
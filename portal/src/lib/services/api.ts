@@ -10,75 +10,130 @@ const API_BASE_URL =
  * Tipos
  * ====================================================== */
 
+export type ModelFormat = 'stl' | '3mf' | 'malla';
+
 export interface GenerateModelRequest {
 	file: File | Blob;
 	filename?: string;
+	preview?: boolean;
+	format?: ModelFormat;
+	onProgress?: (status: JobStatus) => void;
 }
 
 export interface GenerateTextBaseRequest {
 	texto: string;
+	preview?: boolean;
+	format?: ModelFormat;
+	onProgress?: (status: JobStatus) => void;
+}
+
+export interface JobStatus {
+	id: string;
+	tipo: string;
+	estado: 'en_cola' | 'generando' | 'serializando' | 'listo' | 'error';
+	etapa: string;
+	progreso: number;
+	error: string | null;
 }
 
+const POLL_INTERVAL_MS = 500;
+
 /* ======================================================
- * Imagen → STL (litofanía)
+ * Trabajos asíncronos (enviar → consultar → descargar)
  * ====================================================== */
 
-export async function generateModel(
-	{ file, filename = 'litho.png' }: GenerateModelRequest
+async function errorMessage(response: Response, fallback: string): Promise<string> {
+	try {
+		const error = await response.json();
+		return error.detail || fallback;
+	} catch {
+		return fallback;
+	}
+}
+
+async function submitJob(path: string, formData: FormData): Promise<JobStatus> {
+	const response = await fetch(`${API_BASE_URL}${path}`, {
+		method: 'POST',
+		body: formData,
+	});
+
+	if (!response.ok) {
+		throw new Error(await errorMessage(response, 'Error submitting job'));
+	}
+
+	return await response.json();
+}
+
+export async function getJobStatus(id: string): Promise<JobStatus> {
+	const response = await fetch(`${API_BASE_URL}/api/jobs/${id}`);
+
+	if (!response.ok) {
+		throw new Error(await errorMessage(response, 'Error fetching job status'));
+	}
+
+	return await response.json();
+}
+
+async function waitForJob(
+	job: JobStatus,
+	onProgress?: (status: JobStatus) => void
 ): Promise<Blob> {
 
-	const formData = new FormData();
-	formData.append('file', file, filename);
+	let status = job;
+
+	while (status.estado !== 'listo' && status.estado !== 'error') {
+		onProgress?.(status);
+		await new Promise((resolve) => setTimeout(resolve, POLL_INTERVAL_MS));
+		status = await getJobStatus(job.id);
+	}
+
+	onProgress?.(status);
+
+	if (status.estado === 'error') {
+		throw new Error(status.error || 'Error generating model');
+	}
 
-	const response = await fetch(
-		`${API_BASE_URL}/api/generate-3d/`,
-		{
-			method: 'POST',
-			body: formData,
-		}
-	);
+	const response = await fetch(`${API_BASE_URL}/api/jobs/${job.id}/result`);
 
 	if (!response.ok) {
-		let message = 'Error generating model';
-		try {
-			const error = await response.json();
-			message = error.detail || message;
-		} catch {}
-		throw new Error(message);
+		throw new Error(await errorMessage(response, 'Error fetching job result'));
 	}
 
 	return await response.blob();
 }
 
+/* ======================================================
+ * Imagen → STL (litofanía)
+ * ====================================================== */
+
+export async function generateModel(
+	{ file, filename = 'litho.png', preview = false, format = 'stl', onProgress }: GenerateModelRequest
+): Promise<Blob> {
+
+	const formData = new FormData();
+	formData.append('file', file, filename);
+	formData.append('preview', String(preview));
+	formData.append('formato', format);
+
+	const job = await submitJob('/api/jobs/generate-3d/', formData);
+	return await waitForJob(job, onProgress);
+}
+
 /* ======================================================
  * Texto → Base STL
  * ====================================================== */
 
 export async function generateTextBase(
-	{ texto }: GenerateTextBaseRequest
+	{ texto, preview = false, format = 'stl', onProgress }: GenerateTextBaseRequest
 ): Promise<Blob> {
 
 	const formData = new FormData();
 	formData.append('texto', texto);
+	formData.append('preview', String(preview));
+	formData.append('formato', format);
 
-	const response = await fetch(
-		`${API_BASE_URL}/api/generate-text-base/`,
-		{
-			method: 'POST',
-			body: formData,
-		}
-	);
-
-	if (!response.ok) {
-		let message = 'Error generating text base';
-		try {
-			const error = await response.json();
-			message = error.detail || message;
-		} catch {}
-		throw new Error(message);
-	}
-
-	return await response.blob();
+	const job = await submitJob('/api/jobs/generate-text-base/', formData);
+	return await waitForJob(job, onProgress);
 }
 
 /* ======================================================
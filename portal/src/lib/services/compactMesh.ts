@@ -0,0 +1,54 @@
+/**
+ * Decodificador del formato "malla" del backend
+ * (binario indexado y cuantizado, ver backend/formatos.py)
+ */
+
+import * as THREE from 'three';
+
+const MAGIC = 'LMSH';
+const VERSION = 1;
+const HEADER_BYTES = 40;
+
+export function isCompactMesh(buffer: ArrayBuffer): boolean {
+	if (buffer.byteLength < HEADER_BYTES) return false;
+	const magic = new Uint8Array(buffer, 0, 4);
+	return String.fromCharCode(...magic) === MAGIC;
+}
+
+export function parseCompactMesh(buffer: ArrayBuffer): THREE.BufferGeometry {
+	const view = new DataView(buffer);
+
+	const version = view.getUint8(4);
+	const indexBytes = view.getUint8(5);
+	if (version !== VERSION) {
+		throw new Error(`Unsupported compact mesh version ${version}`);
+	}
+
+	const numVertices = view.getUint32(8, true);
+	const numFaces = view.getUint32(12, true);
+
+	const origin = [0, 1, 2].map((i) => view.getFloat32(16 + 4 * i, true));
+	const scale = [0, 1, 2].map((i) => view.getFloat32(28 + 4 * i, true));
+
+	// Vértices: uint16 cuantizados → float32 en mm
+	const quantized = new Uint16Array(buffer.slice(HEADER_BYTES, HEADER_BYTES + numVertices * 6));
+	const positions = new Float32Array(numVertices * 3);
+	for (let i = 0; i < positions.length; i++) {
+		const axis = i % 3;
+		positions[i] = origin[axis] + quantized[i] * scale[axis];
+	}
+
+	// Índices de 16 o 32 bits
+	const indexOffset = HEADER_BYTES + numVertices * 6;
+	const indexEnd = indexOffset + numFaces * 3 * indexBytes;
+	const indices =
+		indexBytes === 2
+			? new Uint16Array(buffer.slice(indexOffset, indexEnd))
+			: new Uint32Array(buffer.slice(indexOffset, indexEnd));
+
+	const geometry = new THREE.BufferGeometry();
+	geometry.setAttribute('position', new THREE.BufferAttribute(positions, 3));
+	geometry.setIndex(new THREE.BufferAttribute(indices, 1));
+
+	return geometry;
+}